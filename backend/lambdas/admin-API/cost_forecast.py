@@ -0,0 +1,196 @@
+"""
+Multi-year employer match program cost forecast.
+
+Projects match cost, loan payoffs, cap-limited employees and cohort roll-off
+year by year for the whole population. Amortization is closed-form and
+vectorized, attrition is applied as an expected retention weight, and new-hire
+cohorts reuse the current population's original loan terms, so a forecast
+over 100k+ employees is a handful of NumPy passes.
+"""
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from policy_analysis import CAP_NONE, DEFAULT_POLICY, compute_matches, normalize_policy
+
+DEFAULT_ASSUMPTIONS = {
+    'years': 10,
+    'annualAttritionRate': 0.12,  # share of employees leaving ASU each year
+    'newHiresPerYear': 0,  # borrowers joining the program at the start of each year
+    'salaryGrowthRate': 0.03  # annual raise applied to salary-based caps
+}
+
+MAX_YEARS = 30
+
+
+def normalize_assumptions(assumptions: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fill in defaults and validate forecast assumptions (raises ValueError)"""
+    assumptions = assumptions or {}
+    normalized = {
+        'years': int(assumptions.get('years', DEFAULT_ASSUMPTIONS['years'])),
+        'annualAttritionRate': float(assumptions.get('annualAttritionRate', DEFAULT_ASSUMPTIONS['annualAttritionRate'])),
+        'newHiresPerYear': int(assumptions.get('newHiresPerYear', DEFAULT_ASSUMPTIONS['newHiresPerYear'])),
+        'salaryGrowthRate': float(assumptions.get('salaryGrowthRate', DEFAULT_ASSUMPTIONS['salaryGrowthRate']))
+    }
+
+    if normalized['years'] < 1 or normalized['years'] > MAX_YEARS:
+        raise ValueError(f"years must be between 1 and {MAX_YEARS}")
+    if not 0 <= normalized['annualAttritionRate'] < 1:
+        raise ValueError("annualAttritionRate must be between 0 and 1")
+    if normalized['newHiresPerYear'] < 0:
+        raise ValueError("newHiresPerYear must be non-negative")
+    if not -0.5 < normalized['salaryGrowthRate'] < 1:
+        raise ValueError("salaryGrowthRate must be between -0.5 and 1")
+
+    return normalized
+
+
+def months_to_payoff(balance: np.ndarray, annual_rate: np.ndarray, monthly_payment: np.ndarray) -> np.ndarray:
+    """
+    Closed-form number of months until each balance reaches zero at the given payment.
+    Loans whose payment does not cover interest never pay off (inf).
+    """
+    monthly_rate = (annual_rate / 100) / 12
+    months = np.full(balance.shape, np.inf)
+
+    paying = monthly_payment > 0
+    months[balance <= 0] = 0.0
+
+    zero_rate = paying & (balance > 0) & (monthly_rate == 0)
+    months[zero_rate] = balance[zero_rate] / monthly_payment[zero_rate]
+
+    amortizing = paying & (balance > 0) & (monthly_rate > 0) & (monthly_payment > balance * monthly_rate)
+    r = monthly_rate[amortizing]
+    months[amortizing] = -np.log1p(-balance[amortizing] * r / monthly_payment[amortizing]) / np.log1p(r)
+
+    return np.ceil(months - 1e-9)
+
+
+def balance_after(balance: np.ndarray, annual_rate: np.ndarray, monthly_payment: np.ndarray,
+                  months: float) -> np.ndarray:
+    """Remaining balance after a number of standard monthly payments (floored at zero)"""
+    monthly_rate = (annual_rate / 100) / 12
+    growth = (1 + monthly_rate) ** months
+    with np.errstate(divide='ignore', invalid='ignore'):
+        paid = np.where(monthly_rate > 0, monthly_payment * (growth - 1) / monthly_rate, monthly_payment * months)
+    return np.maximum(balance * growth - paid, 0.0)
+
+
+def _cohort_trajectory(balance, annual_rate, monthly_emi, monthly_salary, policy, years, salary_growth):
+    """
+    Per-year unweighted totals for one cohort, starting at its own year 1.
+    Returns a dict of arrays with one entry per projection year.
+    """
+    payoff_months = months_to_payoff(balance, annual_rate, monthly_emi)
+
+    totals = {
+        'matchCost': np.zeros(years),
+        'participants': np.zeros(years),
+        'loansPaidOff': np.zeros(years),
+        'capLimited': np.zeros(years),
+        'remainingDebt': np.zeros(years)
+    }
+
+    for year in range(years):
+        start_month = year * 12
+        active_months = np.clip(payoff_months - start_month, 0, 12)
+        salary = monthly_salary * (1 + salary_growth) ** year
+
+        monthly_match, annual_match, cap_codes = compute_matches(monthly_emi, salary, [policy])
+        year_match = np.minimum(monthly_match[0] * active_months, annual_match[0])
+        active = active_months > 0
+
+        totals['matchCost'][year] = year_match.sum()
+        totals['participants'][year] = np.count_nonzero(active & (year_match > 0))
+        totals['loansPaidOff'][year] = np.count_nonzero(
+            (payoff_months > start_month) & (payoff_months <= start_month + 12)
+        )
+        totals['capLimited'][year] = np.count_nonzero(active & (cap_codes[0] != CAP_NONE))
+        totals['remainingDebt'][year] = balance_after(
+            balance, annual_rate, monthly_emi, start_month + 12
+        ).sum()
+
+    return totals
+
+
+def forecast_program_cost(snapshot, assumptions: Optional[Dict[str, Any]] = None,
+                          policy: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Project the program year by year.
+
+    Existing employees continue their current loans from remaining_balance.
+    Each new-hire cohort follows the population's original loan terms, scaled
+    to newHiresPerYear. Attrition reduces every cohort's expected headcount by
+    the same retention factor each year.
+    """
+    assumptions = normalize_assumptions(assumptions)
+    policy = normalize_policy(policy or DEFAULT_POLICY)
+
+    years = assumptions['years']
+    retention = 1 - assumptions['annualAttritionRate']
+    growth = assumptions['salaryGrowthRate']
+
+    borrowers = (snapshot.monthly_emi > 0) & (snapshot.monthly_salary > 0)
+    emi = snapshot.monthly_emi[borrowers]
+    salary = snapshot.monthly_salary[borrowers]
+    rate = snapshot.interest_rate[borrowers]
+    remaining = snapshot.remaining_balance[borrowers]
+    original = np.where(snapshot.loan_amount[borrowers] > 0, snapshot.loan_amount[borrowers], remaining)
+    borrower_count = int(borrowers.sum())
+
+    existing = _cohort_trajectory(remaining, rate, emi, salary, policy, years, growth)
+    new_hire = _cohort_trajectory(original, rate, emi, salary, policy, years, growth)
+
+    # Expected share of a cohort still employed in each of its years
+    survival = retention ** np.arange(years)
+    new_hire_scale = assumptions['newHiresPerYear'] / borrower_count if borrower_count else 0.0
+
+    combined = {}
+    for metric in existing:
+        values = existing[metric] * survival
+        # Cohort joining at the start of year c is in its (y - c + 1)th year during year y
+        for joined in range(1, years):
+            values[joined:] += new_hire[metric][:years - joined] * survival[:years - joined] * new_hire_scale
+        combined[metric] = values
+
+    # Headcount and roll-off follow from the same weights
+    headcount = np.zeros(years)
+    attrition_exits = np.zeros(years)
+    for year in range(years):
+        cohort_sizes = [borrower_count] + [assumptions['newHiresPerYear']] * year
+        ages = np.arange(year, -1, -1)
+        present = np.array(cohort_sizes) * retention ** ages
+        headcount[year] = present.sum()
+        attrition_exits[year] = headcount[year] * (1 - retention)
+
+    timeline = []
+    cumulative_cost = 0.0
+    for year in range(years):
+        cumulative_cost += combined['matchCost'][year]
+        timeline.append({
+            'year': year + 1,
+            'employerMatchCost': round(float(combined['matchCost'][year]), 2),
+            'cumulativeMatchCost': round(cumulative_cost, 2),
+            'expectedHeadcount': round(float(headcount[year]), 1),
+            'activeParticipants': round(float(combined['participants'][year]), 1),
+            'loansPaidOff': round(float(combined['loansPaidOff'][year]), 1),
+            'capLimitedEmployees': round(float(combined['capLimited'][year]), 1),
+            'rolledOff': {
+                'paidOff': round(float(combined['loansPaidOff'][year]), 1),
+                'attrition': round(float(attrition_exits[year]), 1)
+            },
+            'remainingDebt': round(float(combined['remainingDebt'][year]), 2)
+        })
+
+    return {
+        'assumptions': assumptions,
+        'policy': policy,
+        'borrowersAtStart': borrower_count,
+        'totals': {
+            'employerMatchCost': round(cumulative_cost, 2),
+            'loansPaidOff': round(float(combined['loansPaidOff'].sum()), 1),
+            'averageAnnualCost': round(cumulative_cost / years, 2)
+        },
+        'timeline': timeline
+    }
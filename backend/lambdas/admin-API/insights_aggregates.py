@@ -0,0 +1,591 @@
+"""
+Incrementally maintained aggregates for /admin/insights.
+
+Every number on the insights dashboard is built from per-user counts and sums:
+users per repayment status, DTI and interest rate histogram buckets, debt,
+EMI and refinancing-savings totals. Averages and ROI are derived from those at
+read time. So one aggregate item holds the sums, and a DynamoDB Streams
+consumer applies old-image to new-image deltas to it:
+
+- INSERT adds the new user's contribution
+- MODIFY adds (new contribution - old contribution)
+- REMOVE subtracts the old contribution
+
+Each stream batch becomes one transaction: an UpdateItem with ADD on the
+aggregate, plus a marker item for the batch that must not exist yet. So a
+batch is applied whole or not at all, and a redelivered batch is skipped
+however many batches were applied in between. Markers expire with the table's
+TTL (expiresAt) after the stream's retention. ADD commutes, so batches from
+different shards can interleave. Anything else that drifts (e.g. records lost
+while the consumer was disabled) is corrected by rebuild_aggregates(), which
+recomputes the item from a full parallel scan.
+
+Every applied batch also increments appliedBatches. A rebuild claims the
+aggregate with a rebuildToken before it scans and only writes its result if
+neither the token nor appliedBatches changed meanwhile: a scan is not a
+snapshot, so it cannot tell which of the batches applied during it it saw.
+A rebuild that raced with stream batches is retried, and after
+REBUILD_ATTEMPTS the stream-maintained aggregate is left as it is.
+
+A rebuild reads the scanned items into NumPy columns once and computes every
+total, histogram (np.digitize + np.bincount) and the median / P90 of DTI, loan
+amount and interest rate vectorized. Percentiles cannot be maintained from
+deltas, so they are as of the last rebuild.
+
+Stream view type must be NEW_AND_OLD_IMAGES.
+"""
+
+import hashlib
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from parallel_scan import parallel_scan
+
+AGGREGATE_ID = 'business-insights'
+AGGREGATE_VERSION = 2
+
+# Streams keep records for 24 hours, so no batch is redelivered after this
+BATCH_MARKER_TTL_SECONDS = 2 * 24 * 3600
+
+# Scans that race with stream batches before the aggregate is left as it is
+REBUILD_ATTEMPTS = 3
+
+# Attribute paths _user_values reads, and the key so every user still counts;
+# rebuild scans read only these, not whole profiles
+INSIGHT_ATTRIBUTE_PATHS = (
+    ('asuId',),
+    ('loanApplication', 'loanAmount'),
+    ('loanApplication', 'interestRate'),
+    ('latestRecommendation', 'financialProjections', 'debtToIncomeImpact', 'afterMatch'),
+    ('remaining_balance',),
+    ('monthly_emi',),
+    ('repayment_status',)
+)
+
+# Repayment status -> counter
+STATUS_COUNTERS = {
+    'High Burden': 'statusHighBurden',
+    'Moderate Burden': 'statusModerateBurden',
+    'Manageable': 'statusManageable',
+    'No Debt': 'statusNoDebt'
+}
+
+# (label, lower bound inclusive, upper bound exclusive)
+DTI_BUCKETS = (
+    ('<10', None, 10),
+    ('10-20', 10, 20),
+    ('20-30', 20, 30),
+    ('30-40', 30, 40),
+    ('>40', 40, None)
+)
+
+# "<5" excludes users without a rate (0%)
+INTEREST_BUCKETS = (
+    ('<5', 0, 5),
+    ('5-6', 5, 6),
+    ('6-7', 6, 7),
+    ('>7', 7, None)
+)
+
+# Bucket edges for np.digitize
+DTI_EDGES = [high for _, _, high in DTI_BUCKETS[:-1]]
+INTEREST_EDGES = [high for _, _, high in INTEREST_BUCKETS[:-1]]
+
+# Reported as median and P90 over all users; refreshed on every rebuild
+PERCENTILES = (50, 90)
+PERCENTILE_COLUMNS = {'dti': 'dti', 'loanAmount': 'loan_amount', 'interestRate': 'interest_rate'}
+
+HIGH_INTEREST_RATE = 7
+REFINANCE_RATE = 5
+REFINANCE_YEARS = 10  # assume 10 years average
+
+MATCH_SHARE_OF_EMI = 0.5  # 50% match
+RETENTION_RATE = 0.35
+TURNOVER_COST = 50000
+
+# Sums are stored as Decimal; float noise below this precision is dropped
+SUM_DECIMAL_PLACES = 6
+
+_deserializer = TypeDeserializer()
+_serializer = TypeSerializer()
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _dti_bucket(dti: float) -> str:
+    for label, low, high in DTI_BUCKETS:
+        if (low is None or dti >= low) and (high is None or dti < high):
+            return label
+
+
+def _interest_bucket(rate: float) -> Optional[str]:
+    if rate <= 0:
+        return None
+    for label, low, high in INTEREST_BUCKETS:
+        if rate >= low and (high is None or rate < high):
+            return label
+
+
+def _user_values(user: Dict[str, Any]):
+    """(loan amount, interest rate, DTI after match, remaining balance, monthly EMI, repayment status)"""
+    loan_data = user.get('loanApplication', {})
+    if isinstance(loan_data, dict):
+        loan_amount = _float(loan_data.get('loanAmount'))
+        interest_rate = _float(loan_data.get('interestRate'))
+    else:
+        loan_amount = 0.0
+        interest_rate = 0.0
+
+    dti = 0.0
+    rec_data = user.get('latestRecommendation', {})
+    if isinstance(rec_data, dict):
+        try:
+            dti = float(
+                rec_data.get('financialProjections', {})
+                .get('debtToIncomeImpact', {})
+                .get('afterMatch', 0)
+            )
+        except Exception:
+            dti = 0.0
+
+    return (
+        loan_amount,
+        interest_rate,
+        dti,
+        _float(user.get('remaining_balance')),
+        _float(user.get('monthly_emi')),
+        user.get('repayment_status', 'Unknown')
+    )
+
+
+def user_contribution(user: Optional[Dict[str, Any]]) -> Dict[str, float]:
+    """Counters and sums one user profile adds to the aggregate"""
+    if not user:
+        return {}
+
+    loan_amount, interest_rate, dti, remaining, monthly_emi, status = _user_values(user)
+
+    contribution = {
+        'userCount': 1,
+        'loanAmountSum': loan_amount,
+        'interestRateSum': interest_rate,
+        'dtiSum': dti,
+        'remainingBalanceSum': remaining,
+        'monthlyEmiSum': monthly_emi,
+        f"dtiBucket_{_dti_bucket(dti)}": 1
+    }
+
+    status_counter = STATUS_COUNTERS.get(status)
+    if status_counter:
+        contribution[status_counter] = 1
+    if dti > 30:
+        contribution['dtiAbove30'] = 1
+    if dti > 40:
+        contribution['dtiAbove40'] = 1
+
+    interest_bucket = _interest_bucket(interest_rate)
+    if interest_bucket:
+        contribution[f"interestBucket_{interest_bucket}"] = 1
+    if interest_rate > HIGH_INTEREST_RATE:
+        contribution['highInterestCount'] = 1
+        if remaining > 0:
+            contribution['potentialSavingsSum'] = (
+                remaining * ((interest_rate - REFINANCE_RATE) / 100) * REFINANCE_YEARS
+            )
+
+    return contribution
+
+
+class InsightColumns:
+    """Insight inputs for a whole population as NumPy columns, read in one pass over the items"""
+
+    def __init__(self, users: Iterable[Dict[str, Any]]):
+        rows = [_user_values(user) for user in users]
+        self.size = len(rows)
+
+        # One contiguous array per column
+        numeric = np.ascontiguousarray(np.array([row[:5] for row in rows], dtype=np.float64).reshape(self.size, 5).T)
+        (self.loan_amount, self.interest_rate, self.dti,
+         self.remaining_balance, self.monthly_emi) = numeric
+
+        # Index into STATUS_COUNTERS, -1 for statuses that are not counted
+        status_index = {status: i for i, status in enumerate(STATUS_COUNTERS)}
+        self.status = np.fromiter(
+            (status_index.get(row[5], -1) for row in rows), dtype=np.int8, count=self.size
+        )
+
+
+def totals_from_columns(columns: InsightColumns) -> Dict[str, float]:
+    """The same totals the per-user contributions add up to, in one vectorized pass"""
+    rate = columns.interest_rate
+    dti = columns.dti
+    remaining = columns.remaining_balance
+
+    totals = {
+        'userCount': columns.size,
+        'loanAmountSum': float(columns.loan_amount.sum()),
+        'interestRateSum': float(rate.sum()),
+        'dtiSum': float(dti.sum()),
+        'remainingBalanceSum': float(remaining.sum()),
+        'monthlyEmiSum': float(columns.monthly_emi.sum()),
+        'dtiAbove30': int(np.count_nonzero(dti > 30)),
+        'dtiAbove40': int(np.count_nonzero(dti > 40))
+    }
+
+    dti_counts = np.bincount(np.digitize(dti, DTI_EDGES), minlength=len(DTI_BUCKETS))
+    for (label, _, _), count in zip(DTI_BUCKETS, dti_counts):
+        totals[f"dtiBucket_{label}"] = int(count)
+
+    interest_counts = np.bincount(np.digitize(rate[rate > 0], INTEREST_EDGES), minlength=len(INTEREST_BUCKETS))
+    for (label, _, _), count in zip(INTEREST_BUCKETS, interest_counts):
+        totals[f"interestBucket_{label}"] = int(count)
+
+    status_counts = np.bincount(columns.status[columns.status >= 0], minlength=len(STATUS_COUNTERS))
+    for counter, count in zip(STATUS_COUNTERS.values(), status_counts):
+        totals[counter] = int(count)
+
+    high_interest = rate > HIGH_INTEREST_RATE
+    refinanceable = high_interest & (remaining > 0)
+    totals['highInterestCount'] = int(np.count_nonzero(high_interest))
+    totals['potentialSavingsSum'] = float(np.sum(
+        remaining[refinanceable] * ((rate[refinanceable] - REFINANCE_RATE) / 100) * REFINANCE_YEARS
+    ))
+
+    return {name: value for name, value in totals.items() if value}
+
+
+def percentiles_from_columns(columns: InsightColumns) -> Dict[str, Dict[str, float]]:
+    """Median and P90 of each PERCENTILE_COLUMNS column over all users"""
+    if not columns.size:
+        return {}
+    return {
+        name: dict(zip(('median', 'p90'), np.percentile(getattr(columns, attribute), PERCENTILES).round(2).tolist()))
+        for name, attribute in PERCENTILE_COLUMNS.items()
+    }
+
+
+def contribution_delta(old_user: Optional[Dict], new_user: Optional[Dict]) -> Dict[str, float]:
+    """new contribution - old contribution, without zero entries"""
+    delta = dict(user_contribution(new_user))
+    for name, value in user_contribution(old_user).items():
+        delta[name] = delta.get(name, 0) - value
+    return {name: value for name, value in delta.items() if value}
+
+
+def merge_deltas(deltas: Iterable[Dict[str, float]]) -> Dict[str, float]:
+    merged = {}
+    for delta in deltas:
+        for name, value in delta.items():
+            merged[name] = merged.get(name, 0) + value
+    return {name: value for name, value in merged.items() if value}
+
+
+def _to_decimal(value: float) -> Decimal:
+    return Decimal(str(round(value, SUM_DECIMAL_PLACES)))
+
+
+def _serialize(item: Dict[str, Any]) -> Dict[str, Any]:
+    """DynamoDB-JSON attribute values for the low-level client"""
+    return {name: _serializer.serialize(value) for name, value in item.items()}
+
+
+def deserialize_image(image: Optional[Dict]) -> Optional[Dict[str, Any]]:
+    """Plain dict from a stream record's DynamoDB-JSON image"""
+    if not image:
+        return None
+    return {name: _deserializer.deserialize(value) for name, value in image.items()}
+
+
+def stream_record_delta(record: Dict[str, Any]) -> Dict[str, float]:
+    """Aggregate delta for one DynamoDB Streams record"""
+    change = record.get('dynamodb', {})
+    return contribution_delta(
+        deserialize_image(change.get('OldImage')),
+        deserialize_image(change.get('NewImage'))
+    )
+
+
+class InsightsAggregateStore:
+    """The aggregate item in the insights aggregates table"""
+
+    def __init__(self, table, aggregate_id: str = AGGREGATE_ID):
+        self.table = table
+        self.key = {'aggregateId': aggregate_id}
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        item = self.table.get_item(Key=self.key, ConsistentRead=True).get('Item')
+        if not item or int(item.get('aggregateVersion', 0)) != AGGREGATE_VERSION:
+            return None
+        return item
+
+    def _marker_key(self, batch_id: str) -> Dict[str, str]:
+        return {'aggregateId': f"{self.key['aggregateId']}#batch#{batch_id}"}
+
+    def apply(self, delta: Dict[str, float], batch_id: Optional[str] = None) -> bool:
+        """
+        Add a delta in one atomic update. With a batch_id the update is a
+        transaction with the batch's marker item. Returns False when the batch
+        was already applied or there is no aggregate yet.
+        """
+        if not delta:
+            return True
+
+        names = {'#updatedAt': 'updatedAt', '#appliedBatches': 'appliedBatches'}
+        values = {':now': datetime.utcnow().isoformat(), ':one': 1}
+        additions = ['#appliedBatches :one']
+        for i, (name, value) in enumerate(sorted(delta.items())):
+            names[f'#a{i}'] = name
+            values[f':a{i}'] = _to_decimal(value)
+            additions.append(f'#a{i} :a{i}')
+
+        update = {
+            'UpdateExpression': f"ADD {', '.join(additions)} SET #updatedAt = :now",
+            'ConditionExpression': 'attribute_exists(aggregateId)',
+            'ExpressionAttributeNames': names
+        }
+
+        try:
+            if not batch_id:
+                self.table.update_item(Key=self.key, ExpressionAttributeValues=values, **update)
+                return True
+
+            marker = {
+                **self._marker_key(batch_id),
+                'batchId': batch_id,
+                'appliedAt': values[':now'],
+                'expiresAt': int(time.time()) + BATCH_MARKER_TTL_SECONDS
+            }
+            self.table.meta.client.transact_write_items(TransactItems=[
+                {'Put': {
+                    'TableName': self.table.name,
+                    'Item': _serialize(marker),
+                    'ConditionExpression': 'attribute_not_exists(aggregateId)'
+                }},
+                {'Update': {
+                    'TableName': self.table.name,
+                    'Key': _serialize(self.key),
+                    'ExpressionAttributeValues': _serialize(values),
+                    **update
+                }}
+            ])
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('ConditionalCheckFailedException', 'TransactionCanceledException'):
+                raise
+            return False
+
+    def begin_rebuild(self) -> Dict[str, Any]:
+        """
+        Claim the aggregate for a rebuild. Returns the guard replace() checks,
+        so a rebuild that raced with stream batches or with another rebuild
+        does not overwrite them.
+        """
+        token = uuid.uuid4().hex
+        try:
+            attributes = self.table.update_item(
+                Key=self.key,
+                UpdateExpression='SET #rebuildToken = :token',
+                ConditionExpression='attribute_exists(aggregateId)',
+                ExpressionAttributeNames={'#rebuildToken': 'rebuildToken'},
+                ExpressionAttributeValues={':token': token},
+                ReturnValues='ALL_NEW'
+            )['Attributes']
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            # No aggregate: stream batches are not applied until one exists
+            return {'token': token, 'exists': False}
+        return {'token': token, 'exists': True, 'appliedBatches': attributes.get('appliedBatches')}
+
+    def replace(self, totals: Dict[str, float], pages_scanned: int = 0,
+                guard: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Overwrite the aggregate with freshly computed totals. With a guard from
+        begin_rebuild(), returns None instead when the aggregate changed since.
+        """
+        item = {
+            **self.key,
+            **{name: _to_decimal(value) for name, value in totals.items() if value and name != 'percentiles'},
+            'percentiles': {
+                name: {stat: _to_decimal(value) for stat, value in stats.items()}
+                for name, stats in totals.get('percentiles', {}).items()
+            },
+            'aggregateVersion': AGGREGATE_VERSION,
+            'rebuiltAt': datetime.utcnow().isoformat(),
+            'updatedAt': datetime.utcnow().isoformat(),
+            'rebuildPagesScanned': pages_scanned
+        }
+        if guard is None:
+            self.table.put_item(Item=item)
+            return item
+
+        item['rebuildToken'] = guard['token']
+        item['appliedBatches'] = guard.get('appliedBatches') or 0
+        put_kwargs = {}
+        if not guard['exists']:
+            put_kwargs['ConditionExpression'] = 'attribute_not_exists(aggregateId)'
+        else:
+            put_kwargs['ExpressionAttributeNames'] = {
+                '#rebuildToken': 'rebuildToken', '#appliedBatches': 'appliedBatches'
+            }
+            put_kwargs['ExpressionAttributeValues'] = {':token': guard['token']}
+            if guard.get('appliedBatches') is None:
+                put_kwargs['ConditionExpression'] = '#rebuildToken = :token AND attribute_not_exists(#appliedBatches)'
+            else:
+                put_kwargs['ConditionExpression'] = '#rebuildToken = :token AND #appliedBatches = :applied'
+                put_kwargs['ExpressionAttributeValues'][':applied'] = guard['appliedBatches']
+
+        try:
+            self.table.put_item(Item=item, **put_kwargs)
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+            return None
+        return item
+
+
+def insight_scan_kwargs() -> Dict[str, Any]:
+    """ProjectionExpression (names aliased, several are reserved words) for INSIGHT_ATTRIBUTE_PATHS"""
+    names = {}
+    for path in INSIGHT_ATTRIBUTE_PATHS:
+        for name in path:
+            names.setdefault(name, f'#a{len(names)}')
+    return {
+        'ProjectionExpression': ', '.join('.'.join(names[name] for name in path) for path in INSIGHT_ATTRIBUTE_PATHS),
+        'ExpressionAttributeNames': {alias: name for name, alias in names.items()}
+    }
+
+
+def scan_insight_users(users_table) -> Iterable[Dict[str, Any]]:
+    """Every user profile, projected to the attributes the totals read"""
+    return parallel_scan(users_table, **insight_scan_kwargs())
+
+
+def compute_totals(users: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate totals over a whole population (what the deltas add up to),
+    plus percentiles, which only a full recompute can provide
+    """
+    columns = InsightColumns(users)
+    return {**totals_from_columns(columns), 'percentiles': percentiles_from_columns(columns)}
+
+
+def rebuild_aggregates(users_table, store: InsightsAggregateStore) -> Dict[str, Any]:
+    """
+    Recompute the aggregate from a full scan of the user profiles table. When
+    every attempt races with stream batches, returns the stored aggregate
+    (or, if there is none, the last scan's totals unstored).
+    """
+    for attempt in range(1, REBUILD_ATTEMPTS + 1):
+        started = time.time()
+        guard = store.begin_rebuild()
+        totals = compute_totals(scan_insight_users(users_table))
+        item = store.replace(totals, guard=guard)
+        if item is not None:
+            print(f"Insights aggregates rebuilt: {int(item.get('userCount', 0))} users in {time.time() - started:.2f}s")
+            return item
+        print(f"Insights rebuild attempt {attempt} raced with stream batches or another rebuild, discarded")
+
+    print(f"Insights aggregates not rebuilt after {REBUILD_ATTEMPTS} attempts, keeping the stream-maintained totals")
+    return store.load() or totals
+
+
+def batch_id_for(records: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Identifies a batch by all of its event IDs: a batch bisected after an
+    error shares its first record with the original, but not its contents
+    """
+    event_ids = [record.get('eventID') or '' for record in records]
+    if not any(event_ids):
+        return None
+    return hashlib.sha256('\n'.join(event_ids).encode('utf-8')).hexdigest()
+
+
+def apply_stream_records(records: List[Dict[str, Any]], store: InsightsAggregateStore) -> Dict[str, Any]:
+    """Apply one stream batch. Returns counts for logging."""
+    user_records = [r for r in records if r.get('eventSource') == 'aws:dynamodb']
+    delta = merge_deltas(stream_record_delta(record) for record in user_records)
+    batch_id = batch_id_for(user_records)
+
+    applied = store.apply(delta, batch_id)
+    if not applied:
+        # Either a redelivered batch or no aggregate yet; a missing aggregate is built from scratch
+        if store.load() is None:
+            return {'records': len(user_records), 'applied': False, 'missingAggregate': True}
+        print(f"Stream batch {batch_id} was already applied, skipping")
+    return {'records': len(user_records), 'applied': applied, 'counters': len(delta)}
+
+
+def render_insights(aggregate: Dict[str, Any]) -> Dict[str, Any]:
+    """The /admin/insights payload from aggregate totals"""
+    value = lambda name: float(aggregate.get(name, 0))
+    count = lambda name: int(aggregate.get(name, 0))
+    percentiles = aggregate.get('percentiles') or {}
+    percentile = lambda name, stat: float(percentiles.get(name, {}).get(stat, 0))
+
+    total_users = count('userCount')
+    high_burden_count = count('statusHighBurden')
+
+    total_debt = value('loanAmountSum')
+    remaining_debt = value('remainingBalanceSum')
+
+    monthly_emi_total = value('monthlyEmiSum')
+    annual_cost = monthly_emi_total * MATCH_SHARE_OF_EMI * 12
+    retained_employees = int(high_burden_count * RETENTION_RATE)
+    turnover_savings = retained_employees * TURNOVER_COST
+    roi_percent = round(((turnover_savings - annual_cost) / annual_cost) * 100, 1) if annual_cost else 0
+
+    return {
+        'financialStress': {
+            'highBurdenCount': high_burden_count,
+            'highBurdenPercent': round(high_burden_count / total_users * 100, 1) if total_users else 0,
+            'manageableCount': count('statusManageable'),
+            'moderateCount': count('statusModerateBurden'),
+            'noDebtCount': count('statusNoDebt'),
+            'totalUsers': total_users
+        },
+        'debtToIncome': {
+            'averageDTI': round(value('dtiSum') / total_users, 2) if total_users else 0,
+            'above30Count': count('dtiAbove30'),
+            'above40Count': count('dtiAbove40'),
+            'distribution': {label: count(f"dtiBucket_{label}") for label, _, _ in DTI_BUCKETS},
+            'medianDTI': percentile('dti', 'median'),
+            'p90DTI': percentile('dti', 'p90')
+        },
+        'totalDebt': {
+            'originalDebt': round(total_debt, 2),
+            'remainingDebt': round(remaining_debt, 2),
+            'paidOff': round(total_debt - remaining_debt, 2),
+            'averageLoan': round(total_debt / total_users, 2) if total_users else 0,
+            'medianLoan': percentile('loanAmount', 'median'),
+            'p90Loan': percentile('loanAmount', 'p90')
+        },
+        'interestSavings': {
+            'highInterestCount': count('highInterestCount'),
+            'potentialSavings': round(value('potentialSavingsSum'), 2),
+            'distribution': {label: count(f"interestBucket_{label}") for label, _, _ in INTEREST_BUCKETS},
+            'averageInterestRate': round(value('interestRateSum') / total_users, 2) if total_users else 0,
+            'medianInterestRate': percentile('interestRate', 'median'),
+            'p90InterestRate': percentile('interestRate', 'p90')
+        },
+        'roi': {
+            'annualCost': round(annual_cost, 2),
+            'retainedEmployees': retained_employees,
+            'turnoverSavings': turnover_savings,
+            'roiPercent': roi_percent
+        },
+        # Stream updates keep the counts current; percentiles are as of the last rebuild
+        'percentilesAsOf': aggregate.get('rebuiltAt')
+    }
@@ -1,13 +1,41 @@
+import base64
 import json
 import boto3
+from botocore.exceptions import ClientError
 from decimal import Decimal
 import os
+import time
 from datetime import datetime
 
+from population_snapshot import get_population_snapshot, snapshot_info
+from policy_analysis import evaluate_policies, MAX_POLICIES
+from cost_forecast import forecast_program_cost
+from insights_aggregates import (
+    InsightsAggregateStore, apply_stream_records, compute_totals, rebuild_aggregates, render_insights,
+    scan_insight_users
+)
+from response_cache import ResponseCache, serve_cached
+from response_compression import compress_response
+from user_listing import (
+    APPROVAL_STATUSES, FILTERED_LISTING_EXCLUDES, parse_fields, parse_page_size, parse_filters, check_index_fields, scan_page, scan_all,
+    query_page, query_all
+)
+from user_search import get_search_index, parse_search_params, search_info, update_cached_user
+
 # Initialize DynamoDB
 dynamodb = boto3.resource('dynamodb')
 table_name = os.environ.get('USERS_TABLE', 'asu-user-profiles')
 table = dynamodb.Table(table_name)
+insights_table = dynamodb.Table(os.environ.get('INSIGHTS_TABLE', 'admin-insights-aggregates'))
+insights_store = InsightsAggregateStore(insights_table)
+lambda_client = boto3.client('lambda')
+
+# A stream batch that finds no aggregate requests a rebuild at most this often per container
+REBUILD_REQUEST_INTERVAL_SECONDS = int(os.environ.get('REBUILD_REQUEST_INTERVAL_SECONDS', '300'))
+_rebuild_requested_at = 0.0
+
+# Computed GET responses, reused across warm invocations
+response_cache = ResponseCache()
 
 
 def decimal_to_float(obj):
@@ -21,29 +49,60 @@ def decimal_to_float(obj):
     return obj
 
 
+def request_body(event):
+    """
+    The JSON request body. API Gateway base64-encodes bodies (isBase64Encoded)
+    because */* is a binary media type for compressed responses.
+    """
+    body = event.get('body')
+    if body and event.get('isBase64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    return json.loads(body or '{}')
+
+
 def lambda_handler(event, context):
     """
     Lambda handler with endpoints:
-    1. GET /admin/users - Get all users
+    1. GET /admin/users - List users (slim projection, optional cursor pagination)
     2. GET /admin/users/{asuId} - Get specific user
     3. GET /admin/users/{asuId}/documents - Get document URLs [NEW]
     4. GET /admin/users/{asuId}/status - Get approval status [NEW]
     5. POST /admin/users/{asuId}/approval - Update approval status [NEW]
+    6. POST /admin/policy-analysis - Compare candidate match policies [NEW]
+    7. POST /admin/forecast - Multi-year program cost forecast [NEW]
+    8. GET /admin/insights - Business insights from the stream-maintained aggregate
+    9. GET /admin/users/search - Ranked search over name, email and ASU ID
+
+    Also consumes the user profiles DynamoDB stream and {"action": "rebuild-insights"}.
     """
 
-    print(f"Event received: {json.dumps(event)}")
+    # DynamoDB Streams batch from the user profiles table
+    if event.get('Records'):
+        return handle_user_stream(event, context)
 
-    http_method = event.get('httpMethod', '')
-    path = event.get('path', '')
+    # Scheduled or manual reconciliation of the insights aggregate
+    if event.get('action') == 'rebuild-insights':
+        return rebuild_insights()
+
+    print(f"Event received: {json.dumps(event)}")
 
     # CORS headers
     headers = {
         'Content-Type': 'application/json',
         'Access-Control-Allow-Origin': '*',
-        'Access-Control-Allow-Headers': 'Content-Type,Authorization',
-        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS'
+        'Access-Control-Allow-Headers': 'Content-Type,Authorization,If-None-Match',
+        'Access-Control-Allow-Methods': 'GET,POST,PUT,DELETE,OPTIONS',
+        'Access-Control-Expose-Headers': 'ETag'
     }
 
+    return compress_response(event, route_request(event, headers))
+
+
+def route_request(event, headers):
+    """Dispatch an API Gateway request to its endpoint"""
+    http_method = event.get('httpMethod', '')
+    path = event.get('path', '')
+
     try:
         # Handle OPTIONS for CORS preflight
         if http_method == 'OPTIONS':
@@ -54,11 +113,25 @@ def lambda_handler(event, context):
             }
 
         if http_method == 'GET' and path == '/admin/insights':
-            return get_business_insights(headers)
+            params = event.get('queryStringParameters') or {}
+            return serve_cached(
+                response_cache, event, headers,
+                lambda: get_business_insights(event, headers),
+                bypass=params.get('refresh') == 'true'
+            )
+
+        if http_method == 'POST' and path == '/admin/policy-analysis':
+            return analyze_match_policies(event, headers)
+
+        if http_method == 'POST' and path == '/admin/forecast':
+            return get_cost_forecast(event, headers)
 
         # Route 1: GET all users
         if http_method == 'GET' and path == '/admin/users':
-            return get_all_users(event, headers)
+            return serve_cached(response_cache, event, headers, lambda: get_all_users(event, headers))
+
+        if http_method == 'GET' and path == '/admin/users/search':
+            return search_users(event, headers)
 
         # Route 2: GET user documents [NEW]
         if http_method == 'GET' and '/documents' in path:
@@ -99,89 +172,161 @@ def lambda_handler(event, context):
 
 
 def get_all_users(event, headers):
-    """Get all users with approvalStatus and hasDocuments"""
+    """
+    List users with approvalStatus and hasDocuments, using the slim list projection.
+
+    Query parameters (all optional):
+    - fields: comma-separated attributes to return instead of the default list fields
+    - pageSize (or limit): return one page of at most this many users
+    - cursor: nextCursor from the previous page
+    - status: only users with this approvalStatus (queries an index)
+    - hasDocuments: true|false, only users with / without uploaded documents
+    - order: asc|desc by updatedAt (documentsUploadedAt with hasDocuments=true), oldest first by default
+    Without pageSize/limit/cursor every user is returned.
+    """
     try:
         params = event.get('queryStringParameters') or {}
-        limit = params.get('limit')
 
-        if limit:
-            limit = int(limit)
-            print(f"Fetching {limit} users from table: {table_name}")
-            response = table.scan(Limit=limit)
-            users = response.get('Items', [])
+        try:
+            fields = parse_fields(params.get('fields'))
+            paged = any(params.get(name) for name in ('pageSize', 'limit', 'cursor'))
+            page_size = parse_page_size(params.get('pageSize') or params.get('limit')) if paged else None
+            filters = parse_filters(params)
+            if filters:
+                check_index_fields(fields)
+        except ValueError as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'Invalid query parameters', 'message': str(e)})
+            }
 
+        if filters and paged:
+            print(f"Fetching a page of {page_size} users from table: {table_name} with filters {filters}")
+            try:
+                page = query_page(table, filters, fields, page_size, params.get('cursor'))
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': json.dumps({'error': 'Invalid cursor', 'message': str(e)})
+                }
+            users = page['items']
+            extra = {
+                'pageSize': page_size, 'nextCursor': page['nextCursor'], 'index': page['index'],
+                'queriesRead': page['queriesRead'], 'excludes': FILTERED_LISTING_EXCLUDES
+            }
+        elif filters:
+            print(f"Fetching users from table: {table_name} with filters {filters}")
+            result = query_all(table, filters, fields)
+            users = result['items']
+            extra = {'pagesRead': result['pagesRead'], 'index': result['index'], 'excludes': FILTERED_LISTING_EXCLUDES}
+            print(f"Retrieved {len(users)} users in {result['pagesRead']} pages from {result['index']}")
+        elif paged:
+            print(f"Fetching a page of {page_size} users from table: {table_name}")
+            try:
+                page = scan_page(table, fields, page_size, params.get('cursor'))
+            except ValueError as e:
+                return {
+                    'statusCode': 400,
+                    'headers': headers,
+                    'body': json.dumps({'error': 'Invalid cursor', 'message': str(e)})
+                }
+            users = page['items']
+            extra = {'pageSize': page_size, 'nextCursor': page['nextCursor']}
+        else:
+            print(f"Fetching ALL users from table: {table_name}")
+            result = scan_all(table, fields)
+            users = result['items']
+            extra = {'pagesScanned': result['pagesScanned']}
+            print(f"Retrieved {len(users)} users in {result['pagesScanned']} pages")
+
+        if 'documents' in fields:
             for user in users:
                 docs = user.get('documents', {})
                 user['hasDocuments'] = bool(
                     docs.get('loanDocUrl') or docs.get('loanDocKey')
                 )
 
-            users = decimal_to_float(users)
-            users.sort(key=lambda x: x.get('hasDocuments', False), reverse=True)
+        # Filtered listings keep index order. Scans return segments in any order, so
+        # they are sorted to keep ETags stable.
+        if not filters:
+            users.sort(key=lambda x: (not x.get('hasDocuments', False), str(x.get('asuId', ''))))
+        users = decimal_to_float(users)
 
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'success': True,
+                'count': len(users),
+                'users': users,
+                'tableName': table_name,
+                **extra
+            }, separators=(',', ':'))
+        }
+
+    except Exception as e:
+        print(f"Error in get_all_users: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e), 'tableName': table_name})
+        }
+
+
+def search_users(event, headers):
+    """
+    Search users by first name, last name, ASU email or ASU ID from the
+    container's search index, without reading the table per request.
+
+    Query parameters:
+    - q: search text; every word must match (prefix, exact or close spelling)
+    - limit: maximum results (default 20, at most 100)
+    - refresh: true to rebuild the index from a full scan first
+    """
+    try:
+        params = event.get('queryStringParameters') or {}
+
+        try:
+            query, limit = parse_search_params(params)
+        except ValueError as e:
             return {
-                'statusCode': 200,
+                'statusCode': 400,
                 'headers': headers,
-                'body': json.dumps({
-                    'success': True,
-                    'count': len(users),
-                    'users': users,
-                    'tableName': table_name
-                }, indent=2)
+                'body': json.dumps({'error': 'Invalid search parameters', 'message': str(e)})
             }
 
-        # Fetch ALL users
-        print(f"Fetching ALL users from table: {table_name}")
-        all_users = []
-        last_evaluated_key = None
-        page_count = 0
-
-        while True:
-            page_count += 1
-            print(f"Scanning page {page_count}...")
-
-            if last_evaluated_key:
-                response = table.scan(ExclusiveStartKey=last_evaluated_key)
-            else:
-                response = table.scan()
-
-            items = response.get('Items', [])
-            all_users.extend(items)
-            print(f"Page {page_count}: Retrieved {len(items)} items. Total: {len(all_users)}")
-
-            last_evaluated_key = response.get('LastEvaluatedKey')
-            if not last_evaluated_key:
-                break
-
-        for user in all_users:
-            docs = user.get('documents', {})
-            user['hasDocuments'] = bool(
-                docs.get('loanDocUrl') or docs.get('loanDocKey')
-            )
-
-        all_users = decimal_to_float(all_users)
-        all_users.sort(key=lambda x: x.get('hasDocuments', False), reverse=True)
+        index = get_search_index(table, force_refresh=params.get('refresh') == 'true')
+        started = time.time()
+        found = index.search(query, limit)
+        results = decimal_to_float(found['results'])
 
         return {
             'statusCode': 200,
             'headers': headers,
             'body': json.dumps({
                 'success': True,
-                'count': len(all_users),
-                'users': all_users,
-                'tableName': table_name,
-                'pagesScanned': page_count
-            }, indent=2)
+                'query': query,
+                'count': len(results),
+                'results': results,
+                # A broad query was cut to MAX_SEARCH_CANDIDATES candidates (see user_search)
+                'truncated': found['truncated'],
+                'tookMs': round((time.time() - started) * 1000, 2),
+                **search_info(index)
+            }, separators=(',', ':'))
         }
 
     except Exception as e:
-        print(f"Error in get_all_users: {str(e)}")
+        print(f"Error in search_users: {str(e)}")
         import traceback
         traceback.print_exc()
         return {
             'statusCode': 500,
             'headers': headers,
-            'body': json.dumps({'error': str(e), 'tableName': table_name})
+            'body': json.dumps({'error': str(e)})
         }
 
 
@@ -209,7 +354,7 @@ def get_user_by_id(event, headers):
         return {
             'statusCode': 200,
             'headers': headers,
-            'body': json.dumps({'success': True, 'user': user}, indent=2)
+            'body': json.dumps({'success': True, 'user': user}, separators=(',', ':'))
         }
 
     except Exception as e:
@@ -275,7 +420,7 @@ def get_user_documents(event, headers):
                     }
                 },
                 'uploadedAt': docs.get('uploadedAt')
-            }, indent=2)
+            }, separators=(',', ':'))
         }
 
     except Exception as e:
@@ -340,17 +485,16 @@ def update_approval_status(event, headers):
         path_parts = path.split('/')
         asu_id = path_parts[-2]
 
-        body = json.loads(event.get('body', '{}'))
+        body = request_body(event)
         approval_status = body.get('approvalStatus', 'pending')
 
-        valid_statuses = ['pending', 'approved', 'rejected']
-        if approval_status not in valid_statuses:
+        if approval_status not in APPROVAL_STATUSES:
             return {
                 'statusCode': 400,
                 'headers': headers,
                 'body': json.dumps({
                     'error': 'Invalid approval status',
-                    'validStatuses': valid_statuses,
+                    'validStatuses': list(APPROVAL_STATUSES),
                     'received': approval_status
                 })
             }
@@ -358,14 +502,18 @@ def update_approval_status(event, headers):
         print(f"Updating approval status for {asu_id}: {approval_status}")
         current_time = datetime.utcnow().isoformat()
 
-        table.update_item(
+        updated_user = table.update_item(
             Key={'asuId': asu_id},
             UpdateExpression='SET approvalStatus = :status, updatedAt = :time',
             ExpressionAttributeValues={
                 ':status': approval_status,
                 ':time': current_time
-            }
-        )
+            },
+            ReturnValues='ALL_NEW'
+        )['Attributes']
+        response_cache.invalidate('/admin/users')
+        # Other containers see it at their next incremental refresh (SEARCH_REFRESH_SECONDS)
+        update_cached_user(updated_user)
 
         return {
             'statusCode': 200,
@@ -389,155 +537,197 @@ def update_approval_status(event, headers):
             'body': json.dumps({'error': str(e)})
         }
 
-def get_business_insights(headers):
+def get_business_insights(event, headers):
     """
-    Calculate and return 5 business insights for dashboard analytics.
-    Updated for DynamoDB nested map structure (no JSON parsing needed).
+    Return the 5 business insights for dashboard analytics.
+
+    Served from the aggregate item kept current by the user profiles stream
+    (one read). ?refresh=true rebuilds it from a full scan first.
     """
     try:
-        # Scan all users
-        all_users = []
-        last_evaluated_key = None
-        while True:
-            if last_evaluated_key:
-                response = table.scan(ExclusiveStartKey=last_evaluated_key)
-            else:
-                response = table.scan()
-            items = response.get('Items', [])
-            all_users.extend(items)
-            last_evaluated_key = response.get('LastEvaluatedKey')
-            if not last_evaluated_key:
-                break
-        all_users = decimal_to_float(all_users)
-        total_users = len(all_users)
-
-        # Initialize lists and counters
-        status_counts = {"High Burden": 0, "Moderate Burden": 0, "Manageable": 0, "No Debt": 0}
-        loan_amounts, interest_rates, dti_list, remaining_balances, monthly_emis = [], [], [], [], []
-
-        for user in all_users:
-            # --- Loan details ---
-            loan_data = user.get('loanApplication', {})
-            if isinstance(loan_data, dict):
-                loan_amount = float(loan_data.get('loanAmount', 0))
-                interest_rate = float(loan_data.get('interestRate', 0))
-            else:
-                loan_amount = 0
-                interest_rate = 0
-
-            # --- Recommendation details ---
-            rec_data = user.get('latestRecommendation', {})
-            dti = 0
-            if isinstance(rec_data, dict):
-                try:
-                    dti = float(
-                        rec_data.get('financialProjections', {})
-                        .get('debtToIncomeImpact', {})
-                        .get('afterMatch', 0)
-                    )
-                except Exception:
-                    dti = 0
-
-            # --- Repayment data ---
-            remaining = float(user.get('remaining_balance', 0))
-            emi = float(user.get('monthly_emi', 0))
-
-            loan_amounts.append(loan_amount)
-            interest_rates.append(interest_rate)
-            dti_list.append(dti)
-            remaining_balances.append(remaining)
-            monthly_emis.append(emi)
-
-            # --- Status ---
-            status = user.get('repayment_status', 'Unknown')
-            if status in status_counts:
-                status_counts[status] += 1
-
-        # --- Derived Metrics ---
-        avg_dti = round(sum(dti_list) / total_users, 2) if total_users else 0
-        above_30 = sum(1 for dti in dti_list if dti > 30)
-        above_40 = sum(1 for dti in dti_list if dti > 40)
-        dti_distribution = {
-            "<10": sum(1 for dti in dti_list if dti < 10),
-            "10-20": sum(1 for dti in dti_list if 10 <= dti < 20),
-            "20-30": sum(1 for dti in dti_list if 20 <= dti < 30),
-            "30-40": sum(1 for dti in dti_list if 30 <= dti < 40),
-            ">40": sum(1 for dti in dti_list if dti >= 40)
+        params = event.get('queryStringParameters') or {}
+        source = 'aggregate'
+
+        try:
+            aggregate = None if params.get('refresh') == 'true' else insights_store.load()
+            if aggregate is None:
+                aggregate = rebuild_aggregates(table, insights_store)
+                source = 'rebuild'
+        except ClientError as e:
+            # Aggregates table unavailable: compute from a full scan without storing
+            print(f"Insights aggregate unavailable, computing from a scan: {str(e)}")
+            aggregate = compute_totals(scan_insight_users(table))
+            source = 'scan'
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'success': True,
+                'insights': render_insights(aggregate),
+                'source': source,
+                'updatedAt': aggregate.get('updatedAt')
+            }, separators=(',', ':'))
+        }
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
+        }
+
+
+def handle_user_stream(event, context):
+    """Apply a DynamoDB Streams batch from the user profiles table to the insights aggregate"""
+    records = event.get('Records', [])
+    result = apply_stream_records(records, insights_store)
+    response_cache.invalidate('/admin/insights')
+    if result.get('missingAggregate'):
+        # The rebuild's scan reflects this batch; it runs in its own invocation so the stream is not held up
+        result['rebuildRequested'] = request_insights_rebuild(context)
+    print(f"Insights stream batch: {result}")
+    return result
+
+
+def request_insights_rebuild(context):
+    """Invoke this function asynchronously with {"action": "rebuild-insights"}"""
+    global _rebuild_requested_at
+    if time.time() - _rebuild_requested_at < REBUILD_REQUEST_INTERVAL_SECONDS:
+        return False
+
+    function_name = getattr(context, 'function_name', None) or os.environ.get('AWS_LAMBDA_FUNCTION_NAME')
+    lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType='Event',
+        Payload=json.dumps({'action': 'rebuild-insights'}).encode('utf-8')
+    )
+    _rebuild_requested_at = time.time()
+    return True
+
+
+def rebuild_insights():
+    """Reconcile the insights aggregate with a full scan ({"action": "rebuild-insights"})"""
+    item = rebuild_aggregates(table, insights_store)
+    return {
+        'success': True,
+        'userCount': int(item.get('userCount', 0)),
+        'rebuiltAt': item.get('rebuiltAt')
+    }
+
+
+def analyze_match_policies(event, headers):
+    """
+    Evaluate candidate employer match policies against the whole population.
+
+    Expected body:
+    {
+        "policies": [
+            {"name": "5% salary cap", "maxSalaryPercentageCap": 5},
+            {"name": "$400 monthly cap", "maxMonthlyMatchCap": 400}
+        ],
+        "baseline": {"maxMonthlyMatchCap": 500, "maxAnnualMatchCap": 5500, "maxSalaryPercentageCap": 6}
+    }
+    """
+    try:
+        body = request_body(event)
+        params = event.get('queryStringParameters') or {}
+        policies = body.get('policies', [])
+
+        if not isinstance(policies, list) or not policies:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'policies must be a non-empty list'})
+            }
+
+        if len(policies) > MAX_POLICIES:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({
+                    'error': f'At most {MAX_POLICIES} policies can be evaluated per request',
+                    'received': len(policies)
+                })
+            }
+
+        snapshot = get_population_snapshot(
+            table,
+            force_refresh=params.get('refresh') == 'true'
+        )
+
+        try:
+            analysis = evaluate_policies(snapshot, policies, body.get('baseline'))
+        except (ValueError, TypeError) as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'Invalid policy', 'message': str(e)})
+            }
+
+        return {
+            'statusCode': 200,
+            'headers': headers,
+            'body': json.dumps({
+                'success': True,
+                **snapshot_info(snapshot),
+                **analysis
+            }, separators=(',', ':'))
         }
 
-        total_debt = sum(loan_amounts)
-        remaining_debt = sum(remaining_balances)
-        paid_off = total_debt - remaining_debt
-
-        # --- Interest Savings ---
-        high_interest_count = sum(1 for r in interest_rates if r > 7)
-        interest_distribution = {
-            "<5": sum(1 for r in interest_rates if 0 < r < 5),
-            "5-6": sum(1 for r in interest_rates if 5 <= r < 6),
-            "6-7": sum(1 for r in interest_rates if 6 <= r < 7),
-            ">7": sum(1 for r in interest_rates if r >= 7)
+    except Exception as e:
+        print(f"Error in analyze_match_policies: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {
+            'statusCode': 500,
+            'headers': headers,
+            'body': json.dumps({'error': str(e)})
         }
 
-        potential_savings = 0
-        for rate, balance in zip(interest_rates, remaining_balances):
-            years = 10  # assume 10 years average
-            if rate > 7 and balance > 0:
-                current_interest = balance * (rate / 100) * years
-                new_interest = balance * (5 / 100) * years
-                potential_savings += (current_interest - new_interest)
-
-        # --- ROI Calculation ---
-        monthly_emi_total = sum(monthly_emis)
-        annual_cost = monthly_emi_total * 0.5 * 12  # 50% match
-        high_burden_count = status_counts["High Burden"]
-        retained_employees = int(high_burden_count * 0.35)
-        turnover_savings = retained_employees * 50000
-        roi_percent = round(((turnover_savings - annual_cost) / annual_cost) * 100, 1) if annual_cost else 0
-
-        # --- Final JSON ---
+
+def get_cost_forecast(event, headers):
+    """
+    Project employer match cost, payoffs and roll-off year by year.
+
+    Expected body (all fields optional):
+    {
+        "assumptions": {"years": 10, "annualAttritionRate": 0.12, "newHiresPerYear": 200, "salaryGrowthRate": 0.03},
+        "policy": {"maxMonthlyMatchCap": 500, "maxAnnualMatchCap": 5500, "maxSalaryPercentageCap": 6}
+    }
+    """
+    try:
+        body = request_body(event)
+        params = event.get('queryStringParameters') or {}
+
+        snapshot = get_population_snapshot(
+            table,
+            force_refresh=params.get('refresh') == 'true'
+        )
+
+        try:
+            forecast = forecast_program_cost(snapshot, body.get('assumptions'), body.get('policy'))
+        except (ValueError, TypeError) as e:
+            return {
+                'statusCode': 400,
+                'headers': headers,
+                'body': json.dumps({'error': 'Invalid forecast parameters', 'message': str(e)})
+            }
+
         return {
             'statusCode': 200,
             'headers': headers,
             'body': json.dumps({
                 'success': True,
-                'insights': {
-                    'financialStress': {
-                        'highBurdenCount': status_counts["High Burden"],
-                        'highBurdenPercent': round(status_counts["High Burden"] / total_users * 100, 1) if total_users else 0,
-                        'manageableCount': status_counts["Manageable"],
-                        'moderateCount': status_counts["Moderate Burden"],
-                        'noDebtCount': status_counts["No Debt"],
-                        'totalUsers': total_users
-                    },
-                    'debtToIncome': {
-                        'averageDTI': avg_dti,
-                        'above30Count': above_30,
-                        'above40Count': above_40,
-                        'distribution': dti_distribution
-                    },
-                    'totalDebt': {
-                        'originalDebt': round(total_debt, 2),
-                        'remainingDebt': round(remaining_debt, 2),
-                        'paidOff': round(paid_off, 2),
-                        'averageLoan': round(sum(loan_amounts) / total_users, 2) if total_users else 0
-                    },
-                    'interestSavings': {
-                        'highInterestCount': high_interest_count,
-                        'potentialSavings': round(potential_savings, 2),
-                        'distribution': interest_distribution,
-                        'averageInterestRate': round(sum(interest_rates) / total_users, 2) if total_users else 0
-                    },
-                    'roi': {
-                        'annualCost': round(annual_cost, 2),
-                        'retainedEmployees': retained_employees,
-                        'turnoverSavings': turnover_savings,
-                        'roiPercent': roi_percent
-                    }
-                }
-            }, indent=2)
+                **snapshot_info(snapshot),
+                'forecast': forecast
+            }, separators=(',', ':'))
         }
 
     except Exception as e:
+        print(f"Error in get_cost_forecast: {str(e)}")
         import traceback
         traceback.print_exc()
         return {
@@ -0,0 +1,137 @@
+"""
+Parallel segmented scans of a DynamoDB table.
+
+A sequential scan reads one page (up to 1 MB) per round trip, so a full read
+of a large table is bound by latency, not by throughput. parallel_scan()
+splits the table into TotalSegments segments and scans them from a thread
+pool. Pages are handed to the caller as soon as any segment returns them.
+
+Throttled pages are retried with capped, jittered exponential backoff on top of
+botocore's own retries, so a burst of segments against a provisioned table
+slows down instead of failing the whole read.
+"""
+
+import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+SCAN_SEGMENTS = int(os.environ.get('SCAN_SEGMENTS', '8'))
+MAX_SCAN_SEGMENTS = 64
+SCAN_MAX_RETRIES = int(os.environ.get('SCAN_MAX_RETRIES', '8'))
+SCAN_BACKOFF_SECONDS = float(os.environ.get('SCAN_BACKOFF_SECONDS', '0.1'))
+SCAN_MAX_BACKOFF_SECONDS = float(os.environ.get('SCAN_MAX_BACKOFF_SECONDS', '5'))
+
+THROTTLE_CODES = {
+    'ProvisionedThroughputExceededException',
+    'ThrottlingException',
+    'RequestLimitExceeded'
+}
+
+# Pages buffered per segment before workers wait for the caller to catch up
+PAGES_BUFFERED_PER_SEGMENT = 2
+
+_DONE = object()
+
+
+def _scan_with_backoff(table, scan_kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """One scan call, retried with exponential backoff while throttled"""
+    for attempt in range(SCAN_MAX_RETRIES + 1):
+        try:
+            return table.scan(**scan_kwargs)
+        except ClientError as e:
+            code = e.response.get('Error', {}).get('Code')
+            if code not in THROTTLE_CODES or attempt == SCAN_MAX_RETRIES:
+                raise
+            delay = min(SCAN_MAX_BACKOFF_SECONDS, SCAN_BACKOFF_SECONDS * (2 ** attempt))
+            segment = scan_kwargs.get('Segment', 0)
+            print(f"Scan segment {segment} throttled (attempt {attempt + 1}), retrying in {delay:.2f}s")
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+
+def _scan_pages(table, scan_kwargs: Dict[str, Any], stop: Optional[threading.Event] = None) -> Iterator[List[Dict]]:
+    """Pages of one (segment of a) scan"""
+    scan_kwargs = dict(scan_kwargs)
+    while stop is None or not stop.is_set():
+        response = _scan_with_backoff(table, scan_kwargs)
+        yield response.get('Items', [])
+        last_evaluated_key = response.get('LastEvaluatedKey')
+        if not last_evaluated_key:
+            break
+        scan_kwargs['ExclusiveStartKey'] = last_evaluated_key
+
+
+def _put(pages: queue.Queue, message, stop: threading.Event) -> bool:
+    """Queue a message unless the caller has stopped reading"""
+    while not stop.is_set():
+        try:
+            pages.put(message, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def parallel_scan_pages(table, segments: Optional[int] = None, **scan_kwargs) -> Iterator[List[Dict]]:
+    """
+    Scan the whole table with `segments` parallel segment scans and yield
+    pages in the order they arrive. Extra keyword arguments (e.g.
+    ProjectionExpression) are passed to every scan call.
+    The first error from any segment is raised to the caller.
+    """
+    segments = max(1, min(SCAN_SEGMENTS if segments is None else segments, MAX_SCAN_SEGMENTS))
+    if segments == 1:
+        yield from _scan_pages(table, scan_kwargs)
+        return
+
+    pages = queue.Queue(maxsize=segments * PAGES_BUFFERED_PER_SEGMENT)
+    stop = threading.Event()
+
+    def scan_segment(segment):
+        try:
+            segment_kwargs = {**scan_kwargs, 'Segment': segment, 'TotalSegments': segments}
+            for page in _scan_pages(table, segment_kwargs, stop):
+                if not _put(pages, page, stop):
+                    return
+            _put(pages, _DONE, stop)
+        except Exception as e:
+            _put(pages, e, stop)
+
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        for segment in range(segments):
+            pool.submit(scan_segment, segment)
+
+        try:
+            remaining = segments
+            while remaining:
+                message = pages.get()
+                if message is _DONE:
+                    remaining -= 1
+                elif isinstance(message, Exception):
+                    raise message
+                else:
+                    yield message
+        finally:
+            # Also reached when the caller stops iterating early
+            stop.set()
+
+
+def parallel_scan(table, segments: Optional[int] = None, **scan_kwargs) -> Iterator[Dict]:
+    """Items of a parallel scan, streamed as their pages arrive"""
+    for page in parallel_scan_pages(table, segments, **scan_kwargs):
+        yield from page
+
+
+def parallel_scan_all(table, segments: Optional[int] = None, **scan_kwargs) -> Dict[str, Any]:
+    """Every item of the table: {'items': [...], 'pagesScanned': int}"""
+    items = []
+    pages = 0
+    for page in parallel_scan_pages(table, segments, **scan_kwargs):
+        items.extend(page)
+        pages += 1
+    return {'items': items, 'pagesScanned': pages}
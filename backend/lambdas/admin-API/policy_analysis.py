@@ -0,0 +1,184 @@
+"""
+Population-level employer match policy sensitivity analysis.
+
+Applies the same match rules as calculate_match_lambda's fallback
+recommendation (DTI-based match percentage, then the monthly, annual and
+salary percentage caps) to every employee at once, for many candidate
+policies at a time.
+"""
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+DEFAULT_POLICY = {
+    'maxMonthlyMatchCap': 500.0,
+    'maxAnnualMatchCap': 5500.0,
+    'maxSalaryPercentageCap': 6.0
+}
+
+MAX_POLICIES = 100
+
+# Upper bound on policy x employee cells evaluated per NumPy pass
+MAX_CELLS_PER_PASS = 8_000_000
+
+CAP_NONE, CAP_SALARY, CAP_MONTHLY, CAP_ANNUAL = 0, 1, 2, 3
+CAP_LABELS = {
+    CAP_SALARY: 'salary_percentage',
+    CAP_MONTHLY: 'monthly_policy',
+    CAP_ANNUAL: 'annual_policy',
+    CAP_NONE: 'none'
+}
+
+
+def normalize_policy(policy: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fill in defaults and validate one candidate policy.
+    Raises ValueError using the same rules as calculate_match validate_input.
+    """
+    if not isinstance(policy, dict):
+        raise ValueError("Each policy must be an object")
+
+    normalized = {
+        'name': policy.get('name'),
+        'maxMonthlyMatchCap': float(policy.get('maxMonthlyMatchCap', DEFAULT_POLICY['maxMonthlyMatchCap'])),
+        'maxAnnualMatchCap': float(policy.get('maxAnnualMatchCap', DEFAULT_POLICY['maxAnnualMatchCap'])),
+        'maxSalaryPercentageCap': float(policy.get('maxSalaryPercentageCap', DEFAULT_POLICY['maxSalaryPercentageCap'])),
+        'matchPercentage': None
+    }
+
+    if normalized['maxMonthlyMatchCap'] <= 0:
+        raise ValueError("maxMonthlyMatchCap must be positive")
+    if normalized['maxAnnualMatchCap'] <= 0:
+        raise ValueError("maxAnnualMatchCap must be positive")
+    if normalized['maxSalaryPercentageCap'] <= 0 or normalized['maxSalaryPercentageCap'] > 100:
+        raise ValueError("maxSalaryPercentageCap must be between 0 and 100")
+
+    # Optional fixed match percentage instead of the DTI-based tiers
+    if policy.get('matchPercentage') is not None:
+        match_percentage = float(policy['matchPercentage'])
+        if match_percentage <= 0 or match_percentage > 100:
+            raise ValueError("matchPercentage must be between 0 and 100")
+        normalized['matchPercentage'] = match_percentage
+
+    return normalized
+
+
+def dti_match_percentage(monthly_emi: np.ndarray, monthly_salary: np.ndarray) -> np.ndarray:
+    """DTI tiers from create_fallback_recommendation: <15% -> 100, <25% -> 75, else 50"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dti = np.where(monthly_salary > 0, np.round(monthly_emi / monthly_salary * 100, 2), 0.0)
+    return np.select([dti < 15, dti < 25], [100.0, 75.0], default=50.0)
+
+
+def compute_matches(monthly_emi: np.ndarray, monthly_salary: np.ndarray,
+                    policies: List[Dict[str, Any]], tier_percentage: Optional[np.ndarray] = None):
+    """
+    Evaluate policies against every employee.
+    Returns (monthly_match, annual_match, cap_codes), each shaped (policies, employees).
+    """
+    if tier_percentage is None:
+        tier_percentage = dti_match_percentage(monthly_emi, monthly_salary)
+
+    monthly_cap = np.array([p['maxMonthlyMatchCap'] for p in policies])[:, None]
+    annual_cap = np.array([p['maxAnnualMatchCap'] for p in policies])[:, None]
+    salary_pct = np.array([p['maxSalaryPercentageCap'] for p in policies])[:, None]
+    fixed_pct = np.array([
+        np.nan if p.get('matchPercentage') is None else p['matchPercentage'] for p in policies
+    ])[:, None]
+
+    match_pct = np.where(np.isnan(fixed_pct), tier_percentage[None, :], fixed_pct)
+    theoretical = monthly_emi[None, :] * (match_pct / 100)
+
+    annual_salary_cap = (monthly_salary[None, :] * 12) * (salary_pct / 100)
+    monthly_salary_cap = annual_salary_cap / 12
+
+    monthly_match = np.minimum(np.minimum(theoretical, monthly_cap), monthly_salary_cap)
+    annual_match = np.minimum(np.minimum(monthly_match * 12, annual_cap), annual_salary_cap)
+
+    # Same precedence as the fallback recommendation: salary cap, then monthly
+    # policy. A match limited only by the annual cap is labelled annual_policy.
+    annual_limited = annual_match < monthly_match * 12 - 0.005
+    cap_codes = np.full(monthly_match.shape, CAP_NONE, dtype=np.int8)
+    cap_codes[annual_limited] = CAP_ANNUAL
+    cap_codes[monthly_match == monthly_cap] = CAP_MONTHLY
+    cap_codes[monthly_match == monthly_salary_cap] = CAP_SALARY
+
+    eligible = (monthly_emi > 0) & (monthly_salary > 0)
+    monthly_match = np.where(eligible, np.round(monthly_match, 2), 0.0)
+    annual_match = np.where(eligible, np.round(annual_match, 2), 0.0)
+    cap_codes[:, ~eligible] = CAP_NONE
+
+    return monthly_match, annual_match, cap_codes
+
+
+def evaluate_policies(snapshot, policies: List[Dict[str, Any]],
+                      baseline: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Evaluate candidate policies over the whole population and compare each
+    one with the baseline policy
+    """
+    baseline = normalize_policy(baseline or DEFAULT_POLICY)
+    policies = [normalize_policy(p) for p in policies]
+
+    monthly_emi = snapshot.monthly_emi
+    monthly_salary = snapshot.monthly_salary
+    population = snapshot.size
+    eligible = (monthly_emi > 0) & (monthly_salary > 0)
+    participants = int(eligible.sum())
+
+    tier_percentage = dti_match_percentage(monthly_emi, monthly_salary)
+    _, baseline_annual, _ = compute_matches(monthly_emi, monthly_salary, [baseline], tier_percentage)
+    baseline_annual = baseline_annual[0]
+    baseline_cost = float(baseline_annual.sum())
+
+    results = []
+    chunk_size = max(1, MAX_CELLS_PER_PASS // max(population, 1))
+
+    for start in range(0, len(policies), chunk_size):
+        chunk = policies[start:start + chunk_size]
+        monthly_match, annual_match, cap_codes = compute_matches(
+            monthly_emi, monthly_salary, chunk, tier_percentage
+        )
+
+        annual_costs = annual_match.sum(axis=1)
+        # Derived from the capped annual match, so both cost figures agree
+        monthly_costs = annual_costs / 12
+        annual_limited_counts = (annual_match < monthly_match * 12 - 0.005).sum(axis=1)
+        difference = annual_match - baseline_annual[None, :]
+        lower_counts = (difference < -0.005).sum(axis=1)
+        higher_counts = (difference > 0.005).sum(axis=1)
+        cap_counts = {code: (cap_codes == code).sum(axis=1) for code in CAP_LABELS}
+
+        for i, policy in enumerate(chunk):
+            annual_cost = float(annual_costs[i])
+            cap_limited = int(population - cap_counts[CAP_NONE][i])
+            cost_change = annual_cost - baseline_cost
+
+            results.append({
+                'policy': policy,
+                'monthlyEmployerCost': round(float(monthly_costs[i]), 2),
+                'annualEmployerCost': round(annual_cost, 2),
+                'averageAnnualMatch': round(annual_cost / participants, 2) if participants else 0,
+                'participants': participants,
+                'capLimitedCount': cap_limited,
+                'capLimitedPercent': round(cap_limited / participants * 100, 1) if participants else 0,
+                'capApplied': {label: int(cap_counts[code][i]) for code, label in CAP_LABELS.items()},
+                # Includes employees labelled by a monthly or salary cap whose annual total is capped too
+                'annualCapLimitedCount': int(annual_limited_counts[i]),
+                'vsBaseline': {
+                    'annualCostChange': round(cost_change, 2),
+                    'annualCostChangePercent': round(cost_change / baseline_cost * 100, 1) if baseline_cost else 0,
+                    'employeesAffected': int(lower_counts[i] + higher_counts[i]),
+                    'employeesWithLowerMatch': int(lower_counts[i]),
+                    'employeesWithHigherMatch': int(higher_counts[i])
+                }
+            })
+
+    return {
+        'baseline': {
+            'policy': baseline,
+            'annualEmployerCost': round(baseline_cost, 2)
+        },
+        'policies': results
+    }
@@ -0,0 +1,132 @@
+"""
+In-container response cache with ETags for admin GET endpoints.
+
+The admin dashboard loads /admin/users and /admin/insights on every visit.
+Computed response bodies are kept per path and query string for
+RESPONSE_CACHE_TTL_SECONDS, so a repeat load within the TTL does no DynamoDB
+reads. Each body gets a strong ETag (a hash of the body). A request whose
+If-None-Match matches is answered 304 with an empty body, whether the body
+came from the cache or was just recomputed.
+
+The cache lives in one warm container. Writes made through this container
+invalidate it (see invalidate()). Changes from elsewhere show up within the TTL.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode
+
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '60'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '64'))
+# Larger bodies are still ETagged but not kept in memory
+RESPONSE_CACHE_MAX_BODY_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BODY_BYTES', str(5 * 1024 * 1024)))
+
+# Clients must revalidate every time, which costs nothing on a hit
+CACHE_CONTROL = 'private, no-cache'
+
+
+def make_etag(body: str) -> str:
+    """Strong ETag for a response body"""
+    return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+def cache_key(event: Dict[str, Any]) -> str:
+    params = event.get('queryStringParameters') or {}
+    return f"{event.get('path', '')}?{urlencode(sorted(params.items()))}"
+
+
+def _request_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == name:
+            return value
+    return None
+
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for If-None-Match)"""
+    header = _request_header(event, 'if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    candidates = [tag.strip() for tag in header.split(',')]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+class ResponseCache:
+    """TTL + LRU cache of response bodies and their ETags"""
+
+    def __init__(self, ttl_seconds: int = RESPONSE_CACHE_TTL_SECONDS,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or time.time() - entry['storedAt'] > self.ttl_seconds:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, body: str) -> Dict[str, Any]:
+        entry = {'body': body, 'etag': make_etag(body), 'storedAt': time.time()}
+        if len(body) > RESPONSE_CACHE_MAX_BODY_BYTES:
+            return entry
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, path_prefix: str = '') -> int:
+        """Drop entries whose path starts with path_prefix (all entries by default)"""
+        with self.lock:
+            stale = [key for key in self.entries if key.startswith(path_prefix)]
+            for key in stale:
+                del self.entries[key]
+        if stale:
+            print(f"Response cache: invalidated {len(stale)} entries for '{path_prefix or '*'}'")
+        return len(stale)
+
+
+def serve_cached(cache: ResponseCache, event: Dict[str, Any], headers: Dict[str, str],
+                 compute: Callable[[], Dict[str, Any]], bypass: bool = False) -> Dict[str, Any]:
+    """
+    Answer a GET from the cache or compute(), with ETag / If-None-Match handling.
+    Non-200 responses from compute() are returned as they are and not cached.
+    bypass skips the lookup but still stores the fresh body.
+    """
+    key = cache_key(event)
+    entry = None if bypass else cache.get(key)
+    status = 'HIT' if entry else 'MISS'
+
+    if entry is None:
+        response = compute()
+        if response.get('statusCode') != 200:
+            return response
+        entry = cache.put(key, response['body'])
+
+    response_headers = {
+        **headers,
+        'ETag': entry['etag'],
+        'Cache-Control': CACHE_CONTROL,
+        'X-Cache': status
+    }
+
+    if etag_matches(event, entry['etag']):
+        return {'statusCode': 304, 'headers': response_headers, 'body': ''}
+
+    return {'statusCode': 200, 'headers': response_headers, 'body': entry['body']}
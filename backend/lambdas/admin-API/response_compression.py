@@ -0,0 +1,176 @@
+"""
+Content negotiation and compression for admin-API responses.
+
+Full user listings and policy / forecast results run to hundreds of
+kilobytes of JSON. Bodies of at least COMPRESSION_MIN_BYTES are compressed
+with the best coding the client accepts: brotli when the brotli package is
+installed, otherwise gzip. They are returned base64-encoded with
+isBase64Encoded set, as API Gateway expects for binary bodies (the API must
+list */* as a binary media type). Smaller bodies are sent as they are, since
+compressing them costs more than it saves.
+
+Each compressed response logs its sizes and ratio as a CloudWatch embedded
+metric in ADMIN_METRICS_NAMESPACE.
+"""
+
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('RESPONSE_COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', '5'))
+METRICS_NAMESPACE = os.environ.get('ADMIN_METRICS_NAMESPACE', 'ASULoanAdmin')
+
+# Compressed bodies of ETagged (cached) responses, so a cache hit is not compressed again
+COMPRESSED_CACHE_MAX_ENTRIES = 32
+
+_compressed_cache = OrderedDict()
+_compressed_cache_lock = threading.Lock()
+
+
+def _supported_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encoding as {coding: q}"""
+    accepted = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(event: Dict[str, Any]) -> Optional[str]:
+    """The supported coding the client prefers, or None for an uncompressed body"""
+    header = None
+    for key, value in (event.get('headers') or {}).items():
+        if key.lower() == 'accept-encoding':
+            header = value
+    accepted = parse_accept_encoding(header)
+
+    best, best_q = None, 0.0
+    # Listed in order of preference, so ties go to the smaller output
+    for coding in _supported_encodings():
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def _compress_cached(data: bytes, encoding: str, etag: Optional[str]) -> bytes:
+    if not etag:
+        return compress(data, encoding)
+
+    key = (etag, encoding)
+    with _compressed_cache_lock:
+        compressed = _compressed_cache.get(key)
+        if compressed is not None:
+            _compressed_cache.move_to_end(key)
+            return compressed
+
+    compressed = compress(data, encoding)
+    with _compressed_cache_lock:
+        _compressed_cache[key] = compressed
+        while len(_compressed_cache) > COMPRESSED_CACHE_MAX_ENTRIES:
+            _compressed_cache.popitem(last=False)
+    return compressed
+
+
+def log_compression_metrics(route: str, encoding: str, original_bytes: int,
+                            compressed_bytes: int, elapsed_ms: float):
+    """CloudWatch embedded metric format record for one compressed response"""
+    record = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Route'], ['Route', 'Encoding']],
+                'Metrics': [
+                    {'Name': 'ResponseBytes', 'Unit': 'Bytes'},
+                    {'Name': 'CompressedBytes', 'Unit': 'Bytes'},
+                    {'Name': 'CompressionRatio', 'Unit': 'None'},
+                    {'Name': 'CompressionMs', 'Unit': 'Milliseconds'}
+                ]
+            }]
+        },
+        'Route': route,
+        'Encoding': encoding,
+        'ResponseBytes': original_bytes,
+        'CompressedBytes': compressed_bytes,
+        'CompressionRatio': round(original_bytes / compressed_bytes, 2) if compressed_bytes else 0,
+        'CompressionMs': round(elapsed_ms, 2)
+    }
+    print(json.dumps(record))
+
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Compress a proxy-integration response body when the client accepts it and
+    the body is at least COMPRESSION_MIN_BYTES. Other responses are returned
+    unchanged. A compressed response's ETag is made weak, since the bytes
+    differ from the uncompressed body it was computed from.
+    """
+    body = response.get('body')
+    if (not COMPRESSION_ENABLED or not isinstance(body, str) or not body
+            or response.get('isBase64Encoded')):
+        return response
+
+    data = body.encode('utf-8')
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return response
+
+    headers = dict(response.get('headers') or {})
+    headers['Vary'] = 'Accept-Encoding'
+    encoding = choose_encoding(event)
+    if encoding is None:
+        return {**response, 'headers': headers}
+
+    started = time.time()
+    etag = headers.get('ETag')
+    compressed = _compress_cached(data, encoding, etag)
+    elapsed_ms = (time.time() - started) * 1000
+
+    headers['Content-Encoding'] = encoding
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = f"W/{etag}"
+
+    # The resource template (/admin/users/{asuId}) keeps one metric per route, not per user
+    route = event.get('resource') or event.get('path', '')
+    log_compression_metrics(route, encoding, len(data), len(compressed), elapsed_ms)
+
+    return {
+        **response,
+        'headers': headers,
+        'body': base64.b64encode(compressed).decode('ascii'),
+        'isBase64Encoded': True
+    }
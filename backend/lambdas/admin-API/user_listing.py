@@ -0,0 +1,324 @@
+"""
+Paged, projected reads of the user profiles table for the admin list view.
+
+The list view only needs a handful of attributes per user, so scans read a
+slim projection instead of whole items: no passwordHash, no recommendation
+history and no extracted document blobs. Callers can pick other top-level
+attributes with `fields`. Pages are DynamoDB scan pages. The cursor handed to
+the client is the opaque, URL-safe encoding of the scan's LastEvaluatedKey, so
+each request reads at most one page no matter how large the table is.
+
+Filtering by approval status or by uploaded documents uses Query on a GSI
+instead of a scan. Results come in index order (updatedAt, or
+documentsUploadedAt for users with documents); without a status filter the
+status partitions are queried side by side and merged on that key, so the
+order holds across statuses. Users without an
+approvalStatus (or with one outside APPROVAL_STATUSES) are in no partition
+that is queried, so filtered listings leave them out and say so in
+FILTERED_LISTING_EXCLUDES.
+"""
+
+import base64
+import binascii
+import heapq
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from parallel_scan import parallel_scan_all
+
+DEFAULT_PAGE_SIZE = int(os.environ.get('USERS_DEFAULT_PAGE_SIZE', '50'))
+MAX_PAGE_SIZE = int(os.environ.get('USERS_MAX_PAGE_SIZE', '500'))
+MAX_FIELDS = 30
+
+# Attributes the admin dashboard and documents page render for each user
+DEFAULT_LIST_FIELDS = (
+    'asuId', 'firstName', 'lastName', 'name', 'asuEmail', 'email',
+    'approvalStatus', 'loanApplication', 'salary', 'dtiRatio',
+    'financialStressLevel', 'documents', 'createdAt', 'updatedAt'
+)
+
+# Never returned by the list endpoint, even when asked for
+EXCLUDED_FIELDS = {'passwordHash'}
+
+KEY_ATTRIBUTES = ('asuId',)
+
+# Indexed access paths. Both GSIs are partitioned by approvalStatus. The
+# documents index is sparse: only users with uploaded documents have its sort key.
+STATUS_INDEX = os.environ.get('USERS_STATUS_INDEX', 'approvalStatus-updatedAt-index')
+DOCUMENTS_INDEX = os.environ.get('USERS_DOCUMENTS_INDEX', 'approvalStatus-documentsUploadedAt-index')
+DOCUMENTS_ATTRIBUTE = 'documentsUploadedAt'
+APPROVAL_STATUSES = ('pending', 'action_required', 'approved', 'rejected')
+
+# Reported with every filtered listing
+FILTERED_LISTING_EXCLUDES = 'Users without an approvalStatus are not indexed and not listed'
+
+# Queries one filtered page may take to fill up with hasDocuments=false, which filters after Limit
+MAX_QUERIES_PER_PAGE = int(os.environ.get('USERS_MAX_QUERIES_PER_PAGE', '10'))
+
+# Attributes the indexes project (INCLUDE); filtered listings can only return these
+INDEX_PROJECTED_FIELDS = DEFAULT_LIST_FIELDS + (DOCUMENTS_ATTRIBUTE,)
+
+FIELD_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,63}$')
+
+
+def parse_fields(value: Optional[str]) -> List[str]:
+    """
+    Attributes to project from a comma-separated `fields` parameter.
+    The key is always included. Raises ValueError for invalid names.
+    """
+    if not value:
+        return list(DEFAULT_LIST_FIELDS)
+
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        if not FIELD_PATTERN.match(name):
+            raise ValueError(f"Invalid field name: {name}")
+        if name in EXCLUDED_FIELDS:
+            raise ValueError(f"Field cannot be listed: {name}")
+        if name not in fields:
+            fields.append(name)
+
+    for key in reversed(KEY_ATTRIBUTES):
+        if key not in fields:
+            fields.insert(0, key)
+
+    if len(fields) > MAX_FIELDS:
+        raise ValueError(f"At most {MAX_FIELDS} fields can be requested")
+    return fields
+
+
+def parse_page_size(value: Optional[str]) -> int:
+    """Page size from the query string, clamped to MAX_PAGE_SIZE. Raises ValueError."""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    page_size = int(value)
+    if page_size < 1:
+        raise ValueError("pageSize must be at least 1")
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def encode_cursor(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Opaque, URL-safe cursor for a scan's LastEvaluatedKey"""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True, default=str)
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_payload(cursor: str) -> Any:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+    except (binascii.Error, UnicodeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """ExclusiveStartKey for a cursor from encode_cursor(). Raises ValueError."""
+    if not cursor:
+        return None
+    key = _decode_payload(cursor)
+    if (not isinstance(key, dict) or set(key) != set(KEY_ATTRIBUTES)
+            or not all(isinstance(v, str) and v for v in key.values())):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def projection_kwargs(fields: List[str]) -> Dict[str, Any]:
+    """ProjectionExpression with every name aliased (several fields are reserved words)"""
+    names = {f'#f{i}': field for i, field in enumerate(fields)}
+    return {
+        'ProjectionExpression': ', '.join(names),
+        'ExpressionAttributeNames': names
+    }
+
+
+def scan_page(table, fields: List[str], page_size: int, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """One projected scan page: {'items': [...], 'nextCursor': str or None}"""
+    scan_kwargs = {'Limit': page_size, **projection_kwargs(fields)}
+    start_key = decode_cursor(cursor)
+    if start_key:
+        scan_kwargs['ExclusiveStartKey'] = start_key
+
+    response = table.scan(**scan_kwargs)
+    return {
+        'items': response.get('Items', []),
+        'nextCursor': encode_cursor(response.get('LastEvaluatedKey'))
+    }
+
+
+def scan_all(table, fields: List[str]) -> Dict[str, Any]:
+    """Every user, projected, read with a parallel scan: {'items': [...], 'pagesScanned': int}"""
+    return parallel_scan_all(table, **projection_kwargs(fields))
+
+
+def parse_filters(params: Dict[str, str]) -> Optional[Dict[str, Any]]:
+    """
+    status / hasDocuments / order query parameters, or None when the listing
+    is unfiltered. Raises ValueError.
+    """
+    status = params.get('status') or None
+    has_documents = params.get('hasDocuments') or None
+    order = params.get('order') or None
+
+    if status is None and has_documents is None:
+        if order:
+            raise ValueError("order requires a status or hasDocuments filter")
+        return None
+    if status is not None and status not in APPROVAL_STATUSES:
+        raise ValueError(f"status must be one of {', '.join(APPROVAL_STATUSES)}")
+    if has_documents not in (None, 'true', 'false'):
+        raise ValueError("hasDocuments must be true or false")
+    if order not in (None, 'asc', 'desc'):
+        raise ValueError("order must be asc or desc")
+
+    return {
+        'status': status,
+        'hasDocuments': None if has_documents is None else has_documents == 'true',
+        # Oldest first: a review queue works from the longest-waiting user
+        'order': order or 'asc'
+    }
+
+
+def check_index_fields(fields: List[str]):
+    """Filtered listings read an index, which only holds the projected attributes. Raises ValueError."""
+    missing = [field for field in fields if field not in INDEX_PROJECTED_FIELDS]
+    if missing:
+        raise ValueError(f"Not available with status/hasDocuments filters: {', '.join(missing)}")
+
+
+def _query_plan(filters: Dict[str, Any]):
+    """(index, its sort key, statuses to merge, extra query arguments, extra names) for a set of filters"""
+    statuses = [filters['status']] if filters['status'] else list(APPROVAL_STATUSES)
+    if filters['hasDocuments'] is True:
+        return DOCUMENTS_INDEX, DOCUMENTS_ATTRIBUTE, statuses, {}, {}
+    if filters['hasDocuments'] is False:
+        return (STATUS_INDEX, 'updatedAt', statuses,
+                {'FilterExpression': 'attribute_not_exists(#docs)'}, {'#docs': DOCUMENTS_ATTRIBUTE})
+    return STATUS_INDEX, 'updatedAt', statuses, {}, {}
+
+
+def _query_kwargs(filters: Dict[str, Any], fields: List[str], status: str) -> Dict[str, Any]:
+    """Query arguments for one status partition. The index key is always projected, for merging and cursors."""
+    index, sort_attribute, _, extra, extra_names = _query_plan(filters)
+    projected = list(fields) + [name for name in ('approvalStatus', sort_attribute) if name not in fields]
+    projection = projection_kwargs(projected)
+    return {
+        'IndexName': index,
+        'KeyConditionExpression': '#status = :status',
+        'ExpressionAttributeValues': {':status': status},
+        'ExpressionAttributeNames': {**projection['ExpressionAttributeNames'], '#status': 'approvalStatus', **extra_names},
+        'ProjectionExpression': projection['ProjectionExpression'],
+        'ScanIndexForward': filters['order'] == 'asc',
+        **extra
+    }
+
+
+def _index_key(item: Dict[str, Any], sort_attribute: str) -> Dict[str, Any]:
+    """ExclusiveStartKey that resumes a partition query after item"""
+    return {name: item[name] for name in ('asuId', 'approvalStatus', sort_attribute)}
+
+
+def _listed(item: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """item without the index key attributes that were only projected for merging"""
+    return {name: value for name, value in item.items() if name in fields}
+
+
+def decode_query_cursor(cursor: Optional[str], statuses: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """
+    Status -> ExclusiveStartKey (None to start from the top) for every
+    partition a filtered-listing cursor has left to read. Raises ValueError.
+    """
+    if not cursor:
+        return dict.fromkeys(statuses)
+    payload = _decode_payload(cursor)
+    if (not isinstance(payload, dict) or set(payload) != {'s'} or not isinstance(payload['s'], dict)
+            or not payload['s'] or not set(payload['s']) <= set(statuses)):
+        raise ValueError("Invalid cursor")
+    for key in payload['s'].values():
+        if key is not None and (not isinstance(key, dict) or 'asuId' not in key
+                                or not all(isinstance(v, str) for v in key.values())):
+            raise ValueError("Invalid cursor")
+    return {status: payload['s'][status] for status in statuses if status in payload['s']}
+
+
+def query_page(table, filters: Dict[str, Any], fields: List[str], page_size: int,
+               cursor: Optional[str] = None) -> Dict[str, Any]:
+    """
+    One page of a filtered listing: {'items': [...], 'nextCursor': str or None,
+    'queriesRead': int}. Without a status filter each status partition is
+    queried and the results merged on the index sort key; an item is only
+    taken while every partition with rows left has a row buffered to compare
+    it with. The cursor records where each partition stops. The page is filled
+    from further queries, since hasDocuments=false filters after Limit. It is
+    only short when it ends the listing or after MAX_QUERIES_PER_PAGE queries
+    (a sparse filter), in which case nextCursor continues it.
+    """
+    index, sort_attribute, statuses, _, _ = _query_plan(filters)
+    start_keys = decode_query_cursor(cursor, statuses)
+    descending = filters['order'] == 'desc'
+
+    # status -> rows read but not yet taken; a status leaves start_keys once fully read
+    buffers = {status: [] for status in start_keys}
+    # status -> key just before the first row still buffered
+    resume = dict(start_keys)
+    items = []
+    queries = 0
+    while len(items) < page_size:
+        empty = [status for status, rows in buffers.items() if not rows and status in start_keys]
+        if empty and queries + len(empty) > MAX_QUERIES_PER_PAGE:
+            break
+        for status in empty:
+            query_kwargs = {**_query_kwargs(filters, fields, status), 'Limit': page_size - len(items)}
+            if start_keys[status]:
+                query_kwargs['ExclusiveStartKey'] = start_keys[status]
+            response = table.query(**query_kwargs)
+            queries += 1
+            buffers[status] = response.get('Items', [])
+            resume[status] = start_keys[status]
+            start_keys[status] = response.get('LastEvaluatedKey')
+            if not start_keys[status]:
+                del start_keys[status]
+
+        while len(items) < page_size:
+            heads = [status for status, rows in buffers.items() if rows]
+            if not heads or any(not buffers[status] for status in start_keys):
+                break
+            pick = (max if descending else min)(heads, key=lambda status: buffers[status][0][sort_attribute])
+            item = buffers[pick].pop(0)
+            items.append(_listed(item, fields))
+            resume[pick] = _index_key(item, sort_attribute)
+        if not start_keys and not any(buffers.values()):
+            break
+
+    # A partition resumes after its last taken row, or where its query stopped once its buffer is used up
+    remaining = {status: (resume[status] if buffers[status] else start_keys[status])
+                 for status in buffers if buffers[status] or status in start_keys}
+    next_cursor = encode_cursor({'s': remaining}) if remaining else None
+    return {'items': items, 'nextCursor': next_cursor, 'index': index, 'queriesRead': queries}
+
+
+def query_all(table, filters: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Every user matching the filters, merged across statuses in index order: {'items': [...], 'pagesRead': int, 'index': str}"""
+    index, sort_attribute, statuses, _, _ = _query_plan(filters)
+    partitions = []
+    pages = 0
+    for status in statuses:
+        query_kwargs = _query_kwargs(filters, fields, status)
+        rows = []
+        while True:
+            pages += 1
+            response = table.query(**query_kwargs)
+            rows.extend(response.get('Items', []))
+            last_evaluated_key = response.get('LastEvaluatedKey')
+            if not last_evaluated_key:
+                break
+            query_kwargs['ExclusiveStartKey'] = last_evaluated_key
+        partitions.append(rows)
+    merged = heapq.merge(*partitions, key=lambda item: item[sort_attribute], reverse=filters['order'] == 'desc')
+    return {'items': [_listed(item, fields) for item in merged], 'pagesRead': pages, 'index': index}
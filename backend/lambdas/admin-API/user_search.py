@@ -0,0 +1,501 @@
+"""
+In-memory search index over admin user names, emails and ASU IDs.
+
+The index is built once per container from a parallel scan of the search
+fields and kept for SEARCH_INDEX_TTL_SECONDS. Between full rebuilds it is
+refreshed every SEARCH_REFRESH_SECONDS by querying the approvalStatus-updatedAt
+GSI for users changed since the newest updatedAt it holds, so a search never
+scans the table. Deleted users drop out at the next full rebuild.
+
+Each field value is split into lowercase tokens ('jane.doe@asu.edu' gives the
+whole address plus 'jane', 'doe', 'asu', 'edu'). Query words match tokens
+exactly, by prefix (bisect over the sorted token list) or, for misspelled
+names, by trigram similarity. Results must match every word and are ranked by
+the sum of their best per-word scores, then by name.
+
+Matching tokens fall into score groups (exact, then prefixes by length, then
+misspellings by similarity), and each token's users are kept ranked by name.
+A one-word search reads the groups best first and stops after `limit` users,
+so a prefix matching most of the table ('a', 'asu') costs no more than a
+narrow one. A score group of more than MAX_SEARCH_CANDIDATES tokens (a short
+ASU ID prefix) is cut to its first MAX_SEARCH_CANDIDATES tokens. A search with
+several words starts from its most selective word and checks the others per
+candidate; when even that word matches more than MAX_SEARCH_CANDIDATES users,
+only its best MAX_SEARCH_CANDIDATES are considered. Either cut is reported in
+the result (truncated).
+
+The incremental refresh only reads the APPROVAL_STATUSES partitions of the
+status GSI. Users without one of those statuses are indexed by the full
+rebuild but not refreshed in between; search_info reports how many there are.
+"""
+
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from botocore.exceptions import ClientError
+
+from parallel_scan import parallel_scan_all
+from user_listing import APPROVAL_STATUSES, STATUS_INDEX
+
+SEARCH_INDEX_TTL_SECONDS = int(os.environ.get('SEARCH_INDEX_TTL_SECONDS', '3600'))
+SEARCH_REFRESH_SECONDS = int(os.environ.get('SEARCH_REFRESH_SECONDS', '30'))
+# Re-read changes this far behind the newest updatedAt, for writers whose clocks lag
+SEARCH_REFRESH_OVERLAP_SECONDS = int(os.environ.get('SEARCH_REFRESH_OVERLAP_SECONDS', '60'))
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+MAX_QUERY_LENGTH = 100
+
+SEARCH_FIELDS = ('firstName', 'lastName', 'asuEmail', 'asuId')
+# Returned with each result; all are projected by the status GSI
+RESULT_FIELDS = SEARCH_FIELDS + ('approvalStatus', 'updatedAt')
+SEARCH_PROJECTION = ', '.join(RESULT_FIELDS)
+
+# Candidate tokens per score group and users per multi-word search (see module docstring)
+MAX_SEARCH_CANDIDATES = int(os.environ.get('MAX_SEARCH_CANDIDATES', '5000'))
+# Tokens with at least this many users are ranked while the index is built
+RANK_AT_BUILD_MIN_USERS = 256
+# Score groups with more tokens than this are selected from directly instead of merged
+MERGE_MAX_TOKENS = 32
+
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+TRIGRAM_MIN_SIMILARITY = 0.3
+
+TOKEN_PATTERN = re.compile(r'[a-z]+|[0-9]+')
+
+REFRESH_EXCLUDES = (
+    'Users without an approvalStatus in ' + ', '.join(APPROVAL_STATUSES)
+    + ' are not refreshed between full rebuilds (SEARCH_INDEX_TTL_SECONDS)'
+)
+
+# Cached index (reused across warm Lambda invocations)
+_search_index = None
+
+
+def normalize(value: Any) -> str:
+    return str(value or '').strip().lower()
+
+
+def tokenize(value: Any) -> Set[str]:
+    """The whole value plus its letter and digit runs"""
+    text = normalize(value)
+    if not text:
+        return set()
+    return {text, *TOKEN_PATTERN.findall(text)}
+
+
+def trigrams(token: str) -> Set[str]:
+    """Trigrams of the token padded as pg_trgm does, so word starts and ends count"""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def parse_search_params(params: Dict[str, str]):
+    """(query, limit) from q / limit query parameters. Raises ValueError."""
+    query = (params.get('q') or '').strip()
+    if not query:
+        raise ValueError("q is required")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise ValueError(f"q must be at most {MAX_QUERY_LENGTH} characters")
+
+    limit = params.get('limit')
+    if limit in (None, ''):
+        return query, DEFAULT_SEARCH_LIMIT
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    if not 1 <= limit <= MAX_SEARCH_LIMIT:
+        raise ValueError(f"limit must be between 1 and {MAX_SEARCH_LIMIT}")
+    return query, limit
+
+
+class UserSearchIndex:
+    """Token, prefix and trigram lookups over the search fields of every user"""
+
+    def __init__(self, items):
+        self.users = {}
+        self.user_tokens = {}
+        self.token_users = {}
+        # Token length -> tokens of that length in sorted order, for prefix lookups by score
+        self.sorted_tokens = {}
+        self.token_trigrams = {}
+        self.token_gram_counts = {}
+        self.sort_keys = {}
+        # token -> sort keys of its users, in order; built on first use, then kept current
+        self.ranked = {}
+        # Users the incremental refresh cannot see (status outside APPROVAL_STATUSES)
+        self.unrefreshed = set()
+        self.latest_update = None
+        self.lock = threading.Lock()
+
+        # Tokens are sorted once after the initial load, then kept sorted by insort
+        self.building = True
+        for item in items:
+            self._upsert(item)
+        for token in self.token_users:
+            self.sorted_tokens.setdefault(len(token), []).append(token)
+        for tokens in self.sorted_tokens.values():
+            tokens.sort()
+        for token, ids in self.token_users.items():
+            if len(ids) >= RANK_AT_BUILD_MIN_USERS:
+                self._ranked(token)
+        self.building = False
+
+        self.built_at = time.time()
+        self.refreshed_at = self.built_at
+
+    @property
+    def size(self) -> int:
+        return len(self.users)
+
+    def age_seconds(self) -> float:
+        return time.time() - self.built_at
+
+    def watermark(self) -> Optional[str]:
+        """Newest updatedAt in the index"""
+        return self.latest_update
+
+    def _add_token(self, token: str, asu_id: str):
+        ids = self.token_users.get(token)
+        if ids is None:
+            ids = self.token_users[token] = set()
+            # Only words are matched by similarity; emails and ID digits need a prefix
+            if token.isalpha():
+                grams = trigrams(token)
+                self.token_gram_counts[token] = len(grams)
+                for gram in grams:
+                    self.token_trigrams.setdefault(gram, set()).add(token)
+            if not self.building:
+                bisect.insort(self.sorted_tokens.setdefault(len(token), []), token)
+        ids.add(asu_id)
+        ranked = self.ranked.get(token)
+        if ranked is not None:
+            bisect.insort(ranked, self.sort_keys[asu_id])
+
+    def _remove_token(self, token: str, asu_id: str, sort_key: Tuple):
+        ids = self.token_users.get(token)
+        if ids is None:
+            return
+        ids.discard(asu_id)
+        if ids:
+            self._unrank(token, sort_key)
+            return
+        del self.token_users[token]
+        self.ranked.pop(token, None)
+        if self.token_gram_counts.pop(token, None) is None:
+            grams = ()
+        else:
+            grams = trigrams(token)
+        for gram in grams:
+            gram_tokens = self.token_trigrams.get(gram)
+            if gram_tokens is not None:
+                gram_tokens.discard(token)
+                if not gram_tokens:
+                    del self.token_trigrams[gram]
+        same_length = self.sorted_tokens.get(len(token), [])
+        position = bisect.bisect_left(same_length, token)
+        if position < len(same_length) and same_length[position] == token:
+            del same_length[position]
+
+    def _ranked(self, token: str) -> List[Tuple]:
+        ranked = self.ranked.get(token)
+        if ranked is None:
+            ranked = self.ranked[token] = sorted(self.sort_keys[asu_id] for asu_id in self.token_users[token])
+        return ranked
+
+    def _unrank(self, token: str, sort_key: Tuple):
+        ranked = self.ranked.get(token)
+        if ranked is not None:
+            position = bisect.bisect_left(ranked, sort_key)
+            if position < len(ranked) and ranked[position] == sort_key:
+                del ranked[position]
+
+    def _upsert(self, item: Dict[str, Any], advance_watermark: bool = True):
+        asu_id = item.get('asuId')
+        if not asu_id:
+            return
+        user = {field: item.get(field) for field in RESULT_FIELDS if item.get(field) is not None}
+        tokens = set()
+        for field in SEARCH_FIELDS:
+            tokens |= tokenize(item.get(field))
+
+        sort_key = (normalize(user.get('lastName')), normalize(user.get('firstName')), asu_id)
+        previous_key = self.sort_keys.get(asu_id)
+        previous = self.user_tokens.get(asu_id, set())
+        for token in previous - tokens:
+            self._remove_token(token, asu_id, previous_key)
+        if previous_key is not None and previous_key != sort_key:
+            # A renamed user moves within the rankings of the tokens it keeps
+            for token in previous & tokens:
+                if token in self.ranked:
+                    self._unrank(token, previous_key)
+                    bisect.insort(self.ranked[token], sort_key)
+        self.sort_keys[asu_id] = sort_key
+        for token in tokens - previous:
+            self._add_token(token, asu_id)
+
+        self.users[asu_id] = user
+        self.user_tokens[asu_id] = tokens
+        if user.get('approvalStatus') in APPROVAL_STATUSES:
+            self.unrefreshed.discard(asu_id)
+        else:
+            self.unrefreshed.add(asu_id)
+        updated_at = user.get('updatedAt')
+        if advance_watermark and isinstance(updated_at, str) and (self.latest_update is None or updated_at > self.latest_update):
+            self.latest_update = updated_at
+
+    def apply_changes(self, items) -> int:
+        """Add or update changed users. Returns how many were applied."""
+        count = 0
+        with self.lock:
+            for item in items:
+                self._upsert(item)
+                count += 1
+        self.refreshed_at = time.time()
+        return count
+
+    def _prefix_groups(self, term: str) -> List[Tuple[float, List[str]]]:
+        """Tokens starting with term, grouped by score, best first (exact, then shorter completions)"""
+        groups = []
+        for length in sorted(self.sorted_tokens):
+            if length < len(term):
+                continue
+            same_length = self.sorted_tokens[length]
+            low = bisect.bisect_left(same_length, term)
+            high = bisect.bisect_left(same_length, term + '\U0010ffff', low)
+            if low < high:
+                # Closer completions rank higher: 'jan' prefers 'jane' over 'janeway'
+                score = EXACT_SCORE if length == len(term) else PREFIX_SCORE * (0.5 + 0.5 * len(term) / length)
+                groups.append((score, same_length[low:high]))
+        return groups
+
+    def _similar_groups(self, term: str) -> List[Tuple[float, List[str]]]:
+        """
+        Misspellings, by Jaccard similarity of trigram sets, grouped by score,
+        best first. Completions of term are left out: they score higher as prefixes.
+        """
+        if len(term) < 3 or not term.isalpha():
+            return []
+        term_grams = trigrams(term)
+        shared = {}
+        for gram in term_grams:
+            for token in self.token_trigrams.get(gram, ()):
+                shared[token] = shared.get(token, 0) + 1
+        by_score = {}
+        for token, count in shared.items():
+            similarity = count / (len(term_grams) + self.token_gram_counts[token] - count)
+            if similarity >= TRIGRAM_MIN_SIMILARITY and not token.startswith(term):
+                by_score.setdefault(similarity, []).append(token)
+        return sorted(by_score.items(), reverse=True)
+
+    def _term_groups(self, term: str) -> List[Tuple[float, List[str]]]:
+        # Every prefix score is above 1, every similarity at most 1
+        return self._prefix_groups(term) + self._similar_groups(term)
+
+    def _query_terms(self, query: str) -> Optional[List[List[Tuple[float, List[str]]]]]:
+        """
+        Score groups for each term every result must match, or None when a
+        word matches nothing. A word is first matched whole ('asu1234567',
+        'jane.doe'); if nothing matches, its letter and digit runs must all match.
+        """
+        terms = []
+        for word in normalize(query).split():
+            groups = self._term_groups(word)
+            if groups:
+                terms.append(groups)
+                continue
+            parts = TOKEN_PATTERN.findall(word)
+            if not parts or parts == [word]:
+                return None
+            part_groups = [self._term_groups(part) for part in parts]
+            if not all(part_groups):
+                return None
+            terms.extend(part_groups)
+        return terms or None
+
+    def _match_count(self, groups) -> int:
+        """Upper bound on the users a term matches"""
+        return sum(len(self.token_users[token]) for _, tokens in groups for token in tokens)
+
+    def _all_users(self, groups) -> Dict[str, float]:
+        """Best score per user for one term, over every match"""
+        scores = {}
+        # Lowest scores first, so each user ends up with its best token's score
+        for score, tokens in reversed(groups):
+            for token in tokens:
+                scores.update(dict.fromkeys(self.token_users[token], score))
+        return scores
+
+    def _top_users(self, groups, count: int) -> Tuple[Dict[str, float], bool]:
+        """
+        The count best users for one term, ties in name order: groups are read
+        best first through the ranked postings, each only as far as needed.
+        A group of more than MAX_SEARCH_CANDIDATES tokens (every ASU ID under a
+        digit prefix) is cut to its first tokens, and the result flagged truncated.
+        """
+        scores = {}
+        truncated = False
+        for score, tokens in groups:
+            if len(tokens) > MERGE_MAX_TOKENS:
+                # Many small postings: one selection beats a wide merge
+                if len(tokens) > MAX_SEARCH_CANDIDATES:
+                    tokens = tokens[:MAX_SEARCH_CANDIDATES]
+                    truncated = True
+                users = set().union(*map(self.token_users.__getitem__, tokens)).difference(scores)
+                sort_keys = heapq.nsmallest(count - len(scores), map(self.sort_keys.__getitem__, users))
+                scores.update(dict.fromkeys((sort_key[-1] for sort_key in sort_keys), score))
+                if len(scores) >= count:
+                    return scores, truncated
+                continue
+            for sort_key in heapq.merge(*(self._ranked(token) for token in tokens)):
+                asu_id = sort_key[-1]
+                if asu_id not in scores:
+                    scores[asu_id] = score
+                    if len(scores) >= count:
+                        return scores, truncated
+        return scores, truncated
+
+    def _scores(self, terms, limit: int) -> Tuple[Dict[str, float], bool]:
+        """Summed scores of users matching every term, and whether candidates were capped"""
+        if len(terms) == 1:
+            return self._top_users(terms[0], limit)
+
+        counts = [self._match_count(groups) for groups in terms]
+        order = sorted(range(len(terms)), key=counts.__getitem__)
+        first = order[0]
+        if counts[first] > MAX_SEARCH_CANDIDATES:
+            scores, _ = self._top_users(terms[first], MAX_SEARCH_CANDIDATES)
+            truncated = True
+        else:
+            scores = self._all_users(terms[first])
+            truncated = False
+
+        for i in order[1:]:
+            if not scores:
+                break
+            # Scoring every match of a narrow term beats checking each candidate's tokens
+            if counts[i] <= len(scores) * 4:
+                term_scores = self._all_users(terms[i])
+                scores = {asu_id: score + term_scores[asu_id]
+                          for asu_id, score in scores.items() if asu_id in term_scores}
+            else:
+                token_scores = {token: score for score, tokens in terms[i] for token in tokens}
+                matched = {}
+                for asu_id, score in scores.items():
+                    best = max((token_scores.get(token, 0) for token in self.user_tokens[asu_id]), default=0)
+                    if best:
+                        matched[asu_id] = score + best
+                scores = matched
+        return scores, truncated
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> Dict[str, Any]:
+        """Ranked users matching every word of the query: {'results': [...], 'truncated': bool}"""
+        with self.lock:
+            terms = self._query_terms(query)
+            if terms is None:
+                return {'results': [], 'truncated': False}
+            scores, truncated = self._scores(terms, limit)
+            best = heapq.nsmallest(limit, scores.items(),
+                                   key=lambda entry: (-entry[1], self.sort_keys[entry[0]]))
+            return {
+                'results': [{**self.users[asu_id], 'score': round(score, 3)} for asu_id, score in best],
+                'truncated': truncated
+            }
+
+
+def _refresh_since(watermark: str) -> str:
+    """The watermark moved back by the overlap window (timestamps are ISO 8601 strings)"""
+    try:
+        stamp = datetime.fromisoformat(watermark.rstrip('Z'))
+    except ValueError:
+        return watermark
+    return (stamp - timedelta(seconds=SEARCH_REFRESH_OVERLAP_SECONDS)).isoformat()
+
+
+def changed_users(table, since: str) -> List[Dict[str, Any]]:
+    """Users with updatedAt >= since, read from the status GSI partition by partition"""
+    items = []
+    for status in APPROVAL_STATUSES:
+        query_kwargs = {
+            'IndexName': STATUS_INDEX,
+            'KeyConditionExpression': '#status = :status AND #updatedAt >= :since',
+            'ExpressionAttributeNames': {'#status': 'approvalStatus', '#updatedAt': 'updatedAt'},
+            'ExpressionAttributeValues': {':status': status, ':since': since},
+            'ProjectionExpression': SEARCH_PROJECTION
+        }
+        while True:
+            response = table.query(**query_kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return items
+
+
+def build_search_index(table) -> UserSearchIndex:
+    started = time.time()
+    items = parallel_scan_all(table, ProjectionExpression=SEARCH_PROJECTION)['items']
+    index = UserSearchIndex(items)
+    print(f"User search index built: {index.size} users, {len(index.token_users)} tokens "
+          f"in {time.time() - started:.2f}s")
+    return index
+
+
+def get_search_index(table, force_refresh: bool = False) -> UserSearchIndex:
+    """
+    Return the cached index: rebuilt when older than the TTL or when a refresh
+    is forced, otherwise brought up to date from the updatedAt GSI
+    """
+    global _search_index
+
+    if (force_refresh or _search_index is None
+            or _search_index.age_seconds() > SEARCH_INDEX_TTL_SECONDS):
+        _search_index = build_search_index(table)
+        return _search_index
+
+    if time.time() - _search_index.refreshed_at < SEARCH_REFRESH_SECONDS:
+        return _search_index
+
+    watermark = _search_index.watermark()
+    if watermark is None:
+        _search_index.refreshed_at = time.time()
+        return _search_index
+
+    try:
+        applied = _search_index.apply_changes(changed_users(table, _refresh_since(watermark)))
+        print(f"User search index refreshed: {applied} changed users since {watermark}")
+    except ClientError as e:
+        # Without the GSI the index can only be rebuilt from a scan
+        print(f"Incremental search refresh failed ({e}); rebuilding")
+        _search_index = build_search_index(table)
+    return _search_index
+
+
+def update_cached_user(item: Dict[str, Any]):
+    """
+    Apply a user this container just wrote to its cached index, so its
+    searches show the change at once. The watermark and refresh time are left
+    alone: the next incremental refresh still picks up other writers' changes.
+    """
+    if _search_index is not None:
+        with _search_index.lock:
+            _search_index._upsert(item, advance_watermark=False)
+
+
+def search_info(index: UserSearchIndex) -> Dict[str, Any]:
+    """Metadata describing the index used for a response"""
+    return {
+        'indexSize': index.size,
+        'indexAgeSeconds': round(index.age_seconds(), 1),
+        'refreshedSecondsAgo': round(time.time() - index.refreshed_at, 1),
+        # Their changes show up only after the next full rebuild
+        'usersRefreshedOnRebuildOnly': len(index.unrefreshed),
+        'excludes': REFRESH_EXCLUDES
+    }
@@ -0,0 +1,218 @@
+"""
+Semantic answer cache for FAQ-mode questions.
+
+Answers are keyed by normalized question text, so repeats are a dict lookup.
+Paraphrases are matched with a cosine-similarity index over question vectors:
+embeddings from the LLM gateway when FAQ_EMBEDDING_MODEL is set, otherwise
+(or when the embedding call fails) a local hashing vectorizer over words,
+word pairs and character trigrams. Vectors from different embedders are never
+compared with each other, and each has its own threshold.
+
+The cache lives in the Lambda container, so it is shared by every warm
+invocation of that container. Entries expire after a TTL and the least
+recently used entry is evicted once the cache is full. Threads of one
+container share the cache, so entries and metrics change under a lock; the
+embedding call is made outside it.
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+FAQ_CACHE_ENABLED = os.environ.get('FAQ_CACHE_ENABLED', 'true').lower() == 'true'
+FAQ_CACHE_MAX_ENTRIES = int(os.environ.get('FAQ_CACHE_MAX_ENTRIES', '500'))
+FAQ_CACHE_TTL_SECONDS = int(os.environ.get('FAQ_CACHE_TTL_SECONDS', '86400'))
+FAQ_CACHE_EMBEDDING_THRESHOLD = float(os.environ.get('FAQ_CACHE_EMBEDDING_THRESHOLD', '0.92'))
+FAQ_CACHE_HASHING_THRESHOLD = float(os.environ.get('FAQ_CACHE_HASHING_THRESHOLD', '0.8'))
+
+HASHING_DIMENSIONS = 2048
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'be', 'do', 'does', 'did', 'can', 'could',
+    'would', 'should', 'will', 'to', 'of', 'for', 'in', 'on', 'at', 'and', 'or',
+    'about', 'me', 'please', 'tell', 'explain', 'what', 'whats', 'how', 'hows'
+}
+
+# Questions about the user's own numbers, or follow-ups that lean on the
+# conversation, must go to the LLM
+PERSONAL_WORDS = {'i', 'im', 'ive', 'my', 'mine', 'we', 'our', 'us'}
+FOLLOW_UP_WORDS = {'it', 'that', 'this', 'those', 'these', 'they', 'them', 'he', 'she', 'above', 'previous'}
+MIN_CACHEABLE_WORDS = 3
+
+
+def normalize_question(text):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = (text or '').lower().replace("'", '')
+    text = re.sub(r'[^a-z0-9%$.]+', ' ', text)
+    text = re.sub(r'(?<![0-9])\.|\.(?![0-9])', ' ', text)
+    return ' '.join(text.split())
+
+
+def is_cacheable_question(normalized):
+    """Only standalone, general questions are answered from the cache"""
+    words = normalized.split()
+    if len(words) < MIN_CACHEABLE_WORDS:
+        return False
+    if PERSONAL_WORDS.intersection(words):
+        return False
+    return words[0] not in FOLLOW_UP_WORDS
+
+
+def _bucket(feature):
+    digest = hashlib.md5(feature.encode('utf-8')).digest()
+    index = int.from_bytes(digest[:4], 'little') % HASHING_DIMENSIONS
+    sign = 1.0 if digest[4] & 1 else -1.0
+    return index, sign
+
+
+def hashing_vector(normalized):
+    """Sparse, L2-normalized hashed features: content words, word pairs and character trigrams"""
+    words = [w for w in normalized.split() if w not in STOP_WORDS]
+    features = list(words)
+    features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [f"~{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+
+    vector = {}
+    for feature in features:
+        index, sign = _bucket(feature)
+        vector[index] = vector.get(index, 0.0) + sign
+    return _normalized(vector)
+
+
+def _normalized(vector):
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {k: v / norm for k, v in vector.items() if v}
+
+
+def dense_to_sparse(values):
+    return _normalized({i: float(v) for i, v in enumerate(values)})
+
+
+def cosine(a, b):
+    """Cosine similarity of two normalized sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class AnswerCache:
+    """In-container LRU answer cache with exact and semantic lookup"""
+
+    def __init__(self, embed=None, max_entries=None, ttl_seconds=None,
+                 embedding_threshold=None, hashing_threshold=None):
+        self.embed = embed
+        self.max_entries = FAQ_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self.ttl_seconds = FAQ_CACHE_TTL_SECONDS if ttl_seconds is None else ttl_seconds
+        self.thresholds = {
+            'embedding': FAQ_CACHE_EMBEDDING_THRESHOLD if embedding_threshold is None else embedding_threshold,
+            'hashing': FAQ_CACHE_HASHING_THRESHOLD if hashing_threshold is None else hashing_threshold
+        }
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.metrics = {
+            'lookups': 0, 'exactHits': 0, 'semanticHits': 0, 'misses': 0,
+            'skipped': 0, 'stores': 0, 'evictions': 0, 'expired': 0, 'embeddingFallbacks': 0
+        }
+
+    def _vectorize(self, normalized):
+        """Returns (kind, vector); falls back to hashing when embeddings are unavailable"""
+        if self.embed:
+            try:
+                return 'embedding', dense_to_sparse(self.embed(normalized))
+            except Exception as e:
+                with self.lock:
+                    self.metrics['embeddingFallbacks'] += 1
+                print(f"Question embedding failed, using hashing vectors: {e}")
+        return 'hashing', hashing_vector(normalized)
+
+    def _expire(self, now):
+        expired = [k for k, e in self.entries.items() if now - e['created_at'] > self.ttl_seconds]
+        for key in expired:
+            del self.entries[key]
+        self.metrics['expired'] += len(expired)
+
+    def lookup(self, question):
+        """
+        Returns (answer, probe). answer is None on a miss; pass probe to store()
+        so the question is not normalized or embedded twice.
+        """
+        normalized = normalize_question(question)
+        with self.lock:
+            self.metrics['lookups'] += 1
+            if not is_cacheable_question(normalized):
+                self.metrics['skipped'] += 1
+                return None, None
+
+            self._expire(time.time())
+
+            entry = self.entries.get(normalized)
+            if entry:
+                self._hit(normalized, entry, 'exactHits', 1.0)
+                return entry['answer'], None
+
+        kind, vector = self._vectorize(normalized)
+        probe = {'key': normalized, 'kind': kind, 'vector': vector}
+
+        with self.lock:
+            best_key, best_score = None, 0.0
+            for key, candidate in self.entries.items():
+                if candidate['kind'] != kind:
+                    continue
+                score = cosine(vector, candidate['vector'])
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is not None and best_score >= self.thresholds[kind]:
+                entry = self.entries[best_key]
+                self._hit(best_key, entry, 'semanticHits', best_score)
+                return entry['answer'], None
+
+            self.metrics['misses'] += 1
+            hit_rate = self.hit_rate()
+        print(f"FAQ cache miss ({kind}, best {best_score:.2f}), hit rate {hit_rate:.1%}")
+        return None, probe
+
+    def _hit(self, key, entry, metric, score):
+        self.metrics[metric] += 1
+        entry['hits'] += 1
+        self.entries.move_to_end(key)
+        print(f"FAQ cache {metric[:-4]} hit ({score:.2f}): '{key}', hit rate {self.hit_rate():.1%}")
+
+    def store(self, probe, answer):
+        if probe is None or not answer:
+            return
+        with self.lock:
+            self.entries[probe['key']] = {
+                'answer': answer,
+                'kind': probe['kind'],
+                'vector': probe['vector'],
+                'created_at': time.time(),
+                'hits': 0
+            }
+            self.entries.move_to_end(probe['key'])
+            self.metrics['stores'] += 1
+
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.metrics['evictions'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def hit_rate(self):
+        hits = self.metrics['exactHits'] + self.metrics['semanticHits']
+        eligible = hits + self.metrics['misses']
+        return hits / eligible if eligible else 0.0
+
+    def stats(self):
+        with self.lock:
+            return {**self.metrics, 'entries': len(self.entries), 'hitRate': round(self.hit_rate(), 4)}
@@ -0,0 +1,135 @@
+"""
+Token-budgeted chat history with a rolling summary.
+
+The prompt gets the rolling summary plus as many of the newest messages as fit
+in the configured token budget. Stored history is compacted once it grows past
+a message or token limit: the oldest messages are folded into the summary and
+dropped, so both prompt size and session item size stay flat.
+
+Token counts are estimated (about four characters per token plus a small
+per-message overhead), which is close enough for budgeting without shipping a
+tokenizer in the deployment package.
+"""
+
+import os
+
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.environ.get('PROMPT_HISTORY_TOKEN_BUDGET', '2500'))
+MAX_STORED_HISTORY_MESSAGES = int(os.environ.get('MAX_STORED_HISTORY_MESSAGES', '24'))
+MAX_STORED_HISTORY_TOKENS = int(os.environ.get('MAX_STORED_HISTORY_TOKENS', '12000'))
+COMPACT_KEEP_MESSAGES = int(os.environ.get('COMPACT_KEEP_MESSAGES', '10'))
+SUMMARY_MAX_TOKENS = int(os.environ.get('SUMMARY_MAX_TOKENS', '400'))
+
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting"""
+    if not text:
+        return 0
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def message_tokens(message):
+    return estimate_tokens(message.get('content', '')) + MESSAGE_OVERHEAD_TOKENS
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, marking the cut"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rstrip() + '...'
+
+
+def build_prompt_messages(system_prompt, session, user_message, token_budget=None):
+    """
+    Build the LLM messages: system prompt (with the rolling summary), the newest
+    history messages that fit in the budget, then the new user message
+    """
+    budget = PROMPT_HISTORY_TOKEN_BUDGET if token_budget is None else token_budget
+
+    summary = session.get('history_summary')
+    if summary:
+        system_prompt += f"\n\nSUMMARY OF EARLIER CONVERSATION:\n{summary}"
+
+    selected = []
+    used = 0
+    for message in reversed(session.get('history', [])):
+        cost = message_tokens(message)
+        if used + cost > budget:
+            break
+        selected.append({'role': message['role'], 'content': message['content']})
+        used += cost
+    selected.reverse()
+
+    return (
+        [{'role': 'system', 'content': system_prompt}]
+        + selected
+        + [{'role': 'user', 'content': user_message}]
+    )
+
+
+def needs_compaction(history):
+    if len(history) > MAX_STORED_HISTORY_MESSAGES:
+        return True
+    return sum(message_tokens(m) for m in history) > MAX_STORED_HISTORY_TOKENS
+
+
+def extractive_summary(previous_summary, messages, max_tokens=None):
+    """Local fallback summary: previous summary plus the opening of each folded message"""
+    max_tokens = SUMMARY_MAX_TOKENS if max_tokens is None else max_tokens
+    lines = [previous_summary] if previous_summary else []
+    for message in messages:
+        snippet = ' '.join(message.get('content', '').split())[:160]
+        lines.append(f"- {message.get('role')}: {snippet}")
+
+    # Keep the newest material when the summary overflows
+    summary = '\n'.join(lines)
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(summary) > max_chars:
+        summary = '...' + summary[-max_chars:]
+    return summary
+
+
+def compact_history(session, summarize=None):
+    """
+    Fold the oldest messages into session['history_summary'] when stored history
+    is over its limits. history_offset counts the messages folded from the
+    in-memory list so new entries keep stable absolute positions, and
+    summarized_through_seq records the last stored turn the summary covers.
+    Returns True when the session was compacted.
+    """
+    history = session.get('history', [])
+    if not needs_compaction(history):
+        return False
+
+    keep = min(COMPACT_KEEP_MESSAGES, len(history))
+    # Keep user/assistant pairs together
+    if keep % 2:
+        keep -= 1
+    folded = history[:len(history) - keep]
+    if not folded:
+        return False
+
+    previous_summary = session.get('history_summary', '')
+    summary = None
+    if summarize:
+        try:
+            summary = summarize(previous_summary, folded)
+        except Exception as e:
+            print(f"History summarization failed, using extractive summary: {e}")
+    if not summary:
+        summary = extractive_summary(previous_summary, folded)
+
+    session['history_summary'] = truncate_to_tokens(summary, SUMMARY_MAX_TOKENS)
+    session['history'] = history[len(folded):]
+    session['history_offset'] = int(session.get('history_offset', 0)) + len(folded)
+
+    # Stored turns up to this sequence number are covered by the summary
+    folded_seqs = [int(m['seq']) for m in folded if 'seq' in m]
+    if folded_seqs:
+        session['summarized_through_seq'] = max(folded_seqs)
+
+    print(f"Compacted history: folded {len(folded)} messages, kept {len(session['history'])}")
+    return True
@@ -0,0 +1,195 @@
+"""
+Local retrieval over the program documents shipped with the function.
+
+The markdown files in program_docs/ (ASU program FAQ, SECURE 2.0 summary, how
+the platform calculates and verifies the match) are split into one passage
+per section and indexed with BM25 once per container. FAQ turns inject only
+the few passages that match the question, so the system prompt stays short
+and answers are grounded in the program's own wording. Everything is in
+memory, so a search takes well under a millisecond for a corpus this size.
+"""
+
+import math
+import os
+import re
+import time
+from collections import Counter
+
+from chat_history import estimate_tokens
+
+RETRIEVAL_ENABLED = os.environ.get('RETRIEVAL_ENABLED', 'true').lower() == 'true'
+PROGRAM_DOCS_DIR = os.environ.get(
+    'PROGRAM_DOCS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'program_docs')
+)
+RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', '3'))
+RETRIEVAL_MAX_TOKENS = int(os.environ.get('RETRIEVAL_MAX_TOKENS', '700'))
+# Passages scoring below this fraction of the best match are left out
+RETRIEVAL_RELATIVE_CUTOFF = float(os.environ.get('RETRIEVAL_RELATIVE_CUTOFF', '0.35'))
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Weight of the previous question's terms, so short follow-ups keep their topic
+CONTEXT_QUERY_WEIGHT = 0.3
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'is', 'are', 'was', 'were', 'be', 'been', 'do', 'does', 'did',
+    'can', 'could', 'would', 'should', 'will', 'to', 'of', 'for', 'in', 'on', 'at',
+    'by', 'with', 'and', 'or', 'if', 'as', 'it', 'its', 'this', 'that', 'these',
+    'those', 'i', 'me', 'my', 'you', 'your', 'we', 'our', 'what', 'how', 'who',
+    'when', 'which', 'why', 'about', 'tell', 'please', 'explain', 'there', 'any',
+    'from', 'than', 'then', 'so', 'not', 'no', 'yes', 'have', 'has', 'get'
+}
+
+
+def tokenize(text):
+    """Lowercased content words with a light plural strip (loans -> loan)"""
+    words = re.findall(r'[a-z0-9]+(?:\.[0-9]+)?', (text or '').lower().replace("'", ''))
+    tokens = []
+    for word in words:
+        if word in STOP_WORDS:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def split_sections(text, source):
+    """One passage per '## ' section; the document's intro is its own passage"""
+    title = source
+    passages = []
+    heading, lines = None, []
+
+    def flush():
+        body = '\n'.join(lines).strip()
+        if body:
+            passages.append({
+                'source': source,
+                'title': f"{title} - {heading}" if heading else title,
+                'text': body
+            })
+
+    for line in text.splitlines():
+        if line.startswith('# ') and heading is None:
+            title = line[2:].strip()
+        elif line.startswith('## '):
+            flush()
+            heading, lines = line[3:].strip(), []
+        else:
+            lines.append(line)
+    flush()
+    return passages
+
+
+class DocumentIndex:
+    """BM25 index over program document passages"""
+
+    def __init__(self, passages):
+        self.passages = passages
+        self.term_counts = []
+        self.lengths = []
+        document_frequency = Counter()
+        for passage in passages:
+            # Headings carry the question wording, so they count twice
+            counts = Counter(tokenize(passage['title']) * 2 + tokenize(passage['text']))
+            self.term_counts.append(counts)
+            self.lengths.append(sum(counts.values()))
+            document_frequency.update(counts.keys())
+
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        total = len(passages)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    @classmethod
+    def load(cls, directory=PROGRAM_DOCS_DIR):
+        passages = []
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith(('.md', '.txt')):
+                    continue
+                with open(os.path.join(directory, name), encoding='utf-8') as f:
+                    passages.extend(split_sections(f.read(), name))
+        else:
+            print(f"Program docs directory not found: {directory}")
+        return cls(passages)
+
+    def _score(self, weights):
+        scores = [0.0] * len(self.passages)
+        for term, weight in weights.items():
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, counts in enumerate(self.term_counts):
+                tf = counts.get(term)
+                if not tf:
+                    continue
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / self.average_length)
+                scores[i] += weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query, top_k=None, context_query=None):
+        """
+        Best passages for query, as (score, passage) pairs. Terms from
+        context_query (the previous question) count at a reduced weight.
+        """
+        top_k = RETRIEVAL_TOP_K if top_k is None else top_k
+        if not self.passages or top_k <= 0:
+            return []
+
+        weights = Counter()
+        for term in tokenize(context_query):
+            weights[term] = max(weights[term], CONTEXT_QUERY_WEIGHT)
+        for term in tokenize(query):
+            weights[term] = 1.0
+        if not weights:
+            return []
+
+        scores = self._score(weights)
+        ranked = sorted(((s, i) for i, s in enumerate(scores) if s > 0), reverse=True)
+        if not ranked:
+            return []
+
+        cutoff = ranked[0][0] * RETRIEVAL_RELATIVE_CUTOFF
+        return [(score, self.passages[i]) for score, i in ranked[:top_k] if score >= cutoff]
+
+
+def render_passages(results, max_tokens=None):
+    """Numbered reference block for the prompt, trimmed to the token budget"""
+    max_tokens = RETRIEVAL_MAX_TOKENS if max_tokens is None else max_tokens
+    blocks, used = [], 0
+    for n, (_, passage) in enumerate(results, start=1):
+        block = f"[{n}] {passage['title']}\n{passage['text']}"
+        tokens = estimate_tokens(block)
+        if blocks and used + tokens > max_tokens:
+            break
+        blocks.append(block)
+        used += tokens
+    return '\n\n'.join(blocks)
+
+
+_index = None
+
+
+def get_document_index():
+    """Index built on first use and kept for the life of the container"""
+    global _index
+    if _index is None:
+        started = time.perf_counter()
+        _index = DocumentIndex.load()
+        print(f"Indexed {len(_index.passages)} program doc passages in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return _index
+
+
+def retrieve_reference(query, context_query=None):
+    """Prompt-ready reference passages for a question, or '' if nothing matches"""
+    if not RETRIEVAL_ENABLED:
+        return ''
+    index = get_document_index()
+    started = time.perf_counter()
+    results = index.search(query, context_query=context_query)
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"Retrieved {[p['title'] for _, p in results]} in {elapsed:.2f} ms")
+    return render_passages(results)
@@ -0,0 +1,336 @@
+"""
+Local financial calculators exposed to the LLM as tools.
+
+The model calls these instead of doing arithmetic in its answer and then
+narrates the results. Formulas, defaults and rounding are the same as
+calculate_match_lambda (calculate_monthly_emi, calculate_debt_to_income_ratio,
+create_fallback_recommendation, calculate_projections), so the chatbot quotes
+the same numbers as the dashboard.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+DEFAULT_MAX_MONTHLY_MATCH_CAP = 500.0
+DEFAULT_MAX_ANNUAL_MATCH_CAP = 5500.0
+DEFAULT_SALARY_MATCH_CAP_PERCENTAGE = 6.0
+DEFAULT_TAX_BRACKET = 0.22
+DEFAULT_ANNUAL_RETURN_RATE = 0.06
+
+# Future value of annuity multipliers at 6% used by calculate_projections
+PROJECTION_MULTIPLIERS = {10: 13.18, 20: 36.79, 30: 79.06}
+
+MAX_SCHEDULE_YEARS = 50
+
+
+class ToolError(Exception):
+    """Raised for invalid tool arguments; reported back to the model"""
+    pass
+
+
+def calculate_monthly_emi(principal: float, annual_rate: float, years: int) -> float:
+    """Monthly EMI using the standard loan formula"""
+    if principal <= 0 or years <= 0:
+        return 0.0
+
+    monthly_rate = (annual_rate / 100) / 12
+    num_payments = years * 12
+
+    if monthly_rate == 0:
+        return round(principal / num_payments, 2)
+
+    emi = (principal * monthly_rate * (1 + monthly_rate) ** num_payments) / \
+          ((1 + monthly_rate) ** num_payments - 1)
+
+    return round(emi, 2)
+
+
+def calculate_debt_to_income_ratio(monthly_debt: float, monthly_income: float) -> float:
+    if monthly_income <= 0:
+        return 0.0
+    return round((monthly_debt / monthly_income) * 100, 2)
+
+
+def _monthly_salary(args: Dict[str, Any]) -> float:
+    if args.get('monthly_salary') is not None:
+        monthly = float(args['monthly_salary'])
+    elif args.get('annual_salary') is not None:
+        monthly = float(args['annual_salary']) / 12
+    else:
+        raise ToolError("Provide monthly_salary or annual_salary")
+    if monthly <= 0:
+        raise ToolError("Salary must be positive")
+    return monthly
+
+
+def _monthly_emi(args: Dict[str, Any]) -> float:
+    if args.get('monthly_emi') is not None:
+        return float(args['monthly_emi'])
+    try:
+        return calculate_monthly_emi(
+            float(args['loan_amount']), float(args['interest_rate']), int(args['loan_tenure_years'])
+        )
+    except KeyError:
+        raise ToolError("Provide monthly_emi or loan_amount, interest_rate and loan_tenure_years")
+
+
+def loan_emi(args: Dict[str, Any]) -> Dict[str, Any]:
+    principal = float(args['loan_amount'])
+    annual_rate = float(args['interest_rate'])
+    years = int(args['loan_tenure_years'])
+    if principal < 0 or annual_rate < 0 or annual_rate > 100 or years <= 0:
+        raise ToolError("loan_amount and interest_rate must be non-negative (rate <= 100) and loan_tenure_years positive")
+
+    emi = calculate_monthly_emi(principal, annual_rate, years)
+    total_paid = round(emi * years * 12, 2)
+    return {
+        'monthlyEmi': emi,
+        'numberOfPayments': years * 12,
+        'totalPaid': total_paid,
+        'totalInterest': round(total_paid - principal, 2)
+    }
+
+
+def amortization_schedule(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Year-by-year amortization, optionally with an extra monthly payment toward principal"""
+    principal = float(args['loan_amount'])
+    annual_rate = float(args['interest_rate'])
+    years = int(args['loan_tenure_years'])
+    extra = float(args.get('extra_monthly_payment') or 0)
+    if principal <= 0 or years <= 0 or years > MAX_SCHEDULE_YEARS or annual_rate < 0 or extra < 0:
+        raise ToolError(f"loan_amount must be positive, loan_tenure_years 1-{MAX_SCHEDULE_YEARS}, rate and extra payment non-negative")
+
+    emi = calculate_monthly_emi(principal, annual_rate, years)
+    monthly_rate = (annual_rate / 100) / 12
+
+    balance = principal
+    month = 0
+    total_interest = 0.0
+    schedule = []
+    year_interest = year_principal = 0.0
+
+    while balance > 0.005 and month < years * 12:
+        month += 1
+        interest = balance * monthly_rate
+        payment = min(emi + extra, balance + interest)
+        if month == years * 12:
+            # Final payment absorbs the EMI rounding residue
+            payment = balance + interest
+        balance -= payment - interest
+        total_interest += interest
+        year_interest += interest
+        year_principal += payment - interest
+
+        if month % 12 == 0 or balance <= 0.005:
+            schedule.append({
+                'year': (month + 11) // 12,
+                'interestPaid': round(year_interest, 2),
+                'principalPaid': round(year_principal, 2),
+                'endingBalance': round(max(balance, 0.0), 2)
+            })
+            year_interest = year_principal = 0.0
+
+    return {
+        'monthlyEmi': emi,
+        'extraMonthlyPayment': extra,
+        'payoffMonths': month,
+        'totalInterest': round(total_interest, 2),
+        'schedule': schedule
+    }
+
+
+def match_cap(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Employer match for one employee, same rules as create_fallback_recommendation"""
+    monthly_salary = _monthly_salary(args)
+    monthly_emi = _monthly_emi(args)
+
+    max_monthly_cap = float(args.get('max_monthly_match_cap') or DEFAULT_MAX_MONTHLY_MATCH_CAP)
+    max_annual_cap = float(args.get('max_annual_match_cap') or DEFAULT_MAX_ANNUAL_MATCH_CAP)
+    max_salary_percentage = float(args.get('max_salary_percentage_cap') or DEFAULT_SALARY_MATCH_CAP_PERCENTAGE)
+
+    dti_ratio = calculate_debt_to_income_ratio(monthly_emi, monthly_salary)
+    if dti_ratio < 15:
+        match_percentage, risk = 100, 'low'
+    elif dti_ratio < 25:
+        match_percentage, risk = 75, 'medium'
+    else:
+        match_percentage, risk = 50, 'high'
+
+    annual_salary = monthly_salary * 12
+    max_annual_based_on_salary = annual_salary * (max_salary_percentage / 100)
+    max_monthly_based_on_salary = max_annual_based_on_salary / 12
+
+    theoretical_monthly_match = monthly_emi * (match_percentage / 100)
+    monthly_match = min(theoretical_monthly_match, max_monthly_cap, max_monthly_based_on_salary)
+
+    if monthly_match == max_monthly_based_on_salary:
+        cap_applied = f"salary_percentage ({max_salary_percentage}%)"
+    elif monthly_match == max_monthly_cap:
+        cap_applied = "monthly_policy"
+    else:
+        cap_applied = "none"
+
+    annual_match = min(monthly_match * 12, max_annual_cap, max_annual_based_on_salary)
+
+    return {
+        'monthlyEmi': round(monthly_emi, 2),
+        'debtToIncomeRatio': dti_ratio,
+        'riskAssessment': risk,
+        'matchPercentage': match_percentage,
+        'theoreticalMonthlyMatch': round(theoretical_monthly_match, 2),
+        'monthlyMatch': round(monthly_match, 2),
+        'annualMatch': round(annual_match, 2),
+        'capApplied': cap_applied,
+        'limits': {
+            'maxMonthlyMatchCap': max_monthly_cap,
+            'maxAnnualMatchCap': max_annual_cap,
+            'maxMonthlyBasedOnSalary': round(max_monthly_based_on_salary, 2),
+            'maxAnnualBasedOnSalary': round(max_annual_based_on_salary, 2)
+        }
+    }
+
+
+def retirement_projection(args: Dict[str, Any]) -> Dict[str, Any]:
+    """Match contributions grown at 6%, plus tax and debt-to-income effects (calculate_projections)"""
+    if args.get('annual_match') is not None:
+        annual_match = float(args['annual_match'])
+        monthly_match = float(args.get('monthly_match') or annual_match / 12)
+    else:
+        match = match_cap(args)
+        annual_match = match['annualMatch']
+        monthly_match = match['monthlyMatch']
+    if annual_match < 0:
+        raise ToolError("annual_match must be non-negative")
+
+    result = {
+        'annualMatch': round(annual_match, 2),
+        'projectedRetirementValue10Years': round(annual_match * PROJECTION_MULTIPLIERS[10], 2),
+        'projectedRetirementValue20Years': round(annual_match * PROJECTION_MULTIPLIERS[20], 2),
+        'projectedRetirementValue30Years': round(annual_match * PROJECTION_MULTIPLIERS[30], 2),
+        'annualTaxBenefit': round(annual_match * DEFAULT_TAX_BRACKET, 2)
+    }
+
+    years = args.get('years')
+    if years is not None:
+        years = int(years)
+        if years <= 0 or years > MAX_SCHEDULE_YEARS:
+            raise ToolError(f"years must be between 1 and {MAX_SCHEDULE_YEARS}")
+        r = DEFAULT_ANNUAL_RETURN_RATE
+        result['years'] = years
+        result['projectedRetirementValue'] = round(annual_match * ((1 + r) ** years - 1) / r, 2)
+
+    if args.get('monthly_salary') is not None or args.get('annual_salary') is not None:
+        monthly_salary = _monthly_salary(args)
+        monthly_emi = _monthly_emi(args)
+        result['debtToIncomeImpact'] = {
+            'beforeMatch': calculate_debt_to_income_ratio(monthly_emi, monthly_salary),
+            'afterMatch': calculate_debt_to_income_ratio(max(0, monthly_emi - monthly_match), monthly_salary),
+            'improvement': calculate_debt_to_income_ratio(monthly_match, monthly_salary)
+        }
+
+    return result
+
+
+_LOAN_PROPERTIES = {
+    'loan_amount': {'type': 'number', 'description': 'Loan principal in USD'},
+    'interest_rate': {'type': 'number', 'description': 'Annual interest rate in percent, e.g. 6.5'},
+    'loan_tenure_years': {'type': 'integer', 'description': 'Loan term in years'}
+}
+
+_SALARY_PROPERTIES = {
+    'monthly_salary': {'type': 'number', 'description': 'Monthly net salary in USD'},
+    'annual_salary': {'type': 'number', 'description': 'Annual salary in USD (used when monthly_salary is not given)'}
+}
+
+_POLICY_PROPERTIES = {
+    'max_monthly_match_cap': {'type': 'number', 'description': 'Employer monthly match cap in USD (default 500)'},
+    'max_annual_match_cap': {'type': 'number', 'description': 'Employer annual match cap in USD (default 5500)'},
+    'max_salary_percentage_cap': {'type': 'number', 'description': 'Match cap as percent of salary (default 6)'}
+}
+
+TOOLS = {
+    'loan_emi': {
+        'function': loan_emi,
+        'description': 'Monthly loan payment (EMI), total paid and total interest for a loan.',
+        'parameters': {
+            'type': 'object',
+            'properties': dict(_LOAN_PROPERTIES),
+            'required': ['loan_amount', 'interest_rate', 'loan_tenure_years']
+        }
+    },
+    'amortization_schedule': {
+        'function': amortization_schedule,
+        'description': 'Year-by-year amortization: interest, principal and ending balance, payoff month and total interest. '
+                       'Pass extra_monthly_payment to see the effect of paying more.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                **_LOAN_PROPERTIES,
+                'extra_monthly_payment': {'type': 'number', 'description': 'Extra principal paid each month in USD'}
+            },
+            'required': ['loan_amount', 'interest_rate', 'loan_tenure_years']
+        }
+    },
+    'match_cap': {
+        'function': match_cap,
+        'description': "Employer student loan match for an employee under ASU's policy: match percentage from "
+                       'debt-to-income, monthly and annual match after the monthly, annual and salary caps, and which cap applied.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                **_SALARY_PROPERTIES,
+                'monthly_emi': {'type': 'number', 'description': 'Monthly loan payment in USD, if known'},
+                **_LOAN_PROPERTIES,
+                **_POLICY_PROPERTIES
+            },
+            'required': []
+        }
+    },
+    'retirement_projection': {
+        'function': retirement_projection,
+        'description': 'Retirement value of the employer match at 6% growth after 10/20/30 years (or a given number '
+                       'of years), the annual tax benefit and, with salary data, the debt-to-income impact. '
+                       'Pass annual_match directly or the same inputs as match_cap.',
+        'parameters': {
+            'type': 'object',
+            'properties': {
+                'annual_match': {'type': 'number', 'description': 'Annual employer match in USD'},
+                'monthly_match': {'type': 'number', 'description': 'Monthly employer match in USD'},
+                'years': {'type': 'integer', 'description': 'Custom projection horizon in years'},
+                **_SALARY_PROPERTIES,
+                'monthly_emi': {'type': 'number', 'description': 'Monthly loan payment in USD, if known'},
+                **_LOAN_PROPERTIES,
+                **_POLICY_PROPERTIES
+            },
+            'required': []
+        }
+    }
+}
+
+
+def tool_specs() -> List[Dict[str, Any]]:
+    """Tool definitions in the OpenAI-compatible format accepted by the gateway"""
+    return [
+        {
+            'type': 'function',
+            'function': {
+                'name': name,
+                'description': tool['description'],
+                'parameters': tool['parameters']
+            }
+        }
+        for name, tool in TOOLS.items()
+    ]
+
+
+def run_tool(name: str, arguments: Optional[str]) -> Dict[str, Any]:
+    """Execute one tool call; errors are returned to the model instead of raised"""
+    tool = TOOLS.get(name)
+    if tool is None:
+        return {'error': f"Unknown tool: {name}"}
+
+    try:
+        args = json.loads(arguments) if isinstance(arguments, str) and arguments else (arguments or {})
+        return tool['function'](args)
+    except (ToolError, ValueError, TypeError, KeyError) as e:
+        return {'error': f"Invalid arguments for {name}: {e}"}
@@ -0,0 +1,235 @@
+"""
+Parsing of data-collection answers (money, percentages, durations).
+
+Answers are validated and normalized as soon as they are collected, so
+user_data and the asu-user-profiles item hold numbers instead of raw text.
+Handles currency symbols and codes ($, USD, Rs, INR, €), shorthand multipliers
+(50k, 1.2m) and Indian lakh/crore notation including 5,00,000 grouping, and
+both 1,234.56 and 1.234,56 separator styles.
+"""
+
+import re
+from decimal import Decimal
+
+MAX_MONEY_AMOUNT = 1_000_000_000
+MAX_INTEREST_RATE = 100
+MAX_DURATION_YEARS = 50
+
+MULTIPLIERS = {
+    'k': 1e3, 'thousand': 1e3,
+    'm': 1e6, 'mn': 1e6, 'million': 1e6,
+    'b': 1e9, 'bn': 1e9, 'billion': 1e9,
+    'l': 1e5, 'lac': 1e5, 'lacs': 1e5, 'lakh': 1e5, 'lakhs': 1e5,
+    'cr': 1e7, 'crore': 1e7, 'crores': 1e7
+}
+INDIAN_MULTIPLIERS = {'l', 'lac', 'lacs', 'lakh', 'lakhs', 'cr', 'crore', 'crores'}
+
+CURRENCY_WORDS = {
+    '$': 'USD', 'usd': 'USD', 'us$': 'USD', 'dollar': 'USD', 'dollars': 'USD',
+    '₹': 'INR', 'rs': 'INR', 'rs.': 'INR', 'inr': 'INR', 'rupee': 'INR', 'rupees': 'INR',
+    '€': 'EUR', 'eur': 'EUR', 'euro': 'EUR', 'euros': 'EUR'
+}
+
+CURRENCY_SYMBOLS = {'USD': '$', 'INR': '₹', 'EUR': '€'}
+
+NUMBER_PATTERN = re.compile(r'\d[\d,.\s\']*\d|\d')
+
+
+class ParseError(ValueError):
+    """Answer could not be understood; the message is shown to the user"""
+    pass
+
+
+def _to_number(token, decimal_dot=True):
+    """
+    Parse one numeric token, working out which separators group thousands.
+    decimal_dot=False treats a lone '.' followed by exactly three digits as a
+    thousands separator (1.500 -> 1500), as in European money formats.
+    """
+    if re.search(r"[\s']", token):
+        # Spaces and apostrophes only ever group thousands: 50 000, 1'250'000
+        if not re.fullmatch(r"\d{1,3}([\s']\d{3})+([.,]\d+)?", token):
+            raise ParseError("more than one number found")
+        token = re.sub(r"[\s']", '', token)
+
+    if ',' in token and '.' in token:
+        # Whichever separator comes last is the decimal mark
+        if token.rfind(',') > token.rfind('.'):
+            token = token.replace('.', '').replace(',', '.')
+        else:
+            token = token.replace(',', '')
+    elif ',' in token:
+        groups = token.split(',')
+        if len(groups) == 2 and len(groups[1]) in (1, 2):
+            token = token.replace(',', '.')
+        else:
+            # 50,000 and Indian 5,00,000 grouping
+            token = token.replace(',', '')
+    elif token.count('.') > 1:
+        token = token.replace('.', '')
+    elif '.' in token and not decimal_dot:
+        whole, fraction = token.split('.')
+        if len(fraction) == 3 and len(whole) <= 3:
+            token = whole + fraction
+
+    try:
+        return float(token)
+    except ValueError:
+        raise ParseError(f"'{token}' is not a number")
+
+
+def _single_number(text, decimal_dot=True):
+    matches = NUMBER_PATTERN.findall(text)
+    if not matches:
+        raise ParseError("no number found")
+    if len(matches) > 1:
+        raise ParseError("more than one number found")
+    return _to_number(matches[0].strip(), decimal_dot)
+
+
+def parse_money(text):
+    """
+    Parse an amount such as "$50,000", "65k", "5 lakh", "Rs 1.2 crore" or
+    "₹5,00,000". Returns (amount, currency); currency defaults to USD, and
+    lakh/crore amounts without a currency are taken as INR.
+    """
+    raw = (text or '').strip().lower()
+    if not raw:
+        raise ParseError("Please enter an amount, for example $50,000 or 5 lakh.")
+
+    currency = None
+    for word, code in CURRENCY_WORDS.items():
+        pattern = re.escape(word) if not word.isalpha() else rf'\b{re.escape(word)}\b'
+        if re.search(pattern, raw):
+            currency = code
+            raw = re.sub(pattern, ' ', raw)
+
+    multiplier = 1.0
+    multiplier_word = None
+    match = re.search(r'(\d|\s)(k|thousand|mn|m|million|bn|b|billion|lakhs?|lacs?|l|crores?|cr)\b', raw)
+    if match:
+        multiplier_word = match.group(2)
+        multiplier = MULTIPLIERS[multiplier_word]
+        raw = raw[:match.start(2)] + ' ' + raw[match.end(2):]
+
+    raw = re.sub(r'\b(per|a|each)\s+(year|yr|annum|month|mo)\b|/\s*(year|yr|month|mo)\b|\bannually\b|\bmonthly\b', ' ', raw)
+    if re.search(r'[a-z]', raw):
+        raise ParseError("Please enter just the amount, for example $50,000, 65k or 5 lakh.")
+
+    try:
+        amount = _single_number(raw, decimal_dot=False) * multiplier
+    except ParseError:
+        raise ParseError("Please enter a single amount, for example $50,000, 65k or 5 lakh.")
+
+    if currency is None:
+        currency = 'INR' if multiplier_word in INDIAN_MULTIPLIERS else 'USD'
+
+    if amount <= 0:
+        raise ParseError("The amount must be greater than zero.")
+    if amount > MAX_MONEY_AMOUNT:
+        raise ParseError("That amount looks too large. Please double-check it.")
+
+    return round(amount, 2), currency
+
+
+def parse_percentage(text):
+    """Parse a rate such as "5.5%", "5,5 %" or "6.8 percent" into a number of percent"""
+    raw = (text or '').strip().lower()
+    raw = re.sub(r'%|\bpercent\b|\bper cent\b|\bpct\b|\bapr\b|\binterest\b|\brate\b|\bannual\b|\bfixed\b', ' ', raw)
+    if re.search(r'[a-z]', raw):
+        raise ParseError("Please enter the interest rate as a percentage, for example 5.5%.")
+
+    try:
+        rate = _single_number(raw)
+    except ParseError:
+        raise ParseError("Please enter a single interest rate, for example 5.5%.")
+
+    if rate < 0 or rate > MAX_INTEREST_RATE:
+        raise ParseError(f"The interest rate must be between 0% and {MAX_INTEREST_RATE}%.")
+    return round(rate, 3)
+
+
+def parse_duration_years(text):
+    """Parse a duration such as "10 years", "120 months", "7.5 yrs" or "5 years 6 months" into years"""
+    raw = (text or '').strip().lower()
+    if not raw:
+        raise ParseError("Please enter the repayment period, for example 10 years.")
+
+    parts = re.findall(r'(\d+(?:[.,]\d+)?)\s*(years?|yrs?|y|months?|mos?|m)?\b', raw)
+    leftover = re.sub(r'(\d+(?:[.,]\d+)?)\s*(years?|yrs?|y|months?|mos?|m)?\b|\band\b|,', ' ', raw)
+    if not parts or re.search(r'[a-z0-9]', leftover):
+        raise ParseError("Please enter the repayment period, for example 10 years or 120 months.")
+
+    years = 0.0
+    for number, unit in parts:
+        value = float(number.replace(',', '.'))
+        years += value / 12 if unit.startswith('m') else value
+
+    if years <= 0 or years > MAX_DURATION_YEARS:
+        raise ParseError(f"The repayment period must be between 1 month and {MAX_DURATION_YEARS} years.")
+    return round(years, 2)
+
+
+def _decimal(value):
+    # DynamoDB rejects floats
+    return Decimal(str(value))
+
+
+def normalize_field(field, text):
+    """
+    Validate one collected answer. Returns the user_data updates for it
+    (numbers as Decimal); raises ParseError with a user-facing message.
+    """
+    if text is not None and not isinstance(text, str):
+        text = str(text)
+    if field in ('debt_amount', 'salary'):
+        amount, currency = parse_money(text)
+        currency_field = 'debt_currency' if field == 'debt_amount' else 'salary_currency'
+        return {field: _decimal(amount), currency_field: currency}
+    if field == 'interest_rate':
+        return {field: _decimal(parse_percentage(text))}
+    if field == 'repayment_period':
+        return {field: _decimal(parse_duration_years(text))}
+    if field == 'asu_id':
+        asu_id = (text or '').strip()
+        if not asu_id or len(asu_id) > 64 or re.search(r'\s', asu_id):
+            raise ParseError("Please enter your ASU ID without spaces.")
+        return {field: asu_id}
+    return {field: (text or '').strip()}
+
+
+def format_money(amount, currency='USD'):
+    """Display an amount with lakh/crore grouping for INR"""
+    amount = float(amount)
+    if currency == 'INR':
+        whole, fraction = f"{amount:.2f}".split('.')
+        head, tail = whole[:-3], whole[-3:]
+        while len(head) > 2:
+            tail = f"{head[-2:]},{tail}"
+            head = head[:-2]
+        grouped = f"{head},{tail}" if head else tail
+        return f"₹{grouped}" + (f".{fraction}" if fraction != '00' else '')
+    symbol = CURRENCY_SYMBOLS.get(currency, '')
+    text = f"{amount:,.2f}".replace('.00', '') if amount == int(amount) else f"{amount:,.2f}"
+    return f"{symbol}{text}" if symbol else f"{text} {currency}"
+
+
+def format_field(user_data, field):
+    """Readable value of a collected field for prompts and confirmations"""
+    value = user_data.get(field)
+    if value is None:
+        return 'N/A'
+    if isinstance(value, str):
+        # Older profiles store numbers as text
+        try:
+            value = float(value)
+        except ValueError:
+            return value
+    if field in ('debt_amount', 'salary'):
+        currency_field = 'debt_currency' if field == 'debt_amount' else 'salary_currency'
+        return format_money(value, user_data.get(currency_field, 'USD'))
+    if field == 'interest_rate':
+        return f"{float(value):g}%"
+    if field == 'repayment_period':
+        return f"{float(value):g} years"
+    return str(value)
@@ -1,19 +1,58 @@
 import json
 import boto3
 import os
+import time
 from datetime import datetime
 import requests
+from botocore.exceptions import ClientError
 
 # DynamoDB
 dynamodb = boto3.resource('dynamodb')
 connections_table = dynamodb.Table(os.environ.get('CONNECTIONS_TABLE', 'chatbot-connections'))
 sessions_table = dynamodb.Table(os.environ.get('SESSIONS_TABLE', 'chatbot-sessions'))
+messages_table = dynamodb.Table(os.environ.get('MESSAGES_TABLE', 'chatbot-messages'))
 user_profiles_table = dynamodb.Table(os.environ.get('USER_PROFILES_TABLE', 'asu-user-profiles'))
+precomputed_table = dynamodb.Table(os.environ.get('PRECOMPUTED_RESPONSES_TABLE', 'chatbot-precomputed-responses'))
 
 from complete_auto_refresh_auth import create_client
+from session_store import SessionUnitOfWork, SessionConflictError
+from response_streaming import ResponseStreamer, StreamCancelled, iter_sse_deltas, iter_sse_events, merge_tool_call_deltas
+from chat_history import build_prompt_messages, compact_history, estimate_tokens, message_tokens, SUMMARY_MAX_TOKENS
+from turn_queue import create_turn_queue
+from answer_cache import AnswerCache, FAQ_CACHE_ENABLED
+from precomputed_responses import PrecomputedResponseStore, FIXED_PROMPTS, content_version
+from financial_tools import tool_specs, run_tool
+from input_parsing import ParseError, normalize_field, format_field
+from profile_snapshot import get_profile_snapshot
+from doc_retrieval import retrieve_reference
+from websocket_client import get_management_client, post_json
+from session_lifecycle import CONNECTION_TTL_SECONDS, TTL_ATTRIBUTE, disconnect, expires_at, reap_orphans
+from model_routing import LLM_MODEL, CONTEXT_ROUTES, RouteMetrics, classify_turn, route_settings
+
+STREAM_RESPONSES = os.environ.get('STREAM_RESPONSES', 'true').lower() == 'true'
+
+# Latency, tokens and estimated cost per route (faq / profile / optimization)
+route_metrics = RouteMetrics()
+
+precomputed_store = PrecomputedResponseStore(precomputed_table)
+
+# Local calculators the model calls instead of doing arithmetic itself
+TOOL_CALLING_ENABLED = os.environ.get('TOOL_CALLING_ENABLED', 'true').lower() == 'true'
+TOOL_CONTEXTS = ('OPTIMIZATION', 'PROFILE')
+MAX_TOOL_ROUNDS = int(os.environ.get('MAX_TOOL_ROUNDS', '2'))
+TOOL_ANSWER_MAX_TOKENS = int(os.environ.get('TOOL_ANSWER_MAX_TOKENS', '1500'))
+TOOL_INSTRUCTIONS = """
+
+CALCULATORS: Use the provided tools for every figure (loan payment, amortization and payoff timeline, employer match and caps, retirement projections and tax benefit). Never do the arithmetic yourself. Call the tools, then explain their results concisely, quoting the returned numbers exactly."""
+
+# Set TURN_QUEUE_URL to acknowledge messages on the route and answer them from the queue worker
+turn_queue = create_turn_queue()
 
 chatbot_client = None
 
+# Optional embedding model for matching paraphrased FAQ questions (hashing vectors otherwise)
+FAQ_EMBEDDING_MODEL = os.environ.get('FAQ_EMBEDDING_MODEL')
+
 def initialize_chatbot():
     """Initialize chatbot client (cached across invocations)"""
     global chatbot_client
@@ -25,11 +64,19 @@ def initialize_chatbot():
         )
     return chatbot_client
 
+def embed_question(text):
+    """Embed one FAQ question through the LLM gateway"""
+    client = initialize_chatbot()
+    client.cognito_auth.ensure_valid_token()
+    result = client.embeddings(FAQ_EMBEDDING_MODEL, [text])
+    return result['data'][0]['embedding']
+
+# Shared by every warm invocation of this container
+faq_answer_cache = AnswerCache(embed=embed_question if FAQ_EMBEDDING_MODEL else None) if FAQ_CACHE_ENABLED else None
+
 def get_apigw_client(event):
-    """Get API Gateway management client"""
-    domain = event['requestContext']['domainName']
-    stage = event['requestContext']['stage']
-    return boto3.client('apigatewaymanagementapi', endpoint_url=f"https://{domain}/{stage}")
+    """API Gateway management client for the event's endpoint (cached per container)"""
+    return get_management_client(event['requestContext']['domainName'], event['requestContext']['stage'])
 
 def get_session_id_for_connection(connection_id):
     """Get session ID associated with a connection"""
@@ -41,49 +88,72 @@ def get_session_id_for_connection(connection_id):
         print(f"Error getting session for connection: {e}")
     return None
 
+def begin_turn(connection_id, turn_id):
+    """
+    Mark turn_id as the connection's active turn and return the linked session ID.
+    A newer turn (or a cancel) replaces activeTurnId, which cancels in-flight streams.
+    """
+    try:
+        response = connections_table.update_item(
+            Key={'connectionId': connection_id},
+            UpdateExpression='SET activeTurnId = :turn',
+            ConditionExpression='attribute_exists(connectionId)',
+            ExpressionAttributeValues={':turn': turn_id},
+            ReturnValues='ALL_NEW'
+        )
+        return response.get('Attributes', {}).get('sessionId')
+    except ClientError as e:
+        # Only a missing connection means "no session"; throttling or a denied
+        # update must fail the turn instead of dropping it
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        print(f"Connection {connection_id} is gone, not starting {turn_id}")
+    return None
+
+def is_turn_superseded(connection_id, turn_id):
+    """True when another message or a cancel replaced this turn"""
+    try:
+        response = connections_table.get_item(
+            Key={'connectionId': connection_id},
+            ProjectionExpression='activeTurnId'
+        )
+        return response.get('Item', {}).get('activeTurnId') != turn_id
+    except Exception as e:
+        print(f"Error checking active turn: {e}")
+    return False
+
 def create_session_for_connection(connection_id):
-    """Create a new session and link it to the connection"""
+    """Create a new session and link it to the connection (replacing any earlier session)"""
     session_id = f"session_{datetime.now().timestamp()}"
 
     # Create session in sessions table
     session = {
         'sessionId': session_id,
         'connectionId': connection_id,
-        'history': [],
         'state': 'MENU',
         'user_data': {},
         'created_at': datetime.now().isoformat()
     }
-    save_session(session)
+    SessionUnitOfWork.create(sessions_table, messages_table, session).commit()
 
     # Link connection to session in connections table
-    connections_table.put_item(Item={
-        'connectionId': connection_id,
-        'sessionId': session_id,
-        'timestamp': datetime.now().isoformat()
-    })
+    previous = connections_table.put_item(
+        Item={
+            'connectionId': connection_id,
+            'sessionId': session_id,
+            'timestamp': datetime.now().isoformat(),
+            TTL_ATTRIBUTE: expires_at(CONNECTION_TTL_SECONDS)
+        },
+        ReturnValues='ALL_OLD'
+    ).get('Attributes') or {}
+
+    # A repeated 'start' on the same connection would otherwise orphan the old session
+    if previous.get('sessionId'):
+        delete_session(previous['sessionId'])
 
     print(f"Created session {session_id} for connection {connection_id}")
     return session_id
 
-def get_session(session_id):
-    """Retrieve session from DynamoDB"""
-    try:
-        response = sessions_table.get_item(Key={'sessionId': session_id})
-        if 'Item' in response:
-            return response['Item']
-    except Exception as e:
-        print(f"Error retrieving session: {e}")
-    return None
-
-def save_session(session):
-    """Save session to DynamoDB"""
-    try:
-        session['updated_at'] = datetime.now().isoformat()
-        sessions_table.put_item(Item=session)
-    except Exception as e:
-        print(f"Error saving session: {e}")
-
 def delete_session(session_id):
     """Delete session from DynamoDB"""
     try:
@@ -92,19 +162,42 @@ def delete_session(session_id):
     except Exception as e:
         print(f"Error deleting session: {e}")
 
-def get_user_profile(asu_id):
-    """Retrieve user profile from DynamoDB"""
+def load_profile_snapshot(session, asu_id, force_check=False):
+    """Session's cached profile snapshot; the profile is re-read only when its updatedAt changed"""
     try:
-        response = user_profiles_table.get_item(Key={'asuId': asu_id})
-        if 'Item' in response:
-            return response['Item']
+        return get_profile_snapshot(user_profiles_table, session, asu_id, force_check)
     except Exception as e:
         print(f"Error retrieving user profile: {e}")
     return None
 
+def collect_answer(user_data, field, user_message):
+    """
+    Validate and normalize one data-collection answer into user_data.
+    Returns a re-prompt for bad input (the state does not advance), else None.
+    """
+    try:
+        user_data.update(normalize_field(field, user_message))
+        return None
+    except ParseError as e:
+        return f"Sorry, I couldn't use that. {e}"
+
+def profile_item(user_data):
+    """asu-user-profiles item for the collected data (numbers stored as numbers)"""
+    return {
+        'asuId': user_data['asu_id'],
+        'debtAmount': user_data['debt_amount'],
+        'debtCurrency': user_data.get('debt_currency', 'USD'),
+        'repaymentPeriod': user_data['repayment_period'],
+        'interestRate': user_data['interest_rate'],
+        'salary': user_data['salary'],
+        'salaryCurrency': user_data.get('salary_currency', 'USD')
+    }
+
 def save_user_profile(profile):
     """Save user profile to DynamoDB"""
     try:
+        # updatedAt versions the profile (see profile_snapshot)
+        profile.setdefault('updatedAt', datetime.utcnow().isoformat())
         user_profiles_table.put_item(Item=profile)
     except Exception as e:
         print(f"Error saving user profile: {e}")
@@ -124,19 +217,10 @@ def get_menu_message():
 
 Reply with the number (1, 2, or 3) to continue."""
 
-def get_llm_response(session_id, user_message, context=None):
-    """Call LLM with enhanced context"""
-    client = initialize_chatbot()
-    client.cognito_auth.ensure_valid_token()
-    cognito_jwt_token = client.cognito_auth.get_access_key()
-
-    session = get_session(session_id)
-    if not session:
-        return "Session not found. Please start a new session."
-
-    # Build system prompt based on context
+def get_system_prompt(context):
+    """System prompt for a conversation context (without user profile data)"""
     if context == 'OPTIMIZATION':
-        system_prompt = """You are a financial optimization specialist for ASU's Student Loan Repayment Match Program.
+        return """You are a financial optimization specialist for ASU's Student Loan Repayment Match Program.
 
 Your task: Create a detailed, month-by-month plan that maximizes retirement savings while efficiently paying off student loans.
 
@@ -152,7 +236,7 @@ You MUST provide:
 Use the user's specific data to provide precise calculations, not generic advice."""
 
     elif context == 'PROFILE':
-        system_prompt = """You are a personalized financial assistant for ASU employees with access to their profile data.
+        return """You are a personalized financial assistant for ASU employees with access to their profile data.
 
 Provide specific, data-driven answers based on the user's actual:
 - Student loan balance and payment history
@@ -164,91 +248,391 @@ Provide specific, data-driven answers based on the user's actual:
 Answer questions with exact numbers, dates, and personalized calculations. Be precise and actionable."""
 
     elif context == 'FAQ':
-        system_prompt = """You are an expert on ASU's Student Loan Repayment Match Program and SECURE 2.0 legislation.
+        return """You are an expert on ASU's Student Loan Repayment Match Program and SECURE 2.0 legislation.
 
-Provide clear, accurate information about:
-- How employer match works (mechanics, eligibility, limits)
-- SECURE 2.0 provisions and benefits
-- Enrollment procedures and requirements
-- Loan qualification criteria (federal vs private)
-- Common troubleshooting issues
-- Strategic financial planning advice
-
-Be thorough but concise. Use examples when helpful."""
+Answer questions about the employer match, eligibility, qualifying loans, enrollment and SECURE 2.0. Be thorough but concise. Use examples when helpful."""
 
     else:
-        system_prompt = """You are a helpful financial advisor for ASU's Student Loan Repayment Match Program."""
+        return """You are a helpful financial advisor for ASU's Student Loan Repayment Match Program."""
+
+def get_grounded_system_prompt(context, question, previous_question=None):
+    """System prompt plus the program document passages relevant to an FAQ question"""
+    system_prompt = get_system_prompt(context)
+    if context != 'FAQ':
+        return system_prompt
+
+    try:
+        reference = retrieve_reference(question, previous_question)
+    except Exception as e:
+        print(f"Error retrieving program docs: {e}")
+        reference = ''
+
+    if reference:
+        system_prompt += f"""
+
+PROGRAM REFERENCE (official program documents):
+{reference}
+
+Base your answer on the reference above and prefer its figures and rules over general knowledge. If it does not cover the question, say so and suggest contacting ASU HR Benefits."""
+    return system_prompt
+
+def get_llm_headers():
+    client = initialize_chatbot()
+    client.cognito_auth.ensure_valid_token()
+    cognito_jwt_token = client.cognito_auth.get_access_key()
+    return {
+        "x-api-key": f"Bearer {os.environ['BEARER_TOKEN']}",
+        "Authorization": f"Bearer {cognito_jwt_token}",
+        "Content-Type": "application/json"
+    }
+
+def get_llm_response(session, user_message, context=None, streamer=None):
+    """
+    Call LLM with enhanced context (history is recorded on the in-memory session).
+    With a streamer, deltas are forwarded to the client as they arrive; returns
+    None if the stream was cancelled by a newer turn.
+    """
+    # General FAQ questions are answered once per container and reused for
+    # paraphrases. The cache is checked before any token, routing or prompt work.
+    # Sessions with a profile get personalized answers, so they neither read nor
+    # write the shared cache.
+    cache_probe = None
+    if context == 'FAQ' and faq_answer_cache is not None and not session.get('user_data'):
+        started = time.perf_counter()
+        cached_answer, cache_probe = faq_answer_cache.lookup(user_message)
+        if cached_answer:
+            route, brief = classify_turn(context, user_message)
+            route_metrics.record(
+                route, route_settings(route, brief)['model'], (time.perf_counter() - started) * 1000,
+                0, 0, source='cache', brief=brief
+            )
+            record_turn(session, user_message, cached_answer, get_llm_headers)
+            return cached_answer
+
+    previous_question = next(
+        (m['content'] for m in reversed(session.get('history', [])) if m.get('role') == 'user'), None
+    )
+    system_prompt = get_grounded_system_prompt(context, user_message, previous_question)
 
     # Add user profile context if available
-    if session.get('user_data'):
+    snapshot = None
+    if context == 'PROFILE' and session.get('user_data', {}).get('asu_id'):
+        snapshot = load_profile_snapshot(session, session['user_data']['asu_id'])
+
+    if snapshot and snapshot.get('block'):
+        system_prompt += f"\n\nUSER PROFILE (ASU records):\n{snapshot['block']}"
+    elif session.get('user_data'):
         profile_context = "\n\nUSER PROFILE DATA:\n"
         for key, value in session['user_data'].items():
             profile_context += f"- {key}: {value}\n"
         system_prompt += profile_context
 
-    messages = [{"role": "system", "content": system_prompt}]
-
-    # Add conversation history
-    history = session.get('history', [])
-    recent_history = history[-15:] if len(history) > 15 else history
-    for msg in recent_history:
-        messages.append(msg)
+    use_tools = TOOL_CALLING_ENABLED and context in TOOL_CONTEXTS
+    if use_tools:
+        system_prompt += TOOL_INSTRUCTIONS
 
-    messages.append({"role": "user", "content": user_message})
+    # Rolling summary plus the newest history that fits the token budget
+    messages = build_prompt_messages(system_prompt, session, user_message)
 
     # Call LLM
-    headers = {
-        "x-api-key": f"Bearer {os.environ['BEARER_TOKEN']}",
-        "Authorization": f"Bearer {cognito_jwt_token}",
-        "Content-Type": "application/json"
-    }
+    headers = get_llm_headers()
+
+    # Model, token budget and timeout come from the turn's route
+    route, brief = classify_turn(context, user_message)
+    settings = route_settings(route, brief)
+    print(f"Routing turn to {route}{' (brief)' if brief else ''}: {settings['model']}, max_tokens={settings['max_tokens']}")
 
     payload = {
-        "model": "Anthropic Claude-V3.5 Sonnet Vertex AI (Internal)",
+        "model": settings['model'],
         "messages": messages,
-        "temperature": 0.7,
-        "max_tokens": 3000
+        "temperature": settings['temperature'],
+        "max_tokens": settings['max_tokens']
     }
+    if use_tools:
+        # Narrating calculator results needs far fewer tokens than doing the math
+        payload['max_tokens'] = min(payload['max_tokens'], TOOL_ANSWER_MAX_TOKENS)
 
-    try:
-        response = requests.post(
-            "https://api-llm.ctl-gait.clientlabsaft.com/chat/completions",
-            headers=headers,
-            json=payload,
-            timeout=60
-        )
+    started = time.perf_counter()
 
-        if response.status_code == 200:
-            result = response.json()
+    try:
+        usage = None
+        direct_answer = None
+        if use_tools:
+            try:
+                direct_answer = resolve_tool_calls(headers, payload, settings['timeout'], streamer)
+            except StreamCancelled:
+                print(f"Stream cancelled for turn {streamer.turn_id}")
+                streamer.cancel()
+                return None
+
+        if direct_answer:
+            assistant_message = direct_answer
+        elif streamer:
+            assistant_message = stream_llm_completion(headers, payload, streamer, settings['timeout'])
+            if assistant_message is None:
+                return None
+        else:
+            result = post_chat_completion(headers, payload, timeout=settings['timeout'])
             assistant_message = result['choices'][0]['message']['content']
+            usage = result.get('usage')
+
+        # Gateway usage when reported, otherwise the same estimate used for history budgeting
+        latency_ms = (time.perf_counter() - started) * 1000
+        usage = usage or {}
+        route_metrics.record(
+            route, settings['model'], latency_ms,
+            usage.get('prompt_tokens') or sum(message_tokens(m) for m in payload['messages']),
+            usage.get('completion_tokens') or estimate_tokens(assistant_message),
+            brief=brief
+        )
 
-            # Update session history
-            session['history'].append({"role": "user", "content": user_message})
-            session['history'].append({"role": "assistant", "content": assistant_message})
-            save_session(session)
+        # Only probed for sessions without a profile, so the answer is not personalized
+        if cache_probe:
+            faq_answer_cache.store(cache_probe, assistant_message)
 
-            return assistant_message
-        else:
-            raise Exception(f"API Error: {response.status_code} - {response.text}")
+        record_turn(session, user_message, assistant_message, lambda: headers)
+        return assistant_message
 
     except Exception as e:
         print(f"Error calling LLM: {str(e)}")
         return "I apologize, but I'm experiencing technical difficulties. Please try again."
 
-def handle_message_flow(session_id, user_message, provided_user_data=None):
-    """Handle conversational flow with optional pre-provided user data"""
-    session = get_session(session_id)
-    if not session:
-        return "Session not found. Please reconnect to start a new session."
+def record_turn(session, user_message, assistant_message, get_headers):
+    """
+    Append the turn to the session history (committed by the turn's unit of work).
+    get_headers is only called when compaction needs an LLM summary.
+    """
+    session.setdefault('history', []).append({"role": "user", "content": user_message})
+    session['history'].append({"role": "assistant", "content": assistant_message})
+    compact_history(session, lambda summary, folded: summarize_history(get_headers(), summary, folded))
+
+def post_chat_completion(headers, payload, timeout=60):
+    response = requests.post(
+        "https://api-llm.ctl-gait.clientlabsaft.com/chat/completions",
+        headers=headers,
+        json=payload,
+        timeout=timeout
+    )
+
+    if response.status_code != 200:
+        raise Exception(f"API Error: {response.status_code} - {response.text}")
+
+    return response.json()
+
+def resolve_tool_calls(headers, payload, timeout=60, streamer=None):
+    """
+    Let the model call the local calculators. Tool calls and their results are
+    appended to payload['messages']. Returns the model's text if it answered
+    without calling a tool, otherwise None and the caller produces the final
+    (possibly streamed) narration from the tool results.
+
+    With a streamer each round is a streamed completion: text is forwarded as
+    it arrives, so a direct answer reaches the client as fast as a plain turn,
+    and only tool call deltas are held back until the round ends.
+    StreamCancelled propagates to the caller.
+    """
+    specs = tool_specs()
+    base_length = len(payload['messages'])
 
+    try:
+        for _ in range(MAX_TOOL_ROUNDS):
+            round_payload = {**payload, 'tools': specs, 'tool_choice': 'auto'}
+            if streamer:
+                content, tool_calls = stream_tool_round(headers, round_payload, streamer, timeout)
+            else:
+                message = post_chat_completion(headers, round_payload, timeout=timeout)['choices'][0]['message']
+                content, tool_calls = message.get('content'), message.get('tool_calls') or []
+            if not tool_calls:
+                if streamer:
+                    streamer.finish()
+                return content
+
+            payload['messages'].append({
+                'role': 'assistant',
+                'content': content or '',
+                'tool_calls': tool_calls
+            })
+            for call in tool_calls:
+                name = call['function']['name']
+                output = run_tool(name, call['function'].get('arguments'))
+                print(f"Tool {name}: {json.dumps(output)[:300]}")
+                payload['messages'].append({
+                    'role': 'tool',
+                    'tool_call_id': call['id'],
+                    'content': json.dumps(output)
+                })
+
+    except StreamCancelled:
+        raise
+    except Exception as e:
+        if streamer and streamer.sequence:
+            # Text already reached the client, so a second answer cannot start over
+            raise
+        # Gateway or model without tool support: answer the plain prompt instead
+        print(f"Tool calling failed, answering without tools: {e}")
+        del payload['messages'][base_length:]
+        return None
+
+    # Tool results are in the conversation; the narration may not call more tools
+    payload['tools'] = specs
+    payload['tool_choice'] = 'none'
+    return None
+
+def stream_tool_round(headers, payload, streamer, timeout=60):
+    """
+    One streamed completion with tools offered. Returns (content, tool_calls):
+    content deltas are pushed to the streamer as they arrive, tool call deltas
+    are assembled into whole calls.
+    """
+    response = open_completion_stream(headers, payload, timeout)
+    try:
+        parts = []
+        calls = {}
+        for kind, value in iter_sse_events(response):
+            if kind == 'content':
+                streamer.start()
+                parts.append(value)
+                streamer.push(value)
+            else:
+                merge_tool_call_deltas(calls, value)
+        if calls:
+            # Text before the tool calls goes out now; the narration follows it
+            streamer.flush()
+        return ''.join(parts), [calls[index] for index in sorted(calls)]
+    finally:
+        response.close()
+
+def get_fixed_prompt_response(session, prompt_id, streamer=None):
+    """
+    Answer a fixed prompt from the precomputed store (rendered once per content
+    version). Sessions with profile data still get a live, personalized answer.
+    """
+    fixed = FIXED_PROMPTS[prompt_id]
+    if session.get('user_data'):
+        return get_llm_response(session, fixed['prompt'], fixed['context'], streamer)
+
+    settings = route_settings(CONTEXT_ROUTES[fixed['context']])
+    version = fixed_prompt_version(fixed, settings)
+    try:
+        response = precomputed_store.get_or_render(
+            prompt_id, version, lambda: render_fixed_prompt(fixed), settings['model']
+        )
+    except Exception as e:
+        print(f"Error rendering precomputed response {prompt_id}: {e}")
+        response = None
+
+    if not response:
+        return get_llm_response(session, fixed['prompt'], fixed['context'], streamer)
+
+    session.setdefault('history', []).append({"role": "user", "content": fixed['prompt']})
+    session['history'].append({"role": "assistant", "content": response})
+    compact_history(session)
+    return response
+
+def fixed_prompt_version(fixed, settings):
+    return content_version(
+        get_grounded_system_prompt(fixed['context'], fixed['prompt']), fixed['prompt'], settings['model'],
+        {'temperature': settings['temperature'], 'max_tokens': settings['max_tokens']}
+    )
+
+def render_fixed_prompt(fixed):
+    """One non-streaming completion for a fixed prompt, with no history or profile data"""
+    settings = route_settings(CONTEXT_ROUTES[fixed['context']])
+    result = post_chat_completion(get_llm_headers(), {
+        "model": settings['model'],
+        "messages": [
+            {"role": "system", "content": get_grounded_system_prompt(fixed['context'], fixed['prompt'])},
+            {"role": "user", "content": fixed['prompt']}
+        ],
+        "temperature": settings['temperature'],
+        "max_tokens": settings['max_tokens']
+    }, timeout=settings['timeout'])
+    return result['choices'][0]['message']['content']
+
+def precompute_fixed_prompts():
+    """Render every fixed prompt for the current content version (run after a deploy)"""
+    rendered = {}
+    for prompt_id, fixed in FIXED_PROMPTS.items():
+        settings = route_settings(CONTEXT_ROUTES[fixed['context']])
+        version = fixed_prompt_version(fixed, settings)
+        response = precomputed_store.get_or_render(prompt_id, version, lambda: render_fixed_prompt(fixed), settings['model'])
+        rendered[prompt_id] = {'version': version, 'ready': bool(response)}
+    return rendered
+
+def summarize_history(headers, previous_summary, messages):
+    """Fold older turns into the rolling summary with a short, low-temperature completion"""
+    transcript = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+    prompt = f"""Update the running summary of a conversation between an ASU employee and a student loan advisor.
+Keep every figure the user shared (debt, salary, rates, dates) and any decisions or open questions.
+
+CURRENT SUMMARY:
+{previous_summary or '(none)'}
+
+NEW MESSAGES:
+{transcript}
+
+Reply with the updated summary only, as short bullet points."""
+
+    result = post_chat_completion(headers, {
+        "model": LLM_MODEL,
+        "messages": [{"role": "user", "content": prompt}],
+        "temperature": 0,
+        "max_tokens": SUMMARY_MAX_TOKENS
+    }, timeout=20)
+    return result['choices'][0]['message']['content']
+
+def open_completion_stream(headers, payload, timeout=60):
+    """Start a streamed completion. Raises on a non-200 response."""
+    response = requests.post(
+        "https://api-llm.ctl-gait.clientlabsaft.com/chat/completions",
+        headers=headers,
+        json={**payload, "stream": True},
+        stream=True,
+        timeout=(10, timeout)
+    )
+    if response.status_code != 200:
+        error = f"API Error: {response.status_code} - {response.text}"
+        response.close()
+        raise Exception(error)
+    return response
+
+def stream_llm_completion(headers, payload, streamer, timeout=60):
+    """Stream a completion through the streamer; returns the full text, or None if cancelled"""
+    response = open_completion_stream(headers, payload, timeout)
+
+    try:
+        streamer.start()
+        parts = []
+        for delta in iter_sse_deltas(response):
+            parts.append(delta)
+            streamer.push(delta)
+        streamer.finish()
+        return ''.join(parts)
+
+    except StreamCancelled:
+        print(f"Stream cancelled for turn {streamer.turn_id}")
+        streamer.cancel()
+        return None
+
+    finally:
+        response.close()
+
+def handle_message_flow(session, user_message, provided_user_data=None, streamer=None):
+    """
+    Handle conversational flow with optional pre-provided user data.
+    Mutates the loaded session in place; the caller commits it once.
+    """
     state = session.get('state', 'MENU')
     user_data = session.get('user_data', {})
 
-    # Merge provided user_data if available
+    # Merge provided user_data if available, normalized like typed answers
     if provided_user_data:
-        user_data.update(provided_user_data)
+        for field, value in provided_user_data.items():
+            try:
+                user_data.update(normalize_field(field, value))
+            except ParseError as e:
+                print(f"Ignoring provided {field}: {e}")
         session['user_data'] = user_data
-        save_session(session)
 
     # Main menu selection
     if state == 'MENU':
@@ -261,15 +645,10 @@ def handle_message_flow(session_id, user_message, provided_user_data=None):
                 # Skip data collection, go straight to optimization
                 session['state'] = 'OPT_COMPLETE'
                 session['context'] = 'OPTIMIZATION'
-                save_session(session)
 
                 # Save profile
                 save_user_profile({
-                    'asuId': user_data['asu_id'],
-                    'debtAmount': user_data['debt_amount'],
-                    'repaymentPeriod': user_data['repayment_period'],
-                    'interestRate': user_data['interest_rate'],
-                    'salary': user_data['salary'],
+                    **profile_item(user_data),
                     'updated_at': datetime.now().isoformat()
                 })
 
@@ -277,10 +656,10 @@ def handle_message_flow(session_id, user_message, provided_user_data=None):
                 prompt = f"""Based on this employee's data, create a detailed month-by-month optimization plan:
 
 ASU ID: {user_data['asu_id']}
-Student Loan Debt: {user_data['debt_amount']}
-Repayment Period: {user_data['repayment_period']}
-Interest Rate: {user_data['interest_rate']}
-Annual Salary: {user_data['salary']}
+Student Loan Debt: {format_field(user_data, 'debt_amount')}
+Repayment Period: {format_field(user_data, 'repayment_period')}
+Interest Rate: {format_field(user_data, 'interest_rate')}
+Annual Salary: {format_field(user_data, 'salary')}
 
 Provide:
 1. Monthly budget breakdown
@@ -290,35 +669,28 @@ Provide:
 5. Tax optimization tips
 6. Specific action steps"""
 
-                return get_llm_response(session_id, prompt, 'OPTIMIZATION')
+                return get_llm_response(session, prompt, 'OPTIMIZATION', streamer)
             else:
                 # Start collecting missing data
                 session['state'] = 'OPT_ASU_ID'
                 session['context'] = 'OPTIMIZATION'
-                save_session(session)
                 return "Great! Let's create your personalized retirement optimization plan.\n\nFirst, please provide your ASU ID:"
 
         elif user_message.strip() == '2':
             # Check if ASU ID is provided
             if 'asu_id' in user_data:
-                # Fetch profile from DynamoDB
-                profile = get_user_profile(user_data['asu_id'])
-
-                if profile:
-                    session['user_data'].update({
-                        'debt_amount': profile.get('debtAmount', 'N/A'),
-                        'salary': profile.get('salary', 'N/A'),
-                        'repayment_period': profile.get('repaymentPeriod', 'N/A'),
-                        'interest_rate': profile.get('interestRate', 'N/A')
-                    })
+                # Profile snapshot (reused from the session unless the profile changed)
+                snapshot = load_profile_snapshot(session, user_data['asu_id'], force_check=True)
+
+                if snapshot:
+                    session['user_data'].update(snapshot['fields'])
                     session['state'] = 'PROFILE_QUESTIONS'
                     session['context'] = 'PROFILE'
-                    save_session(session)
                     return f"""Found your profile!
 - ASU ID: {user_data['asu_id']}
-- Debt Amount: {profile.get('debtAmount')}
-- Salary: {profile.get('salary')}
-- Interest Rate: {profile.get('interestRate')}
+- Debt Amount: {format_field(session['user_data'], 'debt_amount')}
+- Salary: {format_field(session['user_data'], 'salary')}
+- Interest Rate: {format_field(session['user_data'], 'interest_rate')}
 
 What would you like to know? You can ask:
 - How much match have I earned this year?
@@ -329,65 +701,63 @@ What would you like to know? You can ask:
                     # Profile not found, collect data
                     session['state'] = 'PROFILE_COLLECT_DEBT'
                     session['context'] = 'PROFILE'
-                    save_session(session)
                     return f"I don't have a profile for ASU ID: {user_data['asu_id']}. Let's create one.\n\nWhat is your total student loan debt?"
             else:
                 session['state'] = 'PROFILE_ASU_ID'
                 session['context'] = 'PROFILE'
-                save_session(session)
                 return "I'll help answer questions based on your profile.\n\nPlease provide your ASU ID:"
 
         elif user_message.strip() == '3':
             session['state'] = 'FAQ'
             session['context'] = 'FAQ'
-            save_session(session)
-            return get_llm_response(session_id, "Provide a brief overview of ASU's Student Loan Repayment Match Program and SECURE 2.0, then ask what specific information the user wants to know.", 'FAQ')
+            return get_fixed_prompt_response(session, 'faq_overview', streamer)
 
         else:
             return get_menu_message()
 
     # Optimization flow - collect data step by step
     elif state == 'OPT_ASU_ID':
-        user_data['asu_id'] = user_message.strip()
+        retry = collect_answer(user_data, 'asu_id', user_message)
+        if retry:
+            return retry
         session['state'] = 'OPT_DEBT_AMOUNT'
         session['user_data'] = user_data
-        save_session(session)
         return "What is your total student loan debt amount? (e.g., $50,000)"
 
     elif state == 'OPT_DEBT_AMOUNT':
-        user_data['debt_amount'] = user_message.strip()
+        retry = collect_answer(user_data, 'debt_amount', user_message)
+        if retry:
+            return retry
         session['state'] = 'OPT_REPAY_PERIOD'
         session['user_data'] = user_data
-        save_session(session)
         return "How many years do you have to repay your loans? (e.g., 10 years)"
 
     elif state == 'OPT_REPAY_PERIOD':
-        user_data['repayment_period'] = user_message.strip()
+        retry = collect_answer(user_data, 'repayment_period', user_message)
+        if retry:
+            return retry
         session['state'] = 'OPT_INTEREST_RATE'
         session['user_data'] = user_data
-        save_session(session)
         return "What is your interest rate on the loan? (e.g., 5.5%)"
 
     elif state == 'OPT_INTEREST_RATE':
-        user_data['interest_rate'] = user_message.strip()
+        retry = collect_answer(user_data, 'interest_rate', user_message)
+        if retry:
+            return retry
         session['state'] = 'OPT_SALARY'
         session['user_data'] = user_data
-        save_session(session)
         return "What is your annual salary? (e.g., $65,000)"
 
     elif state == 'OPT_SALARY':
-        user_data['salary'] = user_message.strip()
+        retry = collect_answer(user_data, 'salary', user_message)
+        if retry:
+            return retry
         session['state'] = 'OPT_COMPLETE'
         session['user_data'] = user_data
-        save_session(session)
 
         # Save profile to DynamoDB
         save_user_profile({
-            'asuId': user_data['asu_id'],
-            'debtAmount': user_data['debt_amount'],
-            'repaymentPeriod': user_data['repayment_period'],
-            'interestRate': user_data['interest_rate'],
-            'salary': user_data['salary'],
+            **profile_item(user_data),
             'created_at': datetime.now().isoformat()
         })
 
@@ -395,96 +765,212 @@ What would you like to know? You can ask:
         prompt = f"""Based on this employee's data, create a detailed optimization plan:
 
 ASU ID: {user_data['asu_id']}
-Student Loan Debt: {user_data['debt_amount']}
-Repayment Period: {user_data['repayment_period']}
-Interest Rate: {user_data['interest_rate']}
-Annual Salary: {user_data['salary']}
+Student Loan Debt: {format_field(user_data, 'debt_amount')}
+Repayment Period: {format_field(user_data, 'repayment_period')}
+Interest Rate: {format_field(user_data, 'interest_rate')}
+Annual Salary: {format_field(user_data, 'salary')}
 
 Provide specific monthly budget and timeline."""
 
-        return get_llm_response(session_id, prompt, 'OPTIMIZATION')
+        return get_llm_response(session, prompt, 'OPTIMIZATION', streamer)
 
     # Profile-based questions flow
     elif state == 'PROFILE_ASU_ID':
         asu_id = user_message.strip()
-        profile = get_user_profile(asu_id)
-
-        if profile:
-            session['user_data'] = {
-                'asu_id': profile['asuId'],
-                'debt_amount': profile.get('debtAmount'),
-                'salary': profile.get('salary'),
-                'repayment_period': profile.get('repaymentPeriod'),
-                'interest_rate': profile.get('interestRate')
-            }
+        snapshot = load_profile_snapshot(session, asu_id, force_check=True)
+
+        if snapshot:
+            session['user_data'] = {'asu_id': snapshot['asuId'], **snapshot['fields']}
             session['state'] = 'PROFILE_QUESTIONS'
-            save_session(session)
             return f"""Found your profile! Here's what I have:
-- Debt Amount: {profile.get('debtAmount')}
-- Salary: {profile.get('salary')}
+- Debt Amount: {format_field(session['user_data'], 'debt_amount')}
+- Salary: {format_field(session['user_data'], 'salary')}
 
 What would you like to know?"""
 
         else:
             session['state'] = 'PROFILE_COLLECT_DEBT'
             session['user_data'] = {'asu_id': asu_id}
-            save_session(session)
             return "I don't have a profile for this ASU ID. Let's create one.\n\nWhat is your total student loan debt?"
 
     elif state == 'PROFILE_COLLECT_DEBT':
-        user_data['debt_amount'] = user_message.strip()
+        retry = collect_answer(user_data, 'debt_amount', user_message)
+        if retry:
+            return retry
         session['state'] = 'PROFILE_COLLECT_PERIOD'
         session['user_data'] = user_data
-        save_session(session)
         return "How many years do you have to repay?"
 
     elif state == 'PROFILE_COLLECT_PERIOD':
-        user_data['repayment_period'] = user_message.strip()
+        retry = collect_answer(user_data, 'repayment_period', user_message)
+        if retry:
+            return retry
         session['state'] = 'PROFILE_COLLECT_RATE'
         session['user_data'] = user_data
-        save_session(session)
         return "What is your interest rate?"
 
     elif state == 'PROFILE_COLLECT_RATE':
-        user_data['interest_rate'] = user_message.strip()
+        retry = collect_answer(user_data, 'interest_rate', user_message)
+        if retry:
+            return retry
         session['state'] = 'PROFILE_COLLECT_SALARY'
         session['user_data'] = user_data
-        save_session(session)
         return "What is your annual salary?"
 
     elif state == 'PROFILE_COLLECT_SALARY':
-        user_data['salary'] = user_message.strip()
+        retry = collect_answer(user_data, 'salary', user_message)
+        if retry:
+            return retry
         session['state'] = 'PROFILE_QUESTIONS'
         session['user_data'] = user_data
-        save_session(session)
 
         # Save new profile
         save_user_profile({
-            'asuId': user_data['asu_id'],
-            'debtAmount': user_data['debt_amount'],
-            'repaymentPeriod': user_data['repayment_period'],
-            'interestRate': user_data['interest_rate'],
-            'salary': user_data['salary'],
+            **profile_item(user_data),
             'created_at': datetime.now().isoformat()
         })
 
         return "Profile created! What would you like to know?"
 
     elif state == 'PROFILE_QUESTIONS':
-        return get_llm_response(session_id, user_message, 'PROFILE')
+        return get_llm_response(session, user_message, 'PROFILE', streamer)
 
     elif state == 'FAQ':
-        return get_llm_response(session_id, user_message, 'FAQ')
+        return get_llm_response(session, user_message, 'FAQ', streamer)
 
     elif state == 'OPT_COMPLETE':
-        return get_llm_response(session_id, user_message, 'OPTIMIZATION')
+        return get_llm_response(session, user_message, 'OPTIMIZATION', streamer)
 
     else:
         return get_menu_message()
 
 
+def post_no_session_error(apigw_client, connection_id):
+    error_response = {
+        'type': 'error',
+        'message': 'No active session. Please send {"action": "start"} first.'
+    }
+    post_json(apigw_client, connection_id, error_response)
+
+
+def process_turn(apigw_client, connection_id, session_id, turn_id, user_message, provided_user_data=None,
+                 raise_on_conflict=False):
+    """
+    Run one chat turn against its session and post the answer to the connection.
+    An answer whose session commit fails is not posted: the queue worker
+    (raise_on_conflict) re-raises so the turn is redelivered, a direct message
+    gets an error asking the user to resend.
+    """
+    print(f"Processing message for session {session_id}")
+
+    # One session read and one conditional write per turn
+    unit_of_work = SessionUnitOfWork(sessions_table, messages_table, session_id)
+    session = unit_of_work.load()
+
+    streamer = None
+    if STREAM_RESPONSES:
+        streamer = ResponseStreamer(
+            apigw_client,
+            connection_id,
+            turn_id,
+            is_cancelled=lambda: is_turn_superseded(connection_id, turn_id)
+        )
+
+    if session is None:
+        assistant_response = "Session not found. Please reconnect to start a new session."
+    else:
+        # Handle message based on flow
+        assistant_response = handle_message_flow(session, user_message, provided_user_data, streamer)
+
+        try:
+            unit_of_work.commit()
+        except SessionConflictError as e:
+            print(f"Session commit failed: {e}")
+            if raise_on_conflict:
+                raise
+            post_json(apigw_client, connection_id, {
+                'type': 'error',
+                'message': 'Your message could not be saved. Please send it again.',
+                'turn_id': turn_id
+            })
+            return None
+
+    if assistant_response is None:
+        # Stream was cancelled; the newer turn sends its own response
+        return None
+
+    # Final message always carries the full text, streamed or not
+    response_data = {
+        'type': 'response',
+        'message': assistant_response,
+        'turn_id': turn_id,
+        'streamed': bool(streamer and streamer.sequence),
+        'timestamp': datetime.now().isoformat()
+    }
+
+    if not post_json(apigw_client, connection_id, response_data):
+        print(f"Connection {connection_id} closed before the answer to {turn_id} was delivered")
+    return assistant_response
+
+
+def handle_turn_records(records):
+    """
+    Queue worker: process queued turns in order. Once a turn fails, the rest of
+    its session's turns in the batch are reported as failures too so SQS
+    redelivers them in their original order.
+    """
+    failures = []
+    failed_sessions = set()
+
+    for record in records:
+        turn = json.loads(record['body'])
+        session_id = turn['sessionId']
+
+        if session_id in failed_sessions:
+            failures.append({'itemIdentifier': record['messageId']})
+            continue
+
+        try:
+            # The turn becomes the connection's active turn only when it starts, so a
+            # cancel stops the answer being generated, not the ones still queued
+            if begin_turn(turn['connectionId'], turn['turnId']) != session_id:
+                print(f"Dropping {turn['turnId']}: connection {turn['connectionId']} is gone or moved to another session")
+                continue
+
+            apigw_client = get_apigw_client(turn)
+            process_turn(
+                apigw_client,
+                turn['connectionId'],
+                session_id,
+                turn['turnId'],
+                turn.get('message'),
+                turn.get('user_data'),
+                raise_on_conflict=True
+            )
+        except Exception as e:
+            print(f"Error processing queued turn {turn.get('turnId')}: {e}")
+            import traceback
+            traceback.print_exc()
+            failed_sessions.add(session_id)
+            failures.append({'itemIdentifier': record['messageId']})
+
+    return {'batchItemFailures': failures}
+
+
 def lambda_handler(event, context):
-    """Main Lambda handler for WebSocket events"""
+    """Main Lambda handler for WebSocket events and queued turns"""
+
+    if event.get('action') == 'precompute':
+        # Direct invocation after a deploy: render fixed prompts ahead of the first user
+        return {'statusCode': 200, 'body': json.dumps(precompute_fixed_prompts(), indent=2)}
+
+    if event.get('action') == 'reap':
+        # Scheduled cleanup of whatever TTL has not removed yet
+        return {'statusCode': 200, 'body': json.dumps(reap_orphans(connections_table, sessions_table, messages_table))}
+
+    if 'Records' in event:
+        print(f"Processing {len(event['Records'])} queued turns")
+        return handle_turn_records(event['Records'])
 
     print(f"Event: {json.dumps(event)}")
 
@@ -498,20 +984,16 @@ def lambda_handler(event, context):
             # Connection established - don't create session yet, wait for 'start' action
             connections_table.put_item(Item={
                 'connectionId': connection_id,
-                'timestamp': datetime.now().isoformat()
+                'timestamp': datetime.now().isoformat(),
+                TTL_ATTRIBUTE: expires_at(CONNECTION_TTL_SECONDS)
             })
             print(f"Connection stored: {connection_id}")
             return {'statusCode': 200}
 
         elif route_key == '$disconnect':
-            # Clean up connection and associated session
-            session_id = get_session_id_for_connection(connection_id)
-
-            if session_id:
-                delete_session(session_id)
-
-            connections_table.delete_item(Key={'connectionId': connection_id})
-            print(f"Connection and session cleaned up: {connection_id}")
+            # One read for the session ID, one transaction for both deletes; turn items expire via TTL
+            session_id = disconnect(connections_table, sessions_table, connection_id)
+            print(f"Connection and session cleaned up: {connection_id} ({session_id})")
             return {'statusCode': 200}
 
         elif route_key in ['$default', 'message']:
@@ -533,46 +1015,51 @@ def lambda_handler(event, context):
                     'message': get_menu_message()
                 }
 
-                apigw_client.post_to_connection(
-                    ConnectionId=connection_id,
-                    Data=json.dumps(response_data).encode('utf-8')
-                )
+                post_json(apigw_client, connection_id, response_data)
 
                 print(f"Session started: {session_id}")
 
-            elif action == 'message':
-                # Get session ID from connection
-                session_id = get_session_id_for_connection(connection_id)
-
-                if not session_id:
-                    error_response = {
-                        'type': 'error',
-                        'message': 'No active session. Please send {"action": "start"} first.'
-                    }
-                    apigw_client.post_to_connection(
-                        ConnectionId=connection_id,
-                        Data=json.dumps(error_response).encode('utf-8')
-                    )
-                    return {'statusCode': 400}
+            elif action == 'cancel':
+                # Superseding the active turn stops any in-flight stream
+                begin_turn(connection_id, f"cancelled_{datetime.now().timestamp()}")
+                post_json(apigw_client, connection_id, {'type': 'cancel_requested'})
 
+            elif action == 'message':
                 user_message = body.get('message')
                 provided_user_data = body.get('user_data')
+                turn_id = f"turn_{datetime.now().timestamp()}"
+
+                if turn_queue is not None:
+                    # Queued mode: acknowledge now, the worker answers in session order
+                    session_id = get_session_id_for_connection(connection_id)
+                    if not session_id:
+                        post_no_session_error(apigw_client, connection_id)
+                        return {'statusCode': 400}
+
+                    turn_queue.enqueue({
+                        'connectionId': connection_id,
+                        'sessionId': session_id,
+                        'turnId': turn_id,
+                        'message': user_message,
+                        'user_data': provided_user_data,
+                        'requestContext': {
+                            'domainName': event['requestContext']['domainName'],
+                            'stage': event['requestContext']['stage']
+                        },
+                        'enqueued_at': datetime.now().isoformat()
+                    })
+                    post_json(apigw_client, connection_id, {'type': 'queued', 'turn_id': turn_id})
+                    print(f"Queued {turn_id} for session {session_id}")
+                    return {'statusCode': 200}
 
-                print(f"Processing message for session {session_id}")
-
-                # Handle message based on flow
-                assistant_response = handle_message_flow(session_id, user_message, provided_user_data)
+                # Claim the connection's active turn and get its session ID in one call
+                session_id = begin_turn(connection_id, turn_id)
 
-                response_data = {
-                    'type': 'response',
-                    'message': assistant_response,
-                    'timestamp': datetime.now().isoformat()
-                }
+                if not session_id:
+                    post_no_session_error(apigw_client, connection_id)
+                    return {'statusCode': 400}
 
-                apigw_client.post_to_connection(
-                    ConnectionId=connection_id,
-                    Data=json.dumps(response_data).encode('utf-8')
-                )
+                process_turn(apigw_client, connection_id, session_id, turn_id, user_message, provided_user_data)
 
             return {'statusCode': 200}
 
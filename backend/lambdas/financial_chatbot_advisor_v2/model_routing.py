@@ -0,0 +1,200 @@
+"""
+Intent-based model routing for chatbot turns.
+
+Each turn is classified as an FAQ, a profile lookup or an optimization plan,
+and the route decides the model, max_tokens, temperature and timeout. A yes/no
+FAQ no longer gets the same 3000-token budget as a 10-year plan, and short,
+single-fact questions on any route get that route's brief token budget.
+
+Every setting can be overridden per route from the environment, e.g.
+LLM_ROUTE_FAQ_MODEL, LLM_ROUTE_FAQ_MAX_TOKENS, LLM_ROUTE_FAQ_BRIEF_MAX_TOKENS,
+LLM_ROUTE_FAQ_TEMPERATURE and LLM_ROUTE_FAQ_TIMEOUT. Latency, tokens and
+estimated cost are logged per route as CloudWatch embedded metrics.
+"""
+
+import json
+import os
+import re
+import time
+
+DEFAULT_LLM_MODEL = "Anthropic Claude-V3.5 Sonnet Vertex AI (Internal)"
+LLM_MODEL = os.environ.get('LLM_MODEL', DEFAULT_LLM_MODEL)
+
+ROUTES = ('faq', 'profile', 'optimization')
+
+ROUTE_DEFAULTS = {
+    'faq': {'max_tokens': 1000, 'brief_max_tokens': 400, 'temperature': 0.3, 'timeout': 30},
+    'profile': {'max_tokens': 1200, 'brief_max_tokens': 500, 'temperature': 0.3, 'timeout': 30},
+    'optimization': {'max_tokens': 3000, 'brief_max_tokens': 1200, 'temperature': 0.7, 'timeout': 60}
+}
+
+CONTEXT_ROUTES = {'FAQ': 'faq', 'PROFILE': 'profile', 'OPTIMIZATION': 'optimization'}
+
+# USD per 1K tokens, overridable with LLM_PRICING='{"<model>": {"input": 0.003, "output": 0.015}}'
+DEFAULT_PRICING = {DEFAULT_LLM_MODEL: {'input': 0.003, 'output': 0.015}}
+
+METRICS_NAMESPACE = os.environ.get('CHATBOT_METRICS_NAMESPACE', 'ASULoanChatbot')
+
+BRIEF_MAX_WORDS = int(os.environ.get('LLM_BRIEF_MAX_WORDS', '12'))
+BRIEF_OPENERS = {
+    'is', 'are', 'am', 'can', 'could', 'do', 'does', 'did', 'will', 'would', 'should',
+    'has', 'have', 'was', 'were', 'when', 'who', 'which', 'where'
+}
+FACT_OPENERS = ('what is', 'whats', 'what s', 'how much', 'how many', 'how long')
+
+OPTIMIZATION_CUES = re.compile(
+    r'\b(plan|strateg\w*|optimi[sz]\w*|maximi[sz]\w*|month[- ]by[- ]month|budget\w*|'
+    r'scenario\w*|compare|comparison|what if|should i|prioriti[sz]\w*|allocate|invest\w*|'
+    r'pay (it )?off (early|faster|sooner)|refinanc\w*)\b'
+)
+PROFILE_CUES = re.compile(
+    r'\b(my|mine)\b.*\b(balance|match|loan|emi|payment|salary|status|approv\w*|'
+    r'recommendation|rate|tenure|debt)\b|\bam i (approved|eligible)\b'
+)
+
+
+def _env(route, name, default, cast):
+    value = os.environ.get(f"LLM_ROUTE_{route.upper()}_{name.upper()}")
+    if value is None:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        print(f"Invalid LLM_ROUTE_{route.upper()}_{name.upper()}={value!r}, using {default}")
+        return default
+
+
+def load_route_config(route):
+    defaults = ROUTE_DEFAULTS[route]
+    return {
+        'route': route,
+        'model': os.environ.get(f"LLM_ROUTE_{route.upper()}_MODEL", LLM_MODEL),
+        'max_tokens': _env(route, 'max_tokens', defaults['max_tokens'], int),
+        'brief_max_tokens': _env(route, 'brief_max_tokens', defaults['brief_max_tokens'], int),
+        'temperature': _env(route, 'temperature', defaults['temperature'], float),
+        'timeout': _env(route, 'timeout', defaults['timeout'], int)
+    }
+
+
+ROUTE_CONFIG = {route: load_route_config(route) for route in ROUTES}
+
+
+def _load_pricing():
+    pricing = dict(DEFAULT_PRICING)
+    if os.environ.get('LLM_PRICING'):
+        try:
+            pricing.update(json.loads(os.environ['LLM_PRICING']))
+        except ValueError as e:
+            print(f"Invalid LLM_PRICING, using defaults: {e}")
+    return pricing
+
+
+LLM_PRICING = _load_pricing()
+
+
+def is_brief_question(message):
+    """Short yes/no or single-fact questions"""
+    words = re.sub(r"[^a-z0-9\s]", ' ', (message or '').lower().replace("'", '')).split()
+    if not words or len(words) > BRIEF_MAX_WORDS:
+        return False
+    if OPTIMIZATION_CUES.search(' '.join(words)):
+        return False
+    return words[0] in BRIEF_OPENERS or ' '.join(words[:2]).startswith(FACT_OPENERS)
+
+
+def classify_turn(context, message):
+    """
+    Route for a turn. The conversation context is the prior: an FAQ chat has no
+    profile data, so it stays on the FAQ route. Profile chats escalate to the
+    optimization route when the user asks for a plan, and optimization chats
+    drop to the profile route for quick lookups of their own numbers.
+    """
+    route = CONTEXT_ROUTES.get(context, 'faq')
+    text = (message or '').lower()
+
+    if route == 'profile' and OPTIMIZATION_CUES.search(text):
+        route = 'optimization'
+    elif route == 'optimization' and PROFILE_CUES.search(text) and not OPTIMIZATION_CUES.search(text):
+        route = 'profile'
+
+    return route, is_brief_question(message)
+
+
+def route_settings(route, brief=False):
+    """Model and completion parameters for a route"""
+    config = ROUTE_CONFIG[route]
+    return {
+        'model': config['model'],
+        'temperature': config['temperature'],
+        'max_tokens': config['brief_max_tokens'] if brief else config['max_tokens'],
+        'timeout': config['timeout']
+    }
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    pricing = LLM_PRICING.get(model)
+    if not pricing:
+        return None
+    return (prompt_tokens * pricing['input'] + completion_tokens * pricing['output']) / 1000
+
+
+class RouteMetrics:
+    """Per-route latency, token and cost totals for this container"""
+
+    def __init__(self):
+        self.totals = {}
+
+    def record(self, route, model, latency_ms, prompt_tokens, completion_tokens, source='llm', brief=False):
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        totals = self.totals.setdefault(route, {
+            'turns': 0, 'latencyMs': 0.0, 'maxLatencyMs': 0.0,
+            'promptTokens': 0, 'completionTokens': 0, 'costUSD': 0.0
+        })
+        totals['turns'] += 1
+        totals['latencyMs'] += latency_ms
+        totals['maxLatencyMs'] = max(totals['maxLatencyMs'], latency_ms)
+        totals['promptTokens'] += prompt_tokens
+        totals['completionTokens'] += completion_tokens
+        totals['costUSD'] += cost or 0.0
+
+        metrics = [
+            {'Name': 'LatencyMs', 'Unit': 'Milliseconds'},
+            {'Name': 'PromptTokens', 'Unit': 'Count'},
+            {'Name': 'CompletionTokens', 'Unit': 'Count'}
+        ]
+        if cost is not None:
+            metrics.append({'Name': 'EstimatedCostUSD', 'Unit': 'None'})
+
+        # CloudWatch embedded metric format: graphable per Route without extra API calls
+        record = {
+            '_aws': {
+                'Timestamp': int(time.time() * 1000),
+                'CloudWatchMetrics': [{
+                    'Namespace': METRICS_NAMESPACE,
+                    'Dimensions': [['Route'], ['Route', 'Source']],
+                    'Metrics': metrics
+                }]
+            },
+            'Route': route,
+            'Source': source,
+            'Model': model,
+            'Brief': brief,
+            'LatencyMs': round(latency_ms, 1),
+            'PromptTokens': prompt_tokens,
+            'CompletionTokens': completion_tokens,
+            'RouteAverageLatencyMs': round(totals['latencyMs'] / totals['turns'], 1),
+            'RouteTurns': totals['turns']
+        }
+        if cost is not None:
+            record['EstimatedCostUSD'] = round(cost, 6)
+        print(json.dumps(record))
+
+    def stats(self):
+        return {
+            route: {
+                **totals,
+                'averageLatencyMs': round(totals['latencyMs'] / totals['turns'], 1),
+                'costUSD': round(totals['costUSD'], 6)
+            }
+            for route, totals in self.totals.items()
+        }
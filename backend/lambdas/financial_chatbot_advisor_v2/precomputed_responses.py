@@ -0,0 +1,91 @@
+"""
+Precomputed answers for fixed chatbot prompts.
+
+Some turns always send the same prompt (e.g. the FAQ overview behind menu
+option 3). Their answers are rendered once per content version, stored in
+DynamoDB and memoized in the container, so every other user gets the stored
+text instantly.
+
+The content version is a hash of everything that shapes the answer: the
+system prompt (including any retrieved program document passages), the fixed
+prompt, the model and its settings, plus the optional
+PRECOMPUTED_CONTENT_VERSION label. Editing any of them changes the version, so
+stale answers are simply never read again and the next request re-renders.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+
+PRECOMPUTED_CONTENT_VERSION = os.environ.get('PRECOMPUTED_CONTENT_VERSION', '1')
+
+FIXED_PROMPTS = {
+    'faq_overview': {
+        'context': 'FAQ',
+        'prompt': "Provide a brief overview of ASU's Student Loan Repayment Match Program and SECURE 2.0, then ask what specific information the user wants to know."
+    }
+}
+
+
+def content_version(system_prompt, prompt, model, settings=None):
+    """Stable short hash of the inputs that determine a fixed prompt's answer"""
+    material = json.dumps({
+        'label': PRECOMPUTED_CONTENT_VERSION,
+        'system': system_prompt,
+        'prompt': prompt,
+        'model': model,
+        'settings': settings or {}
+    }, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+
+class PrecomputedResponseStore:
+    """One item per fixed prompt holding the answer for its current content version"""
+
+    def __init__(self, table):
+        self.table = table
+        self.memo = {}
+
+    def get(self, prompt_id, version):
+        key = (prompt_id, version)
+        if key in self.memo:
+            return self.memo[key]
+
+        try:
+            item = self.table.get_item(Key={'promptId': prompt_id}).get('Item')
+        except Exception as e:
+            print(f"Error reading precomputed response {prompt_id}: {e}")
+            return None
+
+        if item and item.get('version') == version:
+            self.memo[key] = item['response']
+            return item['response']
+        return None
+
+    def put(self, prompt_id, version, response, model=None):
+        self.table.put_item(Item={
+            'promptId': prompt_id,
+            'version': version,
+            'response': response,
+            'model': model,
+            'rendered_at': datetime.now().isoformat()
+        })
+        self.memo = {k: v for k, v in self.memo.items() if k[0] != prompt_id}
+        self.memo[(prompt_id, version)] = response
+
+    def get_or_render(self, prompt_id, version, render, model=None):
+        """Stored answer for this version, rendering and storing it on a miss"""
+        response = self.get(prompt_id, version)
+        if response is not None:
+            print(f"Precomputed response hit: {prompt_id} ({version})")
+            return response
+
+        print(f"Rendering precomputed response: {prompt_id} ({version})")
+        response = render()
+        if response:
+            try:
+                self.put(prompt_id, version, response, model)
+            except Exception as e:
+                print(f"Error storing precomputed response {prompt_id}: {e}")
+        return response
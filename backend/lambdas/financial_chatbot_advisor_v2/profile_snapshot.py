@@ -0,0 +1,186 @@
+"""
+Compact, versioned profile snapshot for PROFILE-mode chats.
+
+The useful parts of an asu-user-profiles item (loan, salary, latest match
+recommendation, approval status) are read with a projection and rendered once
+into a short prompt-ready block that is kept on the session. Later turns reuse
+it and only re-read the profile when its updatedAt changes, which is checked
+with a one-attribute read at most every PROFILE_SNAPSHOT_CHECK_SECONDS.
+"""
+
+import os
+import time
+from datetime import datetime
+
+from input_parsing import format_money
+
+PROFILE_SNAPSHOT_CHECK_SECONDS = int(os.environ.get('PROFILE_SNAPSHOT_CHECK_SECONDS', '60'))
+
+# Only what the snapshot needs: no recommendation history, documents or credentials
+PROFILE_PROJECTION = (
+    'asuId, firstName, lastName, salary, salaryCurrency, debtAmount, debtCurrency, '
+    'interestRate, repaymentPeriod, loanApplication, monthly_emi, remaining_balance, '
+    'repayment_status, approvalStatus, updatedAt, updated_at, created_at, '
+    'latestRecommendation.recommendation, latestRecommendation.#ts, latestRecommendation.#st, '
+    'latestRecommendation.financialProjections.debtToIncomeImpact, '
+    'latestRecommendation.metadata.convertedLoanAmountUSD'
+)
+PROFILE_PROJECTION_NAMES = {'#ts': 'timestamp', '#st': 'status'}
+
+VERSION_PROJECTION = 'updatedAt, updated_at, created_at'
+
+
+def profile_version(profile):
+    """updatedAt is set by calculate_match; chatbot-created profiles only have updated_at/created_at"""
+    return profile.get('updatedAt') or profile.get('updated_at') or profile.get('created_at') or ''
+
+
+def fetch_profile(table, asu_id):
+    response = table.get_item(
+        Key={'asuId': asu_id},
+        ProjectionExpression=PROFILE_PROJECTION,
+        ExpressionAttributeNames=PROFILE_PROJECTION_NAMES
+    )
+    return response.get('Item')
+
+
+def fetch_profile_version(table, asu_id):
+    response = table.get_item(Key={'asuId': asu_id}, ProjectionExpression=VERSION_PROJECTION)
+    item = response.get('Item')
+    return profile_version(item) if item else None
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _money(value, currency='USD'):
+    amount = _number(value)
+    return format_money(amount, currency) if amount is not None else None
+
+
+def render_profile_block(profile):
+    """Short prompt-ready summary of the profile"""
+    lines = []
+
+    name = ' '.join(filter(None, [profile.get('firstName'), profile.get('lastName')]))
+    if name:
+        lines.append(f"- Name: {name}")
+
+    loan = profile.get('loanApplication') or {}
+    loan_currency = loan.get('currency') or profile.get('debtCurrency') or 'USD'
+    loan_amount = _money(loan.get('loanAmount', profile.get('debtAmount')), loan_currency)
+    rate = _number(loan.get('interestRate', profile.get('interestRate')))
+    tenure = _number(loan.get('loanTenure', profile.get('repaymentPeriod')))
+    if loan_amount:
+        details = [loan_amount]
+        if rate is not None:
+            details.append(f"at {rate:g}%")
+        if tenure:
+            details.append(f"over {tenure:g} years")
+        lines.append(f"- Student loan: {' '.join(details)}")
+
+    recommendation_record = profile.get('latestRecommendation') or {}
+    converted = _money((recommendation_record.get('metadata') or {}).get('convertedLoanAmountUSD'))
+    if converted and loan_currency != 'USD':
+        lines.append(f"- Loan amount in USD: {converted}")
+
+    emi = _money(profile.get('monthly_emi'))
+    if emi:
+        lines.append(f"- Monthly loan payment: {emi}")
+    remaining = _money(profile.get('remaining_balance'))
+    if remaining:
+        lines.append(f"- Remaining balance: {remaining}")
+    if profile.get('repayment_status'):
+        lines.append(f"- Repayment status: {profile['repayment_status']}")
+
+    salary = _money(profile.get('salary'), profile.get('salaryCurrency') or 'USD')
+    if salary:
+        lines.append(f"- Salary on file: {salary}")
+
+    recommendation = recommendation_record.get('recommendation') or {}
+    if recommendation:
+        parts = []
+        if recommendation.get('recommendedMatchPercentage') is not None:
+            parts.append(f"{_number(recommendation['recommendedMatchPercentage']):g}% match")
+        monthly = _money(recommendation.get('recommendedMonthlyMatchAmount'))
+        annual = _money(recommendation.get('recommendedAnnualMatchAmount'))
+        if monthly:
+            parts.append(f"{monthly}/month")
+        if annual:
+            parts.append(f"{annual}/year")
+        if recommendation.get('capApplied'):
+            parts.append(f"cap applied: {recommendation['capApplied']}")
+        if recommendation.get('riskAssessment'):
+            parts.append(f"risk: {recommendation['riskAssessment']}")
+        status = recommendation_record.get('status')
+        when = (recommendation_record.get('timestamp') or '')[:10]
+        label = ', '.join(filter(None, [status, when]))
+        lines.append(f"- Latest match recommendation{f' ({label})' if label else ''}: {', '.join(parts)}")
+
+    dti = (recommendation_record.get('financialProjections') or {}).get('debtToIncomeImpact') or {}
+    if dti.get('beforeMatch') is not None and dti.get('afterMatch') is not None:
+        lines.append(f"- Debt-to-income: {_number(dti['beforeMatch']):g}% before match, {_number(dti['afterMatch']):g}% after")
+
+    if profile.get('approvalStatus'):
+        lines.append(f"- Match approval status: {profile['approvalStatus']}")
+
+    return '\n'.join(lines)
+
+
+def profile_fields(profile):
+    """The chat's user_data fields, as stored on the profile"""
+    return {
+        'debt_amount': profile.get('debtAmount', 'N/A'),
+        'debt_currency': profile.get('debtCurrency') or (profile.get('loanApplication') or {}).get('currency') or 'USD',
+        'salary': profile.get('salary', 'N/A'),
+        'salary_currency': profile.get('salaryCurrency', 'USD'),
+        'repayment_period': profile.get('repaymentPeriod', 'N/A'),
+        'interest_rate': profile.get('interestRate', 'N/A')
+    }
+
+
+def build_snapshot(profile):
+    return {
+        'asuId': profile['asuId'],
+        'version': profile_version(profile),
+        'block': render_profile_block(profile),
+        'fields': profile_fields(profile),
+        'checked_at': int(time.time()),
+        'built_at': datetime.now().isoformat()
+    }
+
+
+def get_profile_snapshot(table, session, asu_id, force_check=False):
+    """
+    Session's snapshot for asu_id, refreshed only when the profile's version
+    changed. Returns None when no profile exists.
+    """
+    snapshot = session.get('profile_snapshot')
+    now = int(time.time())
+
+    if snapshot and snapshot.get('asuId') == asu_id:
+        if not force_check and now - int(snapshot.get('checked_at', 0)) < PROFILE_SNAPSHOT_CHECK_SECONDS:
+            return snapshot
+
+        try:
+            version = fetch_profile_version(table, asu_id)
+        except Exception as e:
+            print(f"Error checking profile version, keeping snapshot: {e}")
+            return snapshot
+
+        if version is not None and version == snapshot.get('version'):
+            snapshot['checked_at'] = now
+            return snapshot
+        print(f"Profile {asu_id} changed ({snapshot.get('version')} -> {version}), rebuilding snapshot")
+
+    profile = fetch_profile(table, asu_id)
+    if not profile:
+        session.pop('profile_snapshot', None)
+        return None
+
+    session['profile_snapshot'] = build_snapshot(profile)
+    return session['profile_snapshot']
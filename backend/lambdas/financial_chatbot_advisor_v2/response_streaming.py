@@ -0,0 +1,181 @@
+"""
+Streams LLM deltas to the WebSocket client in coalesced chunks.
+
+Tokens are buffered and flushed to post_to_connection when enough text has
+accumulated or a short interval has passed (the first token is flushed
+immediately). Between flushes the streamer polls a cancellation check so a
+newer message on the same connection can stop an in-flight completion. The
+completion also stops when the client's connection is gone.
+
+iter_sse_events() separates content deltas from tool call deltas, so a
+completion that may call tools can forward its text as it arrives while the
+tool calls are assembled with merge_tool_call_deltas().
+"""
+
+import json
+import os
+import time
+
+from websocket_client import post_json, post_many
+
+STREAM_MIN_CHUNK_CHARS = int(os.environ.get('STREAM_MIN_CHUNK_CHARS', '80'))
+STREAM_FLUSH_INTERVAL_SECONDS = float(os.environ.get('STREAM_FLUSH_INTERVAL_SECONDS', '0.3'))
+STREAM_CANCEL_CHECK_SECONDS = float(os.environ.get('STREAM_CANCEL_CHECK_SECONDS', '1.0'))
+
+
+class StreamCancelled(Exception):
+    """Raised inside the stream loop when the turn was superseded, cancelled or its client left"""
+    pass
+
+
+def iter_sse_events(response):
+    """
+    Yield ('content', text) and ('tool_calls', [tool call deltas]) from an
+    OpenAI-compatible server-sent events response
+    """
+    for line in response.iter_lines():
+        if not line:
+            continue
+        line = line.decode('utf-8') if isinstance(line, bytes) else line
+        if not line.startswith('data: '):
+            continue
+
+        data_str = line[6:].strip()
+        if data_str == '[DONE]':
+            break
+
+        try:
+            chunk = json.loads(data_str)
+        except json.JSONDecodeError:
+            continue
+
+        choices = chunk.get('choices') or []
+        if choices:
+            delta = choices[0].get('delta') or {}
+            if delta.get('content'):
+                yield 'content', delta['content']
+            if delta.get('tool_calls'):
+                yield 'tool_calls', delta['tool_calls']
+
+
+def iter_sse_deltas(response):
+    """Yield content deltas from an OpenAI-compatible server-sent events response"""
+    for kind, value in iter_sse_events(response):
+        if kind == 'content':
+            yield value
+
+
+def merge_tool_call_deltas(calls, deltas):
+    """Assemble streamed tool calls in calls ({index: call}): IDs and names once, arguments in pieces"""
+    for delta in deltas:
+        call = calls.setdefault(delta.get('index', len(calls)), {
+            'id': None, 'type': 'function', 'function': {'name': '', 'arguments': ''}
+        })
+        if delta.get('id'):
+            call['id'] = delta['id']
+        function = delta.get('function') or {}
+        if function.get('name'):
+            call['function']['name'] += function['name']
+        if function.get('arguments'):
+            call['function']['arguments'] += function['arguments']
+
+
+class ResponseStreamer:
+    """Posts coalesced stream chunks for one turn to one WebSocket connection"""
+
+    def __init__(self, apigw_client, connection_id, turn_id, is_cancelled=None):
+        self.apigw_client = apigw_client
+        self.connection_id = connection_id
+        self.turn_id = turn_id
+        self.is_cancelled = is_cancelled
+        self.buffer = []
+        self.buffered_chars = 0
+        self.sequence = 0
+        self.started_at = None
+        self.first_chunk_at = None
+        self.last_flush_at = 0.0
+        self.last_cancel_check_at = 0.0
+        self.cancelled = False
+        self.gone = False
+
+    def _post(self, payload):
+        if self.gone:
+            return
+        payload['turn_id'] = self.turn_id
+        try:
+            if not post_json(self.apigw_client, self.connection_id, payload):
+                # Client disconnected: stop generating an answer nobody will read
+                self.gone = True
+        except Exception as e:
+            print(f"Error posting stream chunk: {e}")
+
+    def _post_batch(self, payloads):
+        """Post several messages in order in one post_many call"""
+        if self.gone:
+            return
+        result = post_many(self.apigw_client, [
+            (self.connection_id, {**payload, 'turn_id': self.turn_id}) for payload in payloads
+        ])
+        if result['gone']:
+            self.gone = True
+        elif result['failed']:
+            print(f"Error posting stream messages to {self.connection_id}")
+
+    def start(self):
+        # A tool-calling turn can reach the narration with the stream already started
+        if self.started_at is not None:
+            return
+        self.started_at = time.time()
+        self._post({'type': 'stream_start'})
+
+    def push(self, delta):
+        """Buffer a delta and flush when the chunk is big or old enough"""
+        self.buffer.append(delta)
+        self.buffered_chars += len(delta)
+
+        now = time.time()
+        if (self.sequence == 0
+                or self.buffered_chars >= STREAM_MIN_CHUNK_CHARS
+                or now - self.last_flush_at >= STREAM_FLUSH_INTERVAL_SECONDS):
+            self.flush()
+
+        if self.gone:
+            self.cancelled = True
+            raise StreamCancelled(self.turn_id)
+
+        if self.is_cancelled and now - self.last_cancel_check_at >= STREAM_CANCEL_CHECK_SECONDS:
+            self.last_cancel_check_at = now
+            if self.is_cancelled():
+                self.cancelled = True
+                raise StreamCancelled(self.turn_id)
+
+    def _take_chunk(self):
+        """The buffered text as the next stream_chunk message, or None when empty"""
+        if not self.buffer:
+            return None
+        if self.first_chunk_at is None:
+            self.first_chunk_at = time.time()
+            print(f"Time to first chunk: {self.first_chunk_at - self.started_at:.3f}s")
+
+        chunk = {'type': 'stream_chunk', 'seq': self.sequence, 'delta': ''.join(self.buffer)}
+        self.sequence += 1
+        self.buffer = []
+        self.buffered_chars = 0
+        self.last_flush_at = time.time()
+        return chunk
+
+    def flush(self):
+        chunk = self._take_chunk()
+        if chunk is not None:
+            self._post(chunk)
+
+    def cancel(self):
+        self.buffer = []
+        self.cancelled = True
+        self._post({'type': 'stream_cancelled'})
+
+    def finish(self):
+        # The last chunk and stream_end go out as one ordered batch
+        chunk = self._take_chunk()
+        end = {'type': 'stream_end', 'chunks': self.sequence}
+        self._post_batch([chunk, end] if chunk is not None else [end])
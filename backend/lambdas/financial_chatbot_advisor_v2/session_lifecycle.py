@@ -0,0 +1,132 @@
+"""
+Expiry and cleanup for chatbot connections, sessions and turns.
+
+Every connection, session header and turn item carries an expiresAt epoch
+timestamp, which DynamoDB TTL uses to delete it. This is a backstop, so a
+missed $disconnect no longer leaves rows behind for good. $disconnect reads
+the connection's sessionId, then deletes the connection and the session
+header in one transaction. The session's turn items expire through TTL.
+
+TTL deletion can lag by a day or more, so reap_orphans() is run on a schedule
+to remove what TTL has not removed yet:
+- connections older than the API Gateway limit
+- sessions whose connection is gone
+- turns whose session is gone
+"""
+
+import os
+import time
+from datetime import datetime
+
+from boto3.dynamodb.types import TypeSerializer
+
+_serializer = TypeSerializer()
+
+TTL_ATTRIBUTE = 'expiresAt'
+
+# API Gateway closes WebSocket connections after 2 hours at most
+CONNECTION_TTL_SECONDS = int(os.environ.get('CONNECTION_TTL_SECONDS', str(3 * 3600)))
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', str(24 * 3600)))
+# Items younger than this are never reaped (a session is written just before its connection link)
+REAPER_GRACE_SECONDS = int(os.environ.get('REAPER_GRACE_SECONDS', '900'))
+
+
+def expires_at(ttl_seconds, now=None):
+    """Epoch seconds for a TTL attribute"""
+    return int(now if now is not None else time.time()) + ttl_seconds
+
+
+def disconnect(connections_table, sessions_table, connection_id):
+    """Remove a connection and its session. Returns the deleted session ID, if any."""
+    key = {'connectionId': connection_id}
+    item = connections_table.get_item(Key=key, ProjectionExpression='sessionId', ConsistentRead=True).get('Item')
+    session_id = (item or {}).get('sessionId')
+    if not session_id:
+        if item is not None:
+            connections_table.delete_item(Key=key)
+        return None
+
+    connections_table.meta.client.transact_write_items(TransactItems=[
+        {'Delete': {'TableName': connections_table.name,
+                    'Key': {'connectionId': _serializer.serialize(connection_id)}}},
+        {'Delete': {'TableName': sessions_table.name,
+                    'Key': {'sessionId': _serializer.serialize(session_id)}}}
+    ])
+    return session_id
+
+
+def _scan(table, projection, names=None):
+    kwargs = {'ProjectionExpression': projection}
+    if names:
+        kwargs['ExpressionAttributeNames'] = names
+    while True:
+        response = table.scan(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            break
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def _age_seconds(item, now, *fields):
+    """Age from the first ISO timestamp present on the item; None if there is none"""
+    for field in fields:
+        value = item.get(field)
+        if value:
+            try:
+                return (now - datetime.fromisoformat(value)).total_seconds()
+            except ValueError:
+                continue
+    return None
+
+
+def _is_expired(item, now_epoch):
+    return TTL_ATTRIBUTE in item and int(item[TTL_ATTRIBUTE]) <= now_epoch
+
+
+def _delete_all(table, keys):
+    with table.batch_writer() as batch:
+        for key in keys:
+            batch.delete_item(Key=key)
+    return len(keys)
+
+
+def reap_orphans(connections_table, sessions_table, messages_table):
+    """Delete stale connections, orphaned sessions and orphaned turns. Returns counts."""
+    now = datetime.now()
+    now_epoch = int(time.time())
+
+    live_sessions = set()
+    stale_connections = []
+    for item in _scan(connections_table, 'connectionId, sessionId, #ts, expiresAt', {'#ts': 'timestamp'}):
+        age = _age_seconds(item, now, 'timestamp')
+        if _is_expired(item, now_epoch) or (age is not None and age > CONNECTION_TTL_SECONDS):
+            stale_connections.append({'connectionId': item['connectionId']})
+        elif item.get('sessionId'):
+            live_sessions.add(item['sessionId'])
+
+    kept_sessions = set()
+    orphan_sessions = []
+    for item in _scan(sessions_table, 'sessionId, created_at, updated_at, expiresAt'):
+        session_id = item['sessionId']
+        age = _age_seconds(item, now, 'updated_at', 'created_at')
+        young = age is not None and age < REAPER_GRACE_SECONDS
+        if session_id in live_sessions or (young and not _is_expired(item, now_epoch)):
+            kept_sessions.add(session_id)
+        else:
+            orphan_sessions.append({'sessionId': session_id})
+
+    orphan_turns = []
+    for item in _scan(messages_table, 'sessionId, seq, created_at'):
+        if item['sessionId'] in kept_sessions:
+            continue
+        age = _age_seconds(item, now, 'created_at')
+        if age is None or age >= REAPER_GRACE_SECONDS:
+            orphan_turns.append({'sessionId': item['sessionId'], 'seq': item['seq']})
+
+    counts = {
+        'connections': _delete_all(connections_table, stale_connections),
+        'sessions': _delete_all(sessions_table, orphan_sessions),
+        'turns': _delete_all(messages_table, orphan_turns)
+    }
+    print(f"Reaped {counts}")
+    return counts
@@ -0,0 +1,313 @@
+"""
+Per-invocation unit of work for chatbot sessions.
+
+A session is a small header item in the sessions table (state, user_data,
+rolling summary, version) plus one item per turn in the messages table, keyed
+by sessionId + seq. A turn loads the header once and queries only its most
+recent turns (newest first, limited, skipping turns already folded into the
+rolling summary). The message flow mutates the in-memory copy and commit()
+writes:
+
+- one small turn item with this turn's new messages, claimed with
+  attribute_not_exists so concurrent turns take different sequence numbers
+- the header, only when header fields changed, with a conditional put guarded
+  by a version attribute. On a version conflict the write is rebased onto the
+  newer header (our changed fields re-applied) instead of overwriting it.
+
+When a turn changes both, the two puts go in one TransactWriteItems, so a turn
+is never stored without the header (summary, offsets, flow state) it belongs to.
+Both carry an expiresAt TTL, pushed forward on every header write.
+"""
+
+import copy
+import os
+from datetime import datetime
+
+from boto3.dynamodb.types import TypeSerializer
+from botocore.exceptions import ClientError
+
+from session_lifecycle import SESSION_TTL_SECONDS, TTL_ATTRIBUTE, expires_at
+
+MAX_COMMIT_ATTEMPTS = 3
+RECENT_TURNS_LIMIT = int(os.environ.get('RECENT_TURNS_LIMIT', '13'))
+
+# Derived from the turn items on load, never stored on the header
+IN_MEMORY_FIELDS = ('history', 'history_offset')
+
+# Summary bookkeeping is never replayed onto a newer header; a compaction that
+# lost the race simply happens again on a later turn
+SUMMARY_FIELDS = ('history_summary', 'summarized_through_seq')
+
+
+class SessionConflictError(Exception):
+    """Raised when a session could not be committed after repeated conflicts"""
+    pass
+
+
+_serializer = TypeSerializer()
+
+
+def _is_conditional_failure(error):
+    return error.response['Error']['Code'] == 'ConditionalCheckFailedException'
+
+
+def _serialize(values):
+    return {k: _serializer.serialize(v) for k, v in values.items()}
+
+
+def _cancelled_by_condition(error):
+    """Which puts of a cancelled transaction failed their condition, in request order"""
+    reasons = error.response.get('CancellationReasons') or []
+    return [reason.get('Code') == 'ConditionalCheckFailed' for reason in reasons]
+
+
+def load_recent_turns(messages_table, session_id, after_seq=0, limit=RECENT_TURNS_LIMIT):
+    """Newest turns after after_seq, returned oldest first"""
+    response = messages_table.query(
+        KeyConditionExpression='sessionId = :sid AND seq > :after',
+        ExpressionAttributeValues={':sid': session_id, ':after': after_seq},
+        ScanIndexForward=False,
+        Limit=limit,
+        ConsistentRead=True
+    )
+    return list(reversed(response.get('Items', [])))
+
+
+class SessionUnitOfWork:
+    """Loads one session, tracks changes to it and commits them with minimal writes"""
+
+    def __init__(self, table, messages_table, session_id):
+        self.table = table
+        self.messages_table = messages_table
+        self.session_id = session_id
+        self.session = None
+        self._original = None
+        self._version = None
+        self._next_seq = 1
+        self._header_outdated = False
+
+    @classmethod
+    def create(cls, table, messages_table, session):
+        """Start a unit of work for a brand-new session (committed with attribute_not_exists)"""
+        uow = cls(table, messages_table, session['sessionId'])
+        session.setdefault('history', [])
+        session.setdefault('history_offset', 0)
+        uow.session = session
+        uow._original = {}
+        uow._version = None
+        return uow
+
+    def load(self):
+        """
+        Read the header and recent turns once. Returns the session, or None when
+        it does not exist. Read errors (throttling, permissions) are raised.
+        """
+        response = self.table.get_item(
+            Key={'sessionId': self.session_id},
+            ConsistentRead=True
+        )
+        item = response.get('Item')
+        if not item:
+            return None
+
+        summarized_through = int(item.get('summarized_through_seq', 0))
+        legacy_history = item.pop('history', None)
+        if legacy_history is not None:
+            # Session written before turns moved to their own items: the whole
+            # inline history is written out as one turn and dropped from the header
+            history = legacy_history
+            self._next_seq = summarized_through + 1
+            self._header_outdated = True
+        else:
+            turns = load_recent_turns(self.messages_table, self.session_id, summarized_through)
+            history = []
+            for turn in turns:
+                for message in turn.get('messages', []):
+                    history.append({**message, 'seq': int(turn['seq'])})
+            self._next_seq = (int(turns[-1]['seq']) if turns else summarized_through) + 1
+
+        item['history'] = history
+        item['history_offset'] = 0
+        self.session = item
+        self._original = copy.deepcopy(item)
+        if self._header_outdated:
+            self._original['history'] = []
+        self._version = int(item.get('version', 0))
+        return self.session
+
+    def _header(self, session):
+        return {k: v for k, v in session.items() if k not in IN_MEMORY_FIELDS}
+
+    def _changed_fields(self):
+        original_header = self._header(self._original)
+        return {
+            key: value for key, value in self._header(self.session).items()
+            if original_header.get(key) != value
+        }
+
+    def _new_history(self):
+        """Messages appended during this turn, located by absolute position (survives compaction)"""
+        original_end = int(self._original.get('history_offset', 0)) + len(self._original.get('history', []))
+        start = original_end - int(self.session.get('history_offset', 0))
+        return self.session.get('history', [])[max(start, 0):]
+
+    def is_dirty(self):
+        return bool(self._changed_fields() or self._new_history())
+
+    def _turn_item(self, messages):
+        return {
+            'sessionId': self.session_id,
+            'seq': self._next_seq,
+            'messages': [{'role': m['role'], 'content': m['content']} for m in messages],
+            'created_at': datetime.now().isoformat(),
+            TTL_ATTRIBUTE: expires_at(SESSION_TTL_SECONDS)
+        }
+
+    def _append_turn(self, messages):
+        """Write this turn's messages as one item, taking the next free sequence number"""
+        for attempt in range(1, MAX_COMMIT_ATTEMPTS + 1):
+            try:
+                self.messages_table.put_item(
+                    Item=self._turn_item(messages),
+                    ConditionExpression='attribute_not_exists(seq)'
+                )
+                self._next_seq += 1
+                return
+            except ClientError as e:
+                if not _is_conditional_failure(e):
+                    raise
+                print(f"Turn {self._next_seq} of {self.session_id} already written (attempt {attempt})")
+                self._next_seq += 1
+
+        raise SessionConflictError(f"Could not append turn to session {self.session_id}")
+
+    def _header_condition(self, header, expected_version):
+        """Stamp the header for writing and return its version condition"""
+        header['version'] = (expected_version or 0) + 1
+        header['updated_at'] = datetime.now().isoformat()
+        header[TTL_ATTRIBUTE] = expires_at(SESSION_TTL_SECONDS)
+
+        if expected_version is None:
+            return {'ConditionExpression': 'attribute_not_exists(sessionId)'}
+        if expected_version == 0:
+            # Sessions written before versioning have no version attribute
+            return {
+                'ConditionExpression': 'attribute_not_exists(version) OR version = :expected',
+                'ExpressionAttributeValues': {':expected': 0}
+            }
+        return {
+            'ConditionExpression': 'version = :expected',
+            'ExpressionAttributeValues': {':expected': expected_version}
+        }
+
+    def _put_header(self, header, expected_version):
+        self.table.put_item(Item=header, **self._header_condition(header, expected_version))
+        return header['version']
+
+    def _rebase(self, changed_fields):
+        """(latest header with our changes re-applied, its version), or None if the session is gone"""
+        latest = self.table.get_item(
+            Key={'sessionId': self.session_id},
+            ConsistentRead=True
+        ).get('Item')
+        if latest is None:
+            print(f"Session {self.session_id} was deleted during the turn, dropping changes")
+            return None
+
+        expected_version = int(latest.get('version', 0))
+        latest.pop('history', None)
+        latest.update({
+            k: copy.deepcopy(v) for k, v in changed_fields.items() if k not in SUMMARY_FIELDS
+        })
+        return latest, expected_version
+
+    def _commit_turn_and_header(self, messages, changed_fields):
+        """Append the turn and write the header atomically, rebasing on conflicts"""
+        header = self._header(self.session)
+        expected_version = self._version
+        client = self.table.meta.client
+
+        for attempt in range(1, MAX_COMMIT_ATTEMPTS + 1):
+            condition = self._header_condition(header, expected_version)
+            header_put = {
+                'TableName': self.table.name,
+                'Item': _serialize(header),
+                'ConditionExpression': condition['ConditionExpression']
+            }
+            if 'ExpressionAttributeValues' in condition:
+                header_put['ExpressionAttributeValues'] = _serialize(condition['ExpressionAttributeValues'])
+
+            try:
+                client.transact_write_items(TransactItems=[
+                    {'Put': {
+                        'TableName': self.messages_table.name,
+                        'Item': _serialize(self._turn_item(messages)),
+                        'ConditionExpression': 'attribute_not_exists(seq)'
+                    }},
+                    {'Put': header_put}
+                ])
+                self._next_seq += 1
+                self._version = header['version']
+                self.session.update({k: header[k] for k in ('version', 'updated_at', TTL_ATTRIBUTE)})
+                return True
+
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'TransactionCanceledException':
+                    raise
+                turn_conflict, header_conflict = (_cancelled_by_condition(e) + [False, False])[:2]
+                print(f"Turn {self._next_seq} of {self.session_id} cancelled (attempt {attempt}): "
+                      f"turn conflict={turn_conflict}, header conflict={header_conflict}")
+
+            if turn_conflict:
+                self._next_seq += 1
+            if header_conflict:
+                rebased = self._rebase(changed_fields)
+                if rebased is None:
+                    return False
+                header, expected_version = rebased
+
+        raise SessionConflictError(f"Could not commit session {self.session_id} after {MAX_COMMIT_ATTEMPTS} attempts")
+
+    def _commit_header(self, changed_fields):
+        header = self._header(self.session)
+        expected_version = self._version
+
+        for attempt in range(1, MAX_COMMIT_ATTEMPTS + 1):
+            try:
+                self._version = self._put_header(header, expected_version)
+                self.session.update({k: header[k] for k in ('version', 'updated_at', TTL_ATTRIBUTE)})
+                return True
+
+            except ClientError as e:
+                if not _is_conditional_failure(e):
+                    raise
+                print(f"Session {self.session_id} changed concurrently (attempt {attempt}), rebasing")
+
+            rebased = self._rebase(changed_fields)
+            if rebased is None:
+                return False
+            header, expected_version = rebased
+
+        raise SessionConflictError(f"Could not commit session {self.session_id} after {MAX_COMMIT_ATTEMPTS} attempts")
+
+    def commit(self):
+        """Append this turn's messages and write the header if it changed"""
+        if self.session is None:
+            return False
+
+        new_history = self._new_history()
+        changed_fields = self._changed_fields()
+        if not new_history and not changed_fields:
+            return False
+
+        write_header = bool(changed_fields) or self._version is None or self._header_outdated
+        if new_history and write_header:
+            self._commit_turn_and_header(new_history, changed_fields)
+        elif new_history:
+            self._append_turn(new_history)
+        elif write_header:
+            self._commit_header(changed_fields)
+
+        self._header_outdated = False
+        self._original = copy.deepcopy(self.session)
+        return True
@@ -0,0 +1,124 @@
+"""
+Per-session ordered queue for chatbot turns.
+
+In queued mode the WebSocket route only acknowledges a message and enqueues
+the turn; a worker invocation (SQS event source on the same function) runs the
+LLM call and posts the answer back. Turns use the session ID as the FIFO
+message group, so turns of one session are processed strictly in order while
+different sessions run in parallel, bounded by the event source's maximum
+concurrency rather than by the route.
+
+LocalTurnQueue is an in-memory stand-in with the same grouping semantics for
+tests and local runs.
+"""
+
+import json
+import os
+import uuid
+from collections import OrderedDict, deque
+
+import boto3
+
+TURN_QUEUE_URL = os.environ.get('TURN_QUEUE_URL')
+# Receives before LocalTurnQueue sets a failing turn aside, like a redrive policy's maxReceiveCount
+TURN_MAX_RECEIVES = 3
+
+
+class SqsTurnQueue:
+    """Turns on an SQS FIFO queue, one message group per session"""
+
+    def __init__(self, queue_url, sqs_client=None):
+        self.queue_url = queue_url
+        self.sqs = sqs_client or boto3.client('sqs')
+
+    def enqueue(self, turn):
+        self.sqs.send_message(
+            QueueUrl=self.queue_url,
+            MessageBody=json.dumps(turn),
+            MessageGroupId=turn['sessionId'],
+            MessageDeduplicationId=turn['turnId']
+        )
+
+
+class LocalTurnQueue:
+    """
+    In-memory FIFO stand-in: per-session ordering, at most one in-flight batch
+    per session, batches shaped like SQS event records. A turn that fails
+    max_receives times is moved to dead_letters, like a redrive to a DLQ.
+    """
+
+    def __init__(self, max_receives=TURN_MAX_RECEIVES):
+        self.groups = OrderedDict()
+        self.sent = 0
+        self.max_receives = max_receives
+        self.receives = {}
+        self.dead_letters = []
+
+    def enqueue(self, turn):
+        self.groups.setdefault(turn['sessionId'], deque()).append(turn)
+        self.sent += 1
+
+    def pending(self):
+        return sum(len(turns) for turns in self.groups.values())
+
+    def receive(self, max_records=10):
+        """Take the next batch of records, keeping each session's turns in order"""
+        records = []
+        for session_id in list(self.groups):
+            turns = self.groups[session_id]
+            while turns and len(records) < max_records:
+                turn = turns.popleft()
+                self.receives[turn['turnId']] = self.receives.get(turn['turnId'], 0) + 1
+                records.append({
+                    'messageId': str(uuid.uuid4()),
+                    'eventSource': 'aws:sqs',
+                    'body': json.dumps(turn),
+                    'attributes': {'MessageGroupId': session_id},
+                    '_turn': turn
+                })
+            if not turns:
+                del self.groups[session_id]
+            if len(records) >= max_records:
+                break
+        return records
+
+    def requeue(self, records):
+        """
+        Put failed records back at the front of their groups, in order. Their
+        groups go behind the others, as a failed group's messages only become
+        visible again after the visibility timeout. Turns received max_receives
+        times go to dead_letters instead, with the rest of their group behind them.
+        """
+        for record in reversed(records):
+            turn = record['_turn']
+            self.groups.setdefault(turn['sessionId'], deque()).appendleft(turn)
+        for session_id in {record['_turn']['sessionId'] for record in records}:
+            turns = self.groups[session_id]
+            if self.receives.get(turns[0]['turnId'], 0) >= self.max_receives:
+                self.dead_letters.extend(turns)
+                del self.groups[session_id]
+            else:
+                self.groups.move_to_end(session_id)
+
+    def drain(self, handler, max_records=10):
+        """
+        Feed batches to handler(event, context) until the queue is empty. A
+        failing session does not hold up the others: its turns are retried
+        after theirs and set aside after max_receives attempts.
+        """
+        processed = 0
+        while self.groups:
+            records = self.receive(max_records)
+            result = handler({'Records': records}, None) or {}
+            failed_ids = {f['itemIdentifier'] for f in result.get('batchItemFailures', [])}
+            failed = [r for r in records if r['messageId'] in failed_ids]
+            processed += len(records) - len(failed)
+            if failed:
+                self.requeue(failed)
+        return processed
+
+def create_turn_queue():
+    """Queued mode is on when TURN_QUEUE_URL is configured"""
+    if TURN_QUEUE_URL:
+        return SqsTurnQueue(TURN_QUEUE_URL)
+    return None
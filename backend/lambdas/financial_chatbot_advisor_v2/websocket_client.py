@@ -0,0 +1,169 @@
+"""
+Cached API Gateway management clients and resilient WebSocket posting.
+
+Building a boto3 client loads and parses the service model, which costs tens
+of milliseconds, so one client per domain and stage is kept for the life of
+the container. Each client uses a pooled, keep-alive HTTP configuration.
+
+post_json() posts one message. botocore retries transient failures
+(connection errors, 5xx, throttles) a few times in its standard mode. A post
+still throttled after that is retried here with longer jittered backoff. A
+gone connection (the client disconnected) is reported, not raised, so callers
+can stop work for it. post_many() posts a batch the same way: messages for the
+same connection keep their order, different connections are posted in
+parallel, and each retry round resends only to connections that were
+throttled.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+APIGW_MAX_POOL_CONNECTIONS = int(os.environ.get('APIGW_MAX_POOL_CONNECTIONS', '10'))
+APIGW_CONNECT_TIMEOUT = float(os.environ.get('APIGW_CONNECT_TIMEOUT', '2'))
+APIGW_READ_TIMEOUT = float(os.environ.get('APIGW_READ_TIMEOUT', '5'))
+POST_MAX_ATTEMPTS = int(os.environ.get('POST_MAX_ATTEMPTS', '4'))
+POST_BACKOFF_SECONDS = float(os.environ.get('POST_BACKOFF_SECONDS', '0.05'))
+POST_MAX_WORKERS = int(os.environ.get('POST_MAX_WORKERS', '8'))
+# Attempts per post inside botocore (standard retry mode), before the throttle backoff here
+APIGW_SDK_MAX_ATTEMPTS = int(os.environ.get('APIGW_SDK_MAX_ATTEMPTS', '3'))
+
+GONE_CODES = {'GoneException'}
+THROTTLE_CODES = {'LimitExceededException', 'TooManyRequestsException', 'ThrottlingException'}
+
+CLIENT_CONFIG = Config(
+    max_pool_connections=APIGW_MAX_POOL_CONNECTIONS,
+    connect_timeout=APIGW_CONNECT_TIMEOUT,
+    read_timeout=APIGW_READ_TIMEOUT,
+    tcp_keepalive=True,
+    retries={'total_max_attempts': APIGW_SDK_MAX_ATTEMPTS, 'mode': 'standard'}
+)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_management_client(domain, stage):
+    """Management API client for a WebSocket endpoint, created once per container"""
+    key = (domain, stage)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = boto3.client(
+                    'apigatewaymanagementapi',
+                    endpoint_url=f"https://{domain}/{stage}",
+                    config=CLIENT_CONFIG
+                )
+                _clients[key] = client
+    return client
+
+
+def _error_code(error):
+    return error.response.get('Error', {}).get('Code') if isinstance(error, ClientError) else None
+
+
+def _backoff(attempt):
+    time.sleep(POST_BACKOFF_SECONDS * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5))
+
+
+def _encode(payload):
+    return payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+
+
+def post_json(client, connection_id, payload):
+    """
+    Post one message. Returns True when sent and False when the connection is
+    gone. Throttles are retried; other errors (or throttling that outlasts the
+    retries) are raised.
+    """
+    data = _encode(payload)
+    for attempt in range(1, POST_MAX_ATTEMPTS + 1):
+        try:
+            client.post_to_connection(ConnectionId=connection_id, Data=data)
+            return True
+        except ClientError as e:
+            code = _error_code(e)
+            if code in GONE_CODES:
+                print(f"Connection {connection_id} is gone")
+                return False
+            if code not in THROTTLE_CODES or attempt == POST_MAX_ATTEMPTS:
+                raise
+            print(f"Post to {connection_id} throttled (attempt {attempt}), backing off")
+        _backoff(attempt)
+
+
+def _post_in_order(client, connection_id, pending):
+    """Send a connection's messages in order until one is throttled, gone or fails"""
+    sent = 0
+    while pending:
+        try:
+            client.post_to_connection(ConnectionId=connection_id, Data=pending[0])
+        except ClientError as e:
+            code = _error_code(e)
+            if code in GONE_CODES:
+                return sent, 'gone'
+            if code in THROTTLE_CODES:
+                return sent, 'throttled'
+            print(f"Error posting to {connection_id}: {e}")
+            return sent, 'failed'
+        except Exception as e:
+            print(f"Error posting to {connection_id}: {e}")
+            return sent, 'failed'
+        pending.pop(0)
+        sent += 1
+    return sent, 'sent'
+
+
+def _post_round(pool, client, pending):
+    items = list(pending.items())
+    if pool is None:
+        return [(connection_id, _post_in_order(client, connection_id, queue)) for connection_id, queue in items]
+    return pool.map(lambda item: (item[0], _post_in_order(client, *item)), items)
+
+
+def post_many(client, messages):
+    """
+    Post (connection_id, payload) pairs. Returns counts plus the connection IDs
+    that are gone, and those that failed or stayed throttled (their remaining
+    messages are not sent).
+    """
+    queues = {}
+    for connection_id, payload in messages:
+        queues.setdefault(connection_id, []).append(_encode(payload))
+
+    result = {'sent': 0, 'gone': [], 'failed': []}
+    pending = queues
+    # A single connection is posted in order anyway, so it needs no pool
+    pool = ThreadPoolExecutor(max_workers=min(POST_MAX_WORKERS, len(pending))) if len(pending) > 1 else None
+
+    try:
+        for attempt in range(1, POST_MAX_ATTEMPTS + 1):
+            if not pending:
+                break
+            throttled = {}
+            for connection_id, (sent, status) in _post_round(pool, client, pending):
+                result['sent'] += sent
+                if status == 'throttled':
+                    throttled[connection_id] = pending[connection_id]
+                elif status in ('gone', 'failed'):
+                    result[status].append(connection_id)
+
+            pending = throttled
+            if pending and attempt < POST_MAX_ATTEMPTS:
+                print(f"{len(pending)} connections throttled (attempt {attempt}), backing off")
+                _backoff(attempt)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result['failed'].extend(pending)
+    return result
@@ -230,6 +230,8 @@ def lambda_handler(event, context):
                 "salaryDocUrl": salary_doc_url,
                 "uploadedAt": current_timestamp,
             },
+            # Top-level copy of documents.uploadedAt: key of the sparse documents index
+            "documentsUploadedAt": current_timestamp,
         }
 
         if not user_exists:
@@ -0,0 +1,642 @@
+"""
+Local load simulator for the WebSocket chatbot Lambda.
+
+Drives financial_chatbot_advisor_v2.lambda_handler with synthetic
+$connect / start / message / $disconnect sequences from many threads. It runs
+against in-memory stand-ins for:
+- the chatbot DynamoDB tables and asu-user-profiles
+- the API Gateway management API
+- the LLM gateway
+
+Each stand-in has configurable latency. No AWS or LLM calls are made.
+
+Reports turns/sec, latency percentiles per stage (connect, start, menu, data
+collection, LLM turns, time to first streamed chunk, disconnect) and DynamoDB
+call counts per table and operation.
+
+    python scripts/chatbot_load_simulator.py --users 2000 --concurrency 64 \\
+        --llm-latency "lognormal:900,0.4" --ddb-latency "lognormal:6,0.3"
+
+Latency specs: const:MS, uniform:LOW,HIGH, normal:MEAN,SD or lognormal:MEDIAN,SIGMA.
+--time-scale 0.01 shrinks every simulated delay for a quick smoke run.
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import types
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+CHATBOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'lambdas', 'financial_chatbot_advisor_v2')
+
+# The simulator never talks to AWS; boto3 only needs a region to build the unused resources
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+os.environ.setdefault('COGNITO_USERNAME', 'load-simulator')
+os.environ.setdefault('COGNITO_PASSWORD', 'load-simulator')
+os.environ.setdefault('BEARER_TOKEN', 'load-simulator')
+# Turns are answered inline; the SQS worker path is not simulated
+os.environ.pop('TURN_QUEUE_URL', None)
+
+TIME_SCALE = 1.0
+
+
+def parse_latency(spec):
+    """Sampler (in seconds) for a latency spec such as 'lognormal:800,0.4'"""
+    kind, _, args = spec.partition(':')
+    values = [float(v) for v in args.split(',')] if args else []
+    if kind == 'const' and len(values) == 1:
+        sample = lambda: values[0]
+    elif kind == 'uniform' and len(values) == 2:
+        sample = lambda: random.uniform(values[0], values[1])
+    elif kind == 'normal' and len(values) == 2:
+        sample = lambda: max(0.0, random.gauss(values[0], values[1]))
+    elif kind == 'lognormal' and len(values) == 2:
+        sample = lambda: random.lognormvariate(math.log(values[0]), values[1])
+    else:
+        raise argparse.ArgumentTypeError(f"invalid latency spec: {spec}")
+    return lambda: sample() * TIME_SCALE / 1000
+
+
+class Metrics:
+    """Thread-safe latency samples and call counters"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.calls = Counter()
+        self.errors = Counter()
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            self.latencies[stage].append(seconds)
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.calls[key] += n
+
+    def error(self, key):
+        with self.lock:
+            self.errors[key] += 1
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+# ---------------------------------------------------------------------------
+# DynamoDB stand-in
+# ---------------------------------------------------------------------------
+
+def _conditional_check_failed(operation):
+    from botocore.exceptions import ClientError
+    return ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': 'The conditional request failed'}}, operation)
+
+
+class InMemoryTable:
+    """
+    The subset of the boto3 Table API the chatbot uses: conditional puts and
+    updates, ALL_OLD / ALL_NEW return values, projections (including nested
+    paths), key-condition queries, paginated scans and batch_writer().
+    """
+
+    def __init__(self, name, key, sort_key=None, metrics=None, latency=None):
+        self.name = name
+        self.key = key
+        self.sort_key = sort_key
+        self.metrics = metrics
+        self.latency = latency
+        self.items = {}
+        self.lock = threading.Lock()
+
+    def _call(self, operation):
+        if self.metrics:
+            self.metrics.count((self.name, operation))
+        if self.latency:
+            time.sleep(self.latency())
+
+    def _key_of(self, item):
+        return (item[self.key], item.get(self.sort_key)) if self.sort_key else (item[self.key],)
+
+    @staticmethod
+    def _resolve(name, names):
+        return (names or {}).get(name, name)
+
+    def _project(self, item, projection, names):
+        if not projection:
+            return copy.deepcopy(item)
+        result = {}
+        for path in projection.split(','):
+            parts = [self._resolve(p.strip(), names) for p in path.strip().split('.')]
+            source, target = item, result
+            for depth, part in enumerate(parts):
+                if not isinstance(source, dict) or part not in source:
+                    break
+                if depth == len(parts) - 1:
+                    target[part] = copy.deepcopy(source[part])
+                else:
+                    source = source[part]
+                    target = target.setdefault(part, {})
+        return result
+
+    def _check(self, current, condition, values, names):
+        if not condition:
+            return True
+        for clause in condition.split(' OR '):
+            clause = clause.strip()
+            match = re.fullmatch(r'attribute_(not_)?exists\((\S+)\)', clause)
+            if match:
+                attribute = self._resolve(match.group(2), names)
+                exists = current is not None and attribute in current
+                if exists != bool(match.group(1)):
+                    return True
+                continue
+            match = re.fullmatch(r'(\S+) = (:\w+)', clause)
+            if match:
+                if current is not None and current.get(self._resolve(match.group(1), names)) == values[match.group(2)]:
+                    return True
+                continue
+            raise NotImplementedError(f"Unsupported condition: {condition}")
+        return False
+
+    def get_item(self, Key, ProjectionExpression=None, ExpressionAttributeNames=None, **kwargs):
+        self._call('GetItem')
+        with self.lock:
+            item = self.items.get(self._key_of(Key))
+            return {'Item': self._project(item, ProjectionExpression, ExpressionAttributeNames)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None,
+                 ExpressionAttributeNames=None, ReturnValues=None, **kwargs):
+        self._call('PutItem')
+        with self.lock:
+            key = self._key_of(Item)
+            current = self.items.get(key)
+            if not self._check(current, ConditionExpression, ExpressionAttributeValues or {}, ExpressionAttributeNames):
+                raise _conditional_check_failed('PutItem')
+            self.items[key] = copy.deepcopy(Item)
+            return {'Attributes': copy.deepcopy(current)} if current and ReturnValues == 'ALL_OLD' else {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None, ConditionExpression=None,
+                    ExpressionAttributeNames=None, ReturnValues=None, **kwargs):
+        self._call('UpdateItem')
+        match = re.fullmatch(r'SET (.+)', UpdateExpression.strip())
+        if not match:
+            raise NotImplementedError(f"Unsupported update: {UpdateExpression}")
+        values = ExpressionAttributeValues or {}
+        with self.lock:
+            key = self._key_of(Key)
+            current = self.items.get(key)
+            if not self._check(current, ConditionExpression, values, ExpressionAttributeNames):
+                raise _conditional_check_failed('UpdateItem')
+            item = copy.deepcopy(current) if current else copy.deepcopy(Key)
+            for assignment in match.group(1).split(','):
+                attribute, value = [part.strip() for part in assignment.split('=')]
+                item[self._resolve(attribute, ExpressionAttributeNames)] = copy.deepcopy(values[value])
+            self.items[key] = item
+            return {'Attributes': copy.deepcopy(item)} if ReturnValues == 'ALL_NEW' else {}
+
+    def delete_item(self, Key, ReturnValues=None, **kwargs):
+        self._call('DeleteItem')
+        with self.lock:
+            current = self.items.pop(self._key_of(Key), None)
+            return {'Attributes': current} if current and ReturnValues == 'ALL_OLD' else {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues, ScanIndexForward=True, Limit=None, **kwargs):
+        self._call('Query')
+        match = re.fullmatch(r'(\w+) = (:\w+)(?: AND (\w+) (>=|<=|>|<|=) (:\w+))?', KeyConditionExpression.strip())
+        if not match:
+            raise NotImplementedError(f"Unsupported key condition: {KeyConditionExpression}")
+        partition, partition_value, sort_key, operator, sort_value = match.groups()
+        compare = {
+            '>': lambda a, b: a > b, '>=': lambda a, b: a >= b, '<': lambda a, b: a < b,
+            '<=': lambda a, b: a <= b, '=': lambda a, b: a == b
+        }
+        with self.lock:
+            items = [
+                item for item in self.items.values()
+                if item.get(partition) == ExpressionAttributeValues[partition_value]
+                and (sort_key is None or compare[operator](item[sort_key], ExpressionAttributeValues[sort_value]))
+            ]
+            items.sort(key=lambda item: item.get(self.sort_key), reverse=not ScanIndexForward)
+            if Limit:
+                items = items[:Limit]
+            return {'Items': copy.deepcopy(items), 'Count': len(items)}
+
+    def scan(self, ProjectionExpression=None, ExpressionAttributeNames=None, ExclusiveStartKey=None, Limit=1000, **kwargs):
+        self._call('Scan')
+        with self.lock:
+            keys = sorted(self.items, key=str)
+            start = ExclusiveStartKey or 0
+            page = [self._project(self.items[k], ProjectionExpression, ExpressionAttributeNames) for k in keys[start:start + Limit]]
+        response = {'Items': page, 'Count': len(page)}
+        if start + Limit < len(keys):
+            response['LastEvaluatedKey'] = start + Limit
+        return response
+
+    @contextlib.contextmanager
+    def batch_writer(self):
+        table = self
+
+        class BatchWriter:
+            def __init__(self):
+                self.pending = 0
+
+            def _flush_if_full(self):
+                self.pending += 1
+                if self.pending == 25:
+                    table._call('BatchWriteItem')
+                    self.pending = 0
+
+            def put_item(self, Item):
+                with table.lock:
+                    table.items[table._key_of(Item)] = copy.deepcopy(Item)
+                self._flush_if_full()
+
+            def delete_item(self, Key):
+                with table.lock:
+                    table.items.pop(table._key_of(Key), None)
+                self._flush_if_full()
+
+        writer = BatchWriter()
+        yield writer
+        if writer.pending:
+            table._call('BatchWriteItem')
+
+
+class InMemoryClient:
+    """transact_write_items (Put and Delete) across InMemoryTables, reachable as table.meta.client"""
+
+    def __init__(self, tables, metrics=None):
+        from boto3.dynamodb.types import TypeDeserializer
+        self.deserializer = TypeDeserializer()
+        self.tables = {table.name: table for table in tables}
+        self.metrics = metrics
+        for table in tables:
+            table.meta = types.SimpleNamespace(client=self)
+
+    def _deserialize(self, values):
+        return {k: self.deserializer.deserialize(v) for k, v in (values or {}).items()}
+
+    def transact_write_items(self, TransactItems, **kwargs):
+        from botocore.exceptions import ClientError
+        operations = [next(iter(item.items())) for item in TransactItems]
+        tables = [self.tables[operation['TableName']] for _, operation in operations]
+        if self.metrics:
+            self.metrics.count(('transaction', 'TransactWriteItems'))
+        if tables[0].latency:
+            time.sleep(tables[0].latency())
+
+        with contextlib.ExitStack() as stack:
+            for table in sorted(set(tables), key=lambda t: t.name):
+                stack.enter_context(table.lock)
+
+            writes, reasons = [], []
+            for table, (kind, operation) in zip(tables, operations):
+                if kind not in ('Put', 'Delete'):
+                    raise NotImplementedError(f"Unsupported transaction item: {kind}")
+                item = self._deserialize(operation['Item' if kind == 'Put' else 'Key'])
+                current = table.items.get(table._key_of(item))
+                passed = table._check(current, operation.get('ConditionExpression'),
+                                      self._deserialize(operation.get('ExpressionAttributeValues')),
+                                      operation.get('ExpressionAttributeNames'))
+                reasons.append({'Code': 'None' if passed else 'ConditionalCheckFailed'})
+                writes.append((table, item if kind == 'Put' else None, table._key_of(item)))
+
+            if any(reason['Code'] != 'None' for reason in reasons):
+                raise ClientError({
+                    'Error': {'Code': 'TransactionCanceledException', 'Message': 'Transaction cancelled'},
+                    'CancellationReasons': reasons
+                }, 'TransactWriteItems')
+            for table, item, key in writes:
+                if item is None:
+                    table.items.pop(key, None)
+                else:
+                    table.items[key] = item
+        return {}
+
+
+# ---------------------------------------------------------------------------
+# API Gateway management API and LLM gateway stand-ins
+# ---------------------------------------------------------------------------
+
+class FakeManagementApi:
+    """Records posts and timestamps the first streamed chunk of each turn"""
+
+    def __init__(self, metrics, latency):
+        self.metrics = metrics
+        self.latency = latency
+        self.local = threading.local()
+
+    def post_to_connection(self, ConnectionId, Data):
+        self.metrics.count(('apigateway', 'PostToConnection'))
+        time.sleep(self.latency())
+        payload = json.loads(Data)
+        started = getattr(self.local, 'turn_started', None)
+        if payload.get('type') == 'stream_chunk' and payload.get('seq') == 0 and started is not None:
+            self.metrics.observe('first_chunk', time.perf_counter() - started)
+        return {}
+
+
+class FakeLlmResponse:
+    def __init__(self, text, stream, first_token_delay, token_delay):
+        self.status_code = 200
+        self.text = ''
+        self._content = text
+        self._stream = stream
+        self._first_token_delay = first_token_delay
+        self._token_delay = token_delay
+
+    def json(self):
+        time.sleep(self._first_token_delay + self._token_delay * len(self._content.split()))
+        words = len(self._content.split())
+        return {
+            'choices': [{'message': {'role': 'assistant', 'content': self._content}}],
+            'usage': {'prompt_tokens': 800, 'completion_tokens': words * 4 // 3}
+        }
+
+    def iter_lines(self):
+        time.sleep(self._first_token_delay)
+        for word in self._content.split():
+            time.sleep(self._token_delay)
+            chunk = {'choices': [{'delta': {'content': word + ' '}}]}
+            yield f"data: {json.dumps(chunk)}".encode('utf-8')
+        yield b'data: [DONE]'
+
+    def close(self):
+        pass
+
+
+class FakeLlmGateway:
+    """requests.post replacement for the chat completions endpoint"""
+
+    def __init__(self, metrics, latency, token_latency, answer_words):
+        self.metrics = metrics
+        self.latency = latency
+        self.token_latency = token_latency
+        self.answer_words = answer_words
+
+    def post(self, url, headers=None, json=None, stream=False, timeout=None):
+        self.metrics.count(('llm', 'stream' if stream else 'completion'))
+        words = max(5, int(random.gauss(self.answer_words, self.answer_words / 4)))
+        if (json or {}).get('max_tokens', 3000) <= 500:
+            words = min(words, 60)
+        text = ' '.join(random.choice(LOREM) for _ in range(words))
+        first_token_delay = self.latency()
+        self.metrics.observe('llm_first_token', first_token_delay)
+        return FakeLlmResponse(text, stream, first_token_delay, self.token_latency())
+
+
+LOREM = (
+    'match retirement loan payment employer salary plan monthly savings 401(k) '
+    'contribution balance interest budget SECURE 2.0 eligible vesting projection'
+).split()
+
+
+# ---------------------------------------------------------------------------
+# Synthetic users
+# ---------------------------------------------------------------------------
+
+FAQ_QUESTIONS = [
+    'What is SECURE 2.0?',
+    'Do private student loans qualify for the match?',
+    'How does the employer match vesting work?',
+    'How much does ASU match on student loan payments?',
+    'How do I prove I am making loan payments?',
+    'What happens if I pay off my loans early?'
+]
+PROFILE_QUESTIONS = [
+    'What is my approval status?',
+    'How much match have I earned this year?',
+    'Should I pay extra on my loan or invest more in my 401(k)?',
+    'What is my remaining balance?'
+]
+OPTIMIZATION_FOLLOW_UPS = [
+    'What if I pay an extra $200 a month?',
+    'How much will my match be worth in 20 years?',
+    'What is my interest rate?'
+]
+
+
+def conversation(rng, profile_ids, follow_ups):
+    """A scripted conversation: (stage, message) pairs after 'start'"""
+    flow = rng.choices(['faq', 'optimization', 'profile'], weights=[5, 3, 2])[0]
+    if flow == 'faq':
+        turns = [('llm_turn', '3')]
+        turns += [('llm_turn', rng.choice(FAQ_QUESTIONS)) for _ in range(follow_ups)]
+    elif flow == 'optimization':
+        turns = [('menu', '1'), ('collect', f"ASU{rng.randint(10**9, 10**10 - 1)}"),
+                 ('collect', f"${rng.randint(10, 120)},000"), ('collect', f"{rng.randint(5, 20)} years"),
+                 ('collect', f"{rng.uniform(3, 9):.1f}%"), ('llm_turn', f"{rng.randint(40, 140)}k")]
+        turns += [('llm_turn', rng.choice(OPTIMIZATION_FOLLOW_UPS)) for _ in range(follow_ups)]
+    else:
+        turns = [('menu', '2'), ('collect', rng.choice(profile_ids))]
+        turns += [('llm_turn', rng.choice(PROFILE_QUESTIONS)) for _ in range(max(1, follow_ups))]
+    return flow, turns
+
+
+def seed_profiles(table, count):
+    ids = []
+    for i in range(count):
+        asu_id = f"SIM{i:07d}"
+        ids.append(asu_id)
+        table.items[(asu_id,)] = {
+            'asuId': asu_id,
+            'firstName': 'Sim',
+            'lastName': f"User{i}",
+            'salary': Decimal(str(random.randint(3000, 9000))),
+            'debtAmount': str(random.randint(10000, 90000)),
+            'interestRate': Decimal('6.5'),
+            'repaymentPeriod': Decimal('10'),
+            'loanApplication': {'loanAmount': Decimal(str(random.randint(10000, 90000))), 'currency': 'USD',
+                                'interestRate': Decimal('6.5'), 'loanTenure': Decimal('10')},
+            'monthly_emi': Decimal('450.25'),
+            'approvalStatus': random.choice(['pending', 'approved', 'rejected']),
+            'updatedAt': '2025-01-01T00:00:00'
+        }
+    return ids
+
+
+def event(route, connection_id, body=None):
+    e = {'requestContext': {'routeKey': route, 'connectionId': connection_id,
+                            'domainName': 'sim.execute-api.local', 'stage': 'load'}}
+    if body is not None:
+        e['body'] = json.dumps(body)
+    return e
+
+
+def run_user(lf, api, metrics, user_index, profile_ids, follow_ups, think_time, seed):
+    rng = random.Random(seed + user_index)
+    connection_id = f"conn-{user_index}"
+    flow, turns = conversation(rng, profile_ids, follow_ups)
+
+    def call(stage, e):
+        started = time.perf_counter()
+        api.local.turn_started = started
+        try:
+            response = lf.lambda_handler(e, None)
+            if response.get('statusCode') != 200:
+                metrics.error((stage, response.get('statusCode')))
+        except Exception as ex:
+            metrics.error((stage, type(ex).__name__))
+        finally:
+            api.local.turn_started = None
+            metrics.observe(stage, time.perf_counter() - started)
+
+    call('connect', event('$connect', connection_id))
+    call('start', event('message', connection_id, {'action': 'start'}))
+    for stage, message in turns:
+        if think_time:
+            time.sleep(think_time())
+        call(stage, event('message', connection_id, {'action': 'message', 'message': message}))
+        metrics.count(('turns', flow))
+    call('disconnect', event('$disconnect', connection_id))
+
+
+# ---------------------------------------------------------------------------
+# Wiring and report
+# ---------------------------------------------------------------------------
+
+def load_lambda(metrics, args):
+    sys.path.insert(0, os.path.abspath(CHATBOT_DIR))
+    with contextlib.redirect_stdout(io.StringIO()):
+        import lambda_function as lf
+
+    ddb_latency = parse_latency(args.ddb_latency)
+    tables = {
+        'connections_table': InMemoryTable('chatbot-connections', 'connectionId', metrics=metrics, latency=ddb_latency),
+        'sessions_table': InMemoryTable('chatbot-sessions', 'sessionId', metrics=metrics, latency=ddb_latency),
+        'messages_table': InMemoryTable('chatbot-messages', 'sessionId', 'seq', metrics=metrics, latency=ddb_latency),
+        'user_profiles_table': InMemoryTable('asu-user-profiles', 'asuId', metrics=metrics, latency=ddb_latency),
+        'precomputed_table': InMemoryTable('chatbot-precomputed-responses', 'promptId', metrics=metrics, latency=ddb_latency)
+    }
+    InMemoryClient(tables.values(), metrics)
+    for name, table in tables.items():
+        setattr(lf, name, table)
+    lf.precomputed_store = lf.PrecomputedResponseStore(tables['precomputed_table'])
+
+    api = FakeManagementApi(metrics, parse_latency(args.apigw_latency))
+    lf.get_management_client = lambda domain, stage: api
+
+    gateway = FakeLlmGateway(metrics, parse_latency(args.llm_latency), parse_latency(args.token_latency), args.answer_words)
+    lf.requests.post = gateway.post
+    lf.get_llm_headers = lambda: {}
+    lf.STREAM_RESPONSES = not args.no_stream
+    if args.no_faq_cache:
+        lf.faq_answer_cache = None
+
+    return lf, api, tables
+
+
+def report(metrics, tables, elapsed, args):
+    turns = sum(v for (kind, _), v in metrics.calls.items() if kind == 'turns')
+    stages = ['connect', 'start', 'menu', 'collect', 'llm_turn', 'first_chunk', 'llm_first_token', 'disconnect']
+
+    lines = [
+        '=' * 80,
+        f"CHATBOT LOAD SIMULATION: {args.users} users, concurrency {args.concurrency}, time scale {TIME_SCALE:g}",
+        '=' * 80,
+        f"Elapsed: {elapsed:.2f}s   Turns: {turns}   Turns/sec: {turns / elapsed:.1f}   "
+        f"Sessions/sec: {args.users / elapsed:.1f}",
+        '',
+        f"{'Stage':<18}{'count':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    ]
+    for stage in stages:
+        values = sorted(metrics.latencies.get(stage, []))
+        if not values:
+            continue
+        lines.append(
+            f"{stage:<18}{len(values):>8}" + ''.join(
+                f"{percentile(values, p) * 1000:>10.1f}" for p in (50, 90, 99)
+            ) + f"{values[-1] * 1000:>10.1f}"
+        )
+
+    lines += ['', 'Calls per table / operation:']
+    for (target, operation), count in sorted(metrics.calls.items(), key=lambda kv: (str(kv[0][0]), str(kv[0][1]))):
+        if target == 'turns':
+            continue
+        lines.append(f"  {target:<32}{operation:<18}{count:>8}  ({count / max(turns, 1):.2f}/turn)")
+
+    lines += ['', 'Items left after disconnect:']
+    for table in tables.values():
+        lines.append(f"  {table.name:<32}{len(table.items):>8}")
+
+    if metrics.errors:
+        lines += ['', 'Errors:'] + [f"  {key}: {count}" for key, count in metrics.errors.most_common()]
+    print('\n'.join(lines))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'elapsedSeconds': elapsed,
+                'turns': turns,
+                'turnsPerSecond': turns / elapsed,
+                'latencyMs': {
+                    stage: {f"p{p}": percentile(sorted(values), p) * 1000 for p in (50, 90, 99)}
+                    for stage, values in metrics.latencies.items()
+                },
+                'calls': {f"{t}:{o}": c for (t, o), c in metrics.calls.items()},
+                'errors': {str(k): c for k, c in metrics.errors.items()}
+            }, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+def main():
+    global TIME_SCALE
+
+    parser = argparse.ArgumentParser(description='Concurrent load simulator for the chatbot Lambda')
+    parser.add_argument('--users', type=int, default=1000, help='simulated connections (one session each)')
+    parser.add_argument('--concurrency', type=int, default=50, help='worker threads')
+    parser.add_argument('--follow-ups', type=int, default=2, help='LLM questions per conversation after its flow')
+    parser.add_argument('--profiles', type=int, default=500, help='seeded asu-user-profiles items')
+    parser.add_argument('--llm-latency', default='lognormal:900,0.4', help='time to first token')
+    parser.add_argument('--token-latency', default='lognormal:8,0.3', help='delay per streamed word')
+    parser.add_argument('--answer-words', type=int, default=180, help='mean answer length in words')
+    parser.add_argument('--ddb-latency', default='lognormal:6,0.3', help='per DynamoDB call')
+    parser.add_argument('--apigw-latency', default='lognormal:12,0.3', help='per post_to_connection')
+    parser.add_argument('--think-time', default=None, help='user pause between messages, e.g. uniform:500,3000')
+    parser.add_argument('--time-scale', type=float, default=1.0, help='multiply every simulated delay')
+    parser.add_argument('--no-stream', action='store_true', help='disable response streaming')
+    parser.add_argument('--no-faq-cache', action='store_true', help='disable the FAQ answer cache')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', help='also write the report to this file')
+    parser.add_argument('--verbose', action='store_true', help="keep the Lambda's own log output")
+    args = parser.parse_args()
+
+    TIME_SCALE = args.time_scale
+    random.seed(args.seed)
+    metrics = Metrics()
+    lf, api, tables = load_lambda(metrics, args)
+    profile_ids = seed_profiles(tables['user_profiles_table'], args.profiles)
+    think_time = parse_latency(args.think_time) if args.think_time else None
+
+    print(f"Simulating {args.users} users with {args.concurrency} threads...")
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    started = time.perf_counter()
+    with output:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [
+                pool.submit(run_user, lf, api, metrics, i, profile_ids, args.follow_ups, think_time, args.seed)
+                for i in range(args.users)
+            ]
+            for future in futures:
+                future.result()
+    elapsed = time.perf_counter() - started
+
+    report(metrics, tables, elapsed, args)
+
+
+if __name__ == '__main__':
+    main()
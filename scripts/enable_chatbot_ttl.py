@@ -0,0 +1,33 @@
+import boto3
+
+dynamodb = boto3.client('dynamodb')
+
+# Tables whose items carry an expiresAt epoch timestamp (see session_lifecycle.py)
+TTL_TABLES = ['chatbot-connections', 'chatbot-sessions', 'chatbot-messages']
+TTL_ATTRIBUTE = 'expiresAt'
+
+def enable_chatbot_ttl():
+    """Turn on DynamoDB TTL for the chatbot tables"""
+
+    print("="*80)
+    print(f"Enabling TTL on '{TTL_ATTRIBUTE}' for chatbot tables")
+    print("="*80)
+
+    for table_name in TTL_TABLES:
+        try:
+            current = dynamodb.describe_time_to_live(TableName=table_name)['TimeToLiveDescription']
+            if current.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+                print(f"{table_name}: already {current['TimeToLiveStatus']} on '{current.get('AttributeName')}'")
+                continue
+
+            dynamodb.update_time_to_live(
+                TableName=table_name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE}
+            )
+            print(f"{table_name}: TTL enabled")
+
+        except Exception as e:
+            print(f"{table_name}: Error - {str(e)}")
+
+if __name__ == '__main__':
+    enable_chatbot_ttl()
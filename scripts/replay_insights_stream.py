@@ -0,0 +1,303 @@
+"""
+Local replay of user profile stream events into the insights aggregate.
+
+Runs DynamoDB Streams batches through the admin-API stream consumer
+(insights_aggregates.apply_stream_records) against an in-memory aggregate
+table. It then checks the result against a full recompute of the final
+population. No AWS calls are made.
+
+Events come from a file of captured Lambda stream events (one JSON event per
+line, as delivered to the function) or, by default, from a synthetic workload
+of inserts, updates and deletes. Some synthetic batches are delivered twice,
+some right away and some after newer batches, to exercise the redelivery
+check.
+
+    python scripts/replay_insights_stream.py --users 2000 --changes 10000
+    python scripts/replay_insights_stream.py --events captured_events.jsonl
+"""
+
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import sys
+import threading
+import uuid
+from decimal import Decimal
+
+ADMIN_API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'lambdas', 'admin-API')
+sys.path.insert(0, os.path.abspath(ADMIN_API_DIR))
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+from botocore.exceptions import ClientError
+
+from insights_aggregates import (
+    InsightsAggregateStore, apply_stream_records, compute_totals, deserialize_image, render_insights
+)
+
+STATUSES = ['High Burden', 'Moderate Burden', 'Manageable', 'No Debt', 'Unknown']
+
+serializer = TypeSerializer()
+deserializer = TypeDeserializer()
+
+
+class InMemoryAggregateTable:
+    """
+    get_item / put_item / update_item (ADD and SET, with conditions) and
+    meta.client.transact_write_items for the aggregate and batch marker items
+    """
+
+    name = 'admin-insights-aggregates'
+
+    def __init__(self):
+        self.items = {}
+        self.lock = threading.RLock()
+        self.meta = type('Meta', (), {'client': InMemoryAggregateClient(self)})()
+
+    def get_item(self, Key, **kwargs):
+        with self.lock:
+            item = self.items.get(Key['aggregateId'])
+            return {'Item': copy.deepcopy(item)} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        with self.lock:
+            item = self.items.get(Item['aggregateId'])
+            if ConditionExpression and not self._check(item, ConditionExpression,
+                                                       ExpressionAttributeNames or {},
+                                                       ExpressionAttributeValues or {}):
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': ''}}, 'PutItem')
+            self.items[Item['aggregateId']] = copy.deepcopy(Item)
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames, ExpressionAttributeValues,
+                    ConditionExpression=None, ReturnValues=None, **kwargs):
+        names, values = ExpressionAttributeNames, ExpressionAttributeValues
+        with self.lock:
+            item = self.items.get(Key['aggregateId'])
+            if ConditionExpression and not self._check(item, ConditionExpression, names, values):
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': ''}}, 'UpdateItem')
+
+            item = item or dict(Key)
+            match = re.fullmatch(r'(?:ADD (.+?) )?SET (.+)', UpdateExpression)
+            for addition in (match.group(1) or '').split(', '):
+                if addition:
+                    name, value = addition.split(' ')
+                    item[names[name]] = item.get(names[name], Decimal(0)) + values[value]
+            for assignment in match.group(2).split(', '):
+                name, value = assignment.split(' = ')
+                item[names[name]] = values[value]
+            self.items[Key['aggregateId']] = item
+            return {'Attributes': copy.deepcopy(item)} if ReturnValues == 'ALL_NEW' else {}
+
+    def check(self, key, condition, names, values):
+        return self._check(self.items.get(key['aggregateId']), condition, names, values)
+
+    @staticmethod
+    def _check(item, condition, names, values):
+        """AND of attribute_exists(x), attribute_not_exists(x) and #name = :value"""
+        for clause in condition.split(' AND '):
+            function = re.fullmatch(r'(attribute_exists|attribute_not_exists)\((.+)\)', clause)
+            if function:
+                exists = item is not None and names.get(function.group(2), function.group(2)) in item
+                if exists != (function.group(1) == 'attribute_exists'):
+                    return False
+            else:
+                name, value = clause.split(' = ')
+                if item is None or item.get(names[name]) != values[value]:
+                    return False
+        return True
+
+
+class InMemoryAggregateClient:
+    """transact_write_items (Put and Update) over an InMemoryAggregateTable"""
+
+    def __init__(self, table):
+        self.table = table
+
+    @staticmethod
+    def _plain(attributes):
+        return {name: deserializer.deserialize(value) for name, value in (attributes or {}).items()}
+
+    def transact_write_items(self, TransactItems):
+        table = self.table
+        with table.lock:
+            for entry in TransactItems:
+                (action, request), = entry.items()
+                key = self._plain(request.get('Key') or request['Item'])
+                condition = request.get('ConditionExpression')
+                if condition and not table.check(key, condition, request.get('ExpressionAttributeNames', {}),
+                                                 self._plain(request.get('ExpressionAttributeValues'))):
+                    raise ClientError({'Error': {'Code': 'TransactionCanceledException', 'Message': ''}},
+                                      'TransactWriteItems')
+            for entry in TransactItems:
+                (action, request), = entry.items()
+                if action == 'Put':
+                    table.put_item(Item=self._plain(request['Item']))
+                else:
+                    table.update_item(
+                        Key=self._plain(request['Key']),
+                        UpdateExpression=request['UpdateExpression'],
+                        ExpressionAttributeNames=request['ExpressionAttributeNames'],
+                        ExpressionAttributeValues=self._plain(request['ExpressionAttributeValues'])
+                    )
+        return {}
+
+
+def synthetic_user(rng, asu_id):
+    user = {
+        'asuId': asu_id,
+        'repayment_status': rng.choice(STATUSES),
+        'monthly_emi': Decimal(str(round(rng.uniform(0, 1200), 2))),
+        'remaining_balance': Decimal(str(round(rng.uniform(0, 90000), 2))),
+        'loanApplication': {
+            'loanAmount': Decimal(str(rng.randint(0, 120000))),
+            'interestRate': Decimal(str(round(rng.choice([0, rng.uniform(2, 11)]), 2))),
+            'loanTenure': Decimal(str(rng.randint(5, 25))),
+            'currency': 'USD'
+        }
+    }
+    if rng.random() < 0.8:
+        user['latestRecommendation'] = {
+            'financialProjections': {'debtToIncomeImpact': {'afterMatch': Decimal(str(round(rng.uniform(0, 55), 2)))}}
+        }
+    return user
+
+
+def mutate(rng, user):
+    user = copy.deepcopy(user)
+    field = rng.choice(['status', 'balance', 'rate', 'dti', 'emi'])
+    if field == 'status':
+        user['repayment_status'] = rng.choice(STATUSES)
+    elif field == 'balance':
+        user['remaining_balance'] = Decimal(str(round(rng.uniform(0, 90000), 2)))
+    elif field == 'rate':
+        user['loanApplication']['interestRate'] = Decimal(str(round(rng.uniform(0, 11), 2)))
+    elif field == 'dti':
+        user['latestRecommendation'] = {
+            'financialProjections': {'debtToIncomeImpact': {'afterMatch': Decimal(str(round(rng.uniform(0, 55), 2)))}}
+        }
+    else:
+        user['monthly_emi'] = Decimal(str(round(rng.uniform(0, 1200), 2)))
+    return user
+
+
+def stream_record(event_name, old, new):
+    change = {'Keys': {'asuId': {'S': (new or old)['asuId']}}, 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+    if old:
+        change['OldImage'] = {k: serializer.serialize(v) for k, v in old.items()}
+    if new:
+        change['NewImage'] = {k: serializer.serialize(v) for k, v in new.items()}
+    return {'eventID': uuid.uuid4().hex, 'eventName': event_name, 'eventSource': 'aws:dynamodb', 'dynamodb': change}
+
+
+def synthetic_events(rng, users, changes, batch_size, redeliver_rate):
+    """Yield Lambda stream events; users is updated to the final population"""
+    batch = []
+    delivered = []
+    for _ in range(changes):
+        action = rng.choices(['insert', 'modify', 'remove'], weights=[2, 7, 1])[0]
+        if action == 'insert' or not users:
+            asu_id = f"SIM{uuid.uuid4().hex[:10]}"
+            users[asu_id] = synthetic_user(rng, asu_id)
+            batch.append(stream_record('INSERT', None, users[asu_id]))
+        else:
+            asu_id = rng.choice(list(users))
+            old = users[asu_id]
+            if action == 'modify':
+                users[asu_id] = mutate(rng, old)
+                batch.append(stream_record('MODIFY', old, users[asu_id]))
+            else:
+                del users[asu_id]
+                batch.append(stream_record('REMOVE', old, None))
+
+        if len(batch) == batch_size:
+            yield {'Records': batch}
+            delivered.append(batch)
+            if rng.random() < redeliver_rate:
+                # Usually the batch just delivered, sometimes an older one
+                yield {'Records': batch if rng.random() < 0.5 else rng.choice(delivered)}
+            batch = []
+    if batch:
+        yield {'Records': batch}
+
+
+def final_population(events):
+    """Population implied by captured events (last image per key)"""
+    users = {}
+    for event in events:
+        for record in event.get('Records', []):
+            change = record.get('dynamodb', {})
+            key = change.get('Keys', {}).get('asuId', {}).get('S')
+            image = deserialize_image(change.get('NewImage'))
+            if image:
+                users[key] = image
+            else:
+                users.pop(key, None)
+    return users
+
+
+def without_percentiles(insights):
+    return {
+        section: {k: v for k, v in values.items() if not k.startswith(('median', 'p90'))}
+        for section, values in insights.items() if isinstance(values, dict)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay user profile stream events into the insights aggregate')
+    parser.add_argument('--events', help='file of captured Lambda stream events, one JSON event per line')
+    parser.add_argument('--users', type=int, default=1000, help='synthetic users before the replay')
+    parser.add_argument('--changes', type=int, default=5000, help='synthetic stream records')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--redeliver-rate', type=float, default=0.05, help='share of batches delivered twice')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    print("="*80)
+    print("REPLAY: user profile stream -> insights aggregate")
+    print("="*80)
+
+    rng = random.Random(args.seed)
+    store = InsightsAggregateStore(InMemoryAggregateTable())
+
+    if args.events:
+        with open(args.events) as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        expected_users = final_population(events)
+        # Captured events start from an empty aggregate: only the replayed changes are counted
+        store.replace({})
+    else:
+        users = {f"SIM{i:07d}": synthetic_user(rng, f"SIM{i:07d}") for i in range(args.users)}
+        store.replace(compute_totals(users.values()))
+        events = list(synthetic_events(rng, users, args.changes, args.batch_size, args.redeliver_rate))
+        expected_users = users
+
+    applied = skipped = records = 0
+    for event in events:
+        result = apply_stream_records(event['Records'], store)
+        records += result['records']
+        if result['applied']:
+            applied += 1
+        else:
+            skipped += 1
+
+    print(f"Batches: {len(events)} ({applied} applied, {skipped} skipped as redelivered), records: {records}")
+
+    # Percentiles only change on a rebuild, so they are left out of the comparison
+    actual = without_percentiles(render_insights(store.load()))
+    expected = without_percentiles(render_insights(compute_totals(expected_users.values())))
+    if actual == expected:
+        print(f"OK: aggregate matches a full recompute of {len(expected_users)} users")
+        return 0
+
+    print("MISMATCH between the aggregate and a full recompute:")
+    for section in expected:
+        if actual.get(section) != expected[section]:
+            print(f"  {section}:\n    aggregate: {actual.get(section)}\n    recompute: {expected[section]}")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+import json
+import time
+
+import boto3
+
+dynamodb = boto3.client('dynamodb')
+lambda_client = boto3.client('lambda')
+
+USERS_TABLE = 'asu-user-profiles'
+INSIGHTS_TABLE = 'admin-insights-aggregates'
+ADMIN_FUNCTION = 'admin-API'
+
+def create_insights_table():
+    """Create the table holding the insights aggregate item"""
+    try:
+        dynamodb.create_table(
+            TableName=INSIGHTS_TABLE,
+            AttributeDefinitions=[{'AttributeName': 'aggregateId', 'AttributeType': 'S'}],
+            KeySchema=[{'AttributeName': 'aggregateId', 'KeyType': 'HASH'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        dynamodb.get_waiter('table_exists').wait(TableName=INSIGHTS_TABLE)
+        print(f"{INSIGHTS_TABLE}: created")
+    except dynamodb.exceptions.ResourceInUseException:
+        print(f"{INSIGHTS_TABLE}: already exists")
+
+def enable_marker_ttl():
+    """Expire the per-batch redelivery markers (expiresAt) once the stream no longer holds their batch"""
+    status = dynamodb.describe_time_to_live(TableName=INSIGHTS_TABLE)['TimeToLiveDescription']
+    if status.get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+        print(f"{INSIGHTS_TABLE}: TTL already enabled")
+        return
+    dynamodb.update_time_to_live(
+        TableName=INSIGHTS_TABLE,
+        TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expiresAt'}
+    )
+    print(f"{INSIGHTS_TABLE}: TTL enabled on expiresAt")
+
+def enable_users_stream():
+    """Turn on a NEW_AND_OLD_IMAGES stream for the user profiles table. Returns the stream ARN."""
+    table = dynamodb.describe_table(TableName=USERS_TABLE)['Table']
+    spec = table.get('StreamSpecification') or {}
+
+    if spec.get('StreamEnabled') and spec.get('StreamViewType') != 'NEW_AND_OLD_IMAGES':
+        raise RuntimeError(f"{USERS_TABLE} already has a {spec['StreamViewType']} stream; NEW_AND_OLD_IMAGES is required")
+
+    if not spec.get('StreamEnabled'):
+        dynamodb.update_table(
+            TableName=USERS_TABLE,
+            StreamSpecification={'StreamEnabled': True, 'StreamViewType': 'NEW_AND_OLD_IMAGES'}
+        )
+        print(f"{USERS_TABLE}: stream enabled")
+        while not dynamodb.describe_table(TableName=USERS_TABLE)['Table'].get('LatestStreamArn'):
+            time.sleep(2)
+    else:
+        print(f"{USERS_TABLE}: stream already enabled")
+
+    return dynamodb.describe_table(TableName=USERS_TABLE)['Table']['LatestStreamArn']
+
+def connect_stream(stream_arn):
+    """Deliver the stream to the admin-API Lambda"""
+    existing = lambda_client.list_event_source_mappings(EventSourceArn=stream_arn, FunctionName=ADMIN_FUNCTION)
+    if existing.get('EventSourceMappings'):
+        print(f"{ADMIN_FUNCTION}: already consuming {stream_arn}")
+        return
+
+    lambda_client.create_event_source_mapping(
+        EventSourceArn=stream_arn,
+        FunctionName=ADMIN_FUNCTION,
+        StartingPosition='LATEST',
+        BatchSize=100,
+        MaximumBatchingWindowInSeconds=5,
+        BisectBatchOnFunctionError=True,
+        MaximumRetryAttempts=5
+    )
+    print(f"{ADMIN_FUNCTION}: consuming {stream_arn}")
+
+def setup_insights_stream():
+    print("="*80)
+    print("Setting up stream-maintained admin insights aggregates")
+    print("="*80)
+
+    create_insights_table()
+    enable_marker_ttl()
+    stream_arn = enable_users_stream()
+    connect_stream(stream_arn)
+
+    # Build the aggregate once the stream is flowing so no change is missed
+    response = lambda_client.invoke(
+        FunctionName=ADMIN_FUNCTION,
+        Payload=json.dumps({'action': 'rebuild-insights'}).encode('utf-8')
+    )
+    print(f"Initial rebuild: {response['Payload'].read().decode('utf-8')}")
+
+if __name__ == '__main__':
+    setup_insights_stream()
@@ -0,0 +1,141 @@
+import time
+
+import boto3
+
+dynamodb = boto3.client('dynamodb')
+table = boto3.resource('dynamodb').Table('asu-user-profiles')
+
+USERS_TABLE = 'asu-user-profiles'
+
+# user_listing.APPROVAL_STATUSES: the index partitions filtered listings query
+APPROVAL_STATUSES = ('pending', 'action_required', 'approved', 'rejected')
+
+# Attributes the admin listing returns (user_listing.INDEX_PROJECTED_FIELDS, minus the keys)
+PROJECTED_ATTRIBUTES = [
+    'firstName', 'lastName', 'name', 'asuEmail', 'email', 'loanApplication', 'salary',
+    'dtiRatio', 'financialStressLevel', 'documents', 'createdAt'
+]
+
+INDEXES = [
+    # Every user, by approval status, oldest change first
+    ('approvalStatus-updatedAt-index', 'updatedAt'),
+    # Sparse: only users with uploaded documents have documentsUploadedAt
+    ('approvalStatus-documentsUploadedAt-index', 'documentsUploadedAt'),
+]
+
+def wait_for_indexes():
+    """Wait until the table and all of its indexes are ACTIVE"""
+    while True:
+        description = dynamodb.describe_table(TableName=USERS_TABLE)['Table']
+        pending = [
+            index['IndexName'] for index in description.get('GlobalSecondaryIndexes', [])
+            if index['IndexStatus'] != 'ACTIVE'
+        ]
+        if description['TableStatus'] == 'ACTIVE' and not pending:
+            return
+        print(f"  waiting for {', '.join(pending) or 'table'}...")
+        time.sleep(20)
+
+def create_index(index_name, sort_key):
+    """Add one GSI (DynamoDB accepts a single index creation per update_table call)"""
+    description = dynamodb.describe_table(TableName=USERS_TABLE)['Table']
+    existing = [index['IndexName'] for index in description.get('GlobalSecondaryIndexes', [])]
+    if index_name in existing:
+        print(f"{index_name}: already exists")
+        return
+
+    index = {
+        'IndexName': index_name,
+        'KeySchema': [
+            {'AttributeName': 'approvalStatus', 'KeyType': 'HASH'},
+            {'AttributeName': sort_key, 'KeyType': 'RANGE'}
+        ],
+        'Projection': {'ProjectionType': 'INCLUDE', 'NonKeyAttributes': PROJECTED_ATTRIBUTES}
+    }
+    if description.get('BillingModeSummary', {}).get('BillingMode') != 'PAY_PER_REQUEST':
+        throughput = description['ProvisionedThroughput']
+        index['ProvisionedThroughput'] = {
+            'ReadCapacityUnits': throughput['ReadCapacityUnits'],
+            'WriteCapacityUnits': throughput['WriteCapacityUnits']
+        }
+
+    dynamodb.update_table(
+        TableName=USERS_TABLE,
+        AttributeDefinitions=[
+            {'AttributeName': 'approvalStatus', 'AttributeType': 'S'},
+            {'AttributeName': sort_key, 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexUpdates=[{'Create': index}]
+    )
+    print(f"{index_name}: creating (backfill can take a while on a large table)")
+    wait_for_indexes()
+    print(f"{index_name}: ACTIVE")
+
+def backfill_index_keys():
+    """
+    Set the index keys on users written before they existed: updatedAt from
+    createdAt, documentsUploadedAt from documents.uploadedAt. Users without an
+    approvalStatus or updatedAt are missing from both indexes, and users with
+    another approvalStatus are in no partition the listing queries: both are
+    counted so they can be migrated.
+    """
+    scan_kwargs = {
+        'ProjectionExpression': 'asuId, approvalStatus, updatedAt, createdAt, created_at, documents, documentsUploadedAt'
+    }
+    updated = 0
+    missing_status = 0
+    other_status = {}
+
+    while True:
+        response = table.scan(**scan_kwargs)
+        for user in response.get('Items', []):
+            updates = {}
+            if not user.get('updatedAt'):
+                timestamp = user.get('createdAt') or user.get('created_at')
+                if timestamp:
+                    updates['updatedAt'] = timestamp
+
+            docs = user.get('documents') or {}
+            if not user.get('documentsUploadedAt') and (docs.get('loanDocUrl') or docs.get('loanDocKey')):
+                timestamp = docs.get('uploadedAt') or user.get('updatedAt') or updates.get('updatedAt')
+                if timestamp:
+                    updates['documentsUploadedAt'] = timestamp
+
+            status = user.get('approvalStatus')
+            if not status:
+                missing_status += 1
+            elif status not in APPROVAL_STATUSES:
+                other_status[status] = other_status.get(status, 0) + 1
+
+            if updates:
+                table.update_item(
+                    Key={'asuId': user['asuId']},
+                    UpdateExpression='SET ' + ', '.join(f"#{name} = :{name}" for name in updates),
+                    ExpressionAttributeNames={f"#{name}": name for name in updates},
+                    ExpressionAttributeValues={f":{name}": value for name, value in updates.items()}
+                )
+                updated += 1
+
+        if 'LastEvaluatedKey' not in response:
+            break
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+    print(f"Backfilled index keys on {updated} users")
+    if missing_status:
+        print(f"{missing_status} users have no approvalStatus and are left out of filtered listings: "
+              f"run migration_approval_status.py")
+    for status, count in sorted(other_status.items()):
+        print(f"{count} users have approvalStatus '{status}', which filtered listings do not query")
+
+def setup_user_indexes():
+    print("="*80)
+    print("Setting up approval-status and documents indexes for admin listings")
+    print("="*80)
+
+    # Keys first, so the index backfill picks them up
+    backfill_index_keys()
+    for index_name, sort_key in INDEXES:
+        create_index(index_name, sort_key)
+
+if __name__ == '__main__':
+    setup_user_indexes()